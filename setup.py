@@ -154,7 +154,7 @@ PXD_DIR = join(ROOT_PACKAGE_DIR, 'core', 'pxd')
 # All .pyx file definitions of the extension
 PYX_FILES = list(map(partial(join, PYX_DIR), chain(
     # Modules at .../pyx/
-    ['imports.pyx', 'globals.pyx', 'parse.pyx', 'views.pyx', 'print.pyx', 'latex.pyx', 'numeric.pyx'],
+    ['imports.pyx', 'globals.pyx', 'parse.pyx', 'views.pyx', 'print.pyx', 'latex.pyx', 'codegen.pyx', 'numeric.pyx'],
 
     # Modules at .../pyx/classes/
     map(partial(join, 'classes'), [
@@ -236,7 +236,14 @@ RUNTIME_CONFIG = {
     'SIMULATION_UPDATE_FREQUENCY': 30,
 
     # Default simulation time multiplier
-    'SIMULATION_TIME_MULTIPLIER': 1
+    'SIMULATION_TIME_MULTIPLIER': 1,
+
+    # Directory where numeric functions compiled as cython extensions are cached
+    # (if empty, $XDG_CACHE_HOME/lib3d_mec_ginac/numfuncs is used)
+    'NUMFUNCS_CACHE_DIR': '',
+
+    # Maximum size of the numeric functions cache (in megabytes)
+    'NUMFUNCS_CACHE_MAX_SIZE': 256
 }
 
 
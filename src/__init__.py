@@ -28,3 +28,6 @@ except ImportError:
 from .config import runtime_config
 set_atomization_state(runtime_config.ATOMIZATION)
 set_gravity_direction(runtime_config.GRAVITY_DIRECTION)
+if runtime_config.NUMFUNCS_CACHE_DIR:
+    set_numeric_functions_cache_dir(runtime_config.NUMFUNCS_CACHE_DIR)
+set_numeric_functions_cache_max_size(int(runtime_config.NUMFUNCS_CACHE_MAX_SIZE * 2 ** 20))
@@ -23,23 +23,26 @@ try:
         if not isinstance(runtime_config, dict):
             raise RuntimeError
 
-    # From environment variables
+    # From environment variables (boolean values and the values of the settings below are case
+    # insensitive, other settings like paths are kept as they are)
+    case_insensitive_settings = ('ATOMIZATION', 'GRAVITY_DIRECTION')
+
     def get_env_value(key, default):
         if key in os.environ:
             try:
-                value = os.environ[key].lower()
-                if value in ('true', 'on', 'enabled'):
+                value = os.environ[key]
+                if value.lower() in ('true', 'on', 'enabled'):
                     return True
-                if value in ('false', 'off', 'disabled'):
+                if value.lower() in ('false', 'off', 'disabled'):
                     return False
                 try:
-                    value = float(value)
-                    if floor(value) == value:
-                        return floor(value)
-                    return value
+                    number = float(value)
+                    if floor(number) == number:
+                        return floor(number)
+                    return number
                 except:
                     pass
-                return value
+                return value.lower() if key in case_insensitive_settings else value
             except:
                 raise RuntimeError(f'Invalid value for "{key}" setting')
         return default
@@ -17,6 +17,11 @@ from .system import System, get_default_system, set_default_system
 from .integration import NumericIntegration
 from ..config import runtime_config
 from .assembly import AssemblyProblemSolver
+from .dynamics import DynamicProblemSolver
+from .simulator import Simulator
+from .recorder import TrajectoryRecorder
+from .sweep import ParameterSweep
+from .sparse import SparseMatrix, SparseNumericFunction
 
 try:
     from ..drawing.scene import Scene
@@ -73,7 +78,9 @@ __all__.extend(['e', 'E'])
 # Add classes & functions from core submodule
 __all__.extend([
     'System', 'get_default_system', 'set_default_system',
-    'NumericIntegration', 'AssemblyProblemSolver'
+    'NumericIntegration', 'AssemblyProblemSolver', 'DynamicProblemSolver',
+    'Simulator', 'TrajectoryRecorder', 'ParameterSweep',
+    'SparseMatrix', 'SparseNumericFunction'
 ])
 
 
@@ -91,9 +98,10 @@ for name in System.__dict__:
     if not any(map(name.startswith, ('get_', 'set_', 'new_', 'has_', 'reduced_'))) and\
     not any(map(lambda pattern: fullmatch(pattern, name),
         [r'\w+_point_branch', r'rotation_\w+', r'position_\w+', r'angular_\w+',
-        r'velocity_\w+', r'acceleration_\w+', 'twist', 'timederivative', 'dt', 'jacobian',
+        r'velocity_\w+', r'acceleration_\w+', 'twist', 'timederivative', 'dt', 'jacobian', 'sparse_jacobian',
         'diff', 'to_symbol', 'unatomize', 'atomize', r'\w+_wrench', r'export_\w+', r'compile_\w+',
-        'save_state', 'restore_previous_state', 'evaluate']
+        'save_state', 'restore_previous_state', 'evaluate', 'clear_derivatives_cache',
+        'clear_compiled_functions_cache']
     )):
         continue
 
@@ -134,7 +142,7 @@ if _gui_installed:
 
     for name in Simulation.__dict__:
         if not any(map(lambda pattern: fullmatch(pattern, name),
-            [r'\w*integration\w*', 'assembly_problem']
+            [r'\w*integration\w*', 'assembly_problem', 'dynamic_problem', 'set_accelerations']
         )):
             continue
 
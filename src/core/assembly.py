@@ -5,7 +5,9 @@ Description: This script defines the class AssemblyProblemSolver
 
 ######## Import statements ########
 
+import numpy as np
 from numpy.linalg import norm, pinv
+from .linalg import qr_factor, qr_solve
 
 
 
@@ -25,7 +27,8 @@ class AssemblyProblemSolver:
         Phi_init,   Phi_init_q, beta_init,
         dPhi_dq, dPhi_init_dq,
         geom_eq_tol=.05 * 10**-3, geom_eq_relax=.1,
-        geom_eq_init_tol=1e-10, geom_eq_init_relax=.1):
+        geom_eq_init_tol=1e-10, geom_eq_init_relax=.1,
+        method='pinv', max_iterations=None, reuse_jacobian=False):
         '''
         Constructor.
         You must pass the symbolic matrices Phi, Phi_q, beta, Phi_init, Phi_init_q,
@@ -35,13 +38,34 @@ class AssemblyProblemSolver:
         for the assembly problem solver.
         The same applies for geom_eq_init_tol and geom_eq_init_relax, but these are used on
         the initialization phase.
+
+        method can be 'pinv' (relaxed iterations with the pseudoinverse of the jacobian) or 'newton'
+        (full Newton steps computed with a QR factorization of the jacobian and a backtracking line search;
+        relaxation parameters are ignored). If reuse_jacobian is True, the 'newton' method keeps the
+        factorization of the jacobian between iterations while the constraints converge fast enough
+        (modified Newton). max_iterations is the maximum number of iterations at coordinate level (by default
+        unlimited for 'pinv' and 50 for 'newton'). A RuntimeError is raised if its exceeded.
         '''
+        if method not in ('pinv', 'newton'):
+            raise ValueError('method must be "pinv" or "newton"')
+        if max_iterations is None and method == 'newton':
+            max_iterations = 50
+
         self._system = system
         self.Phi, self.Phi_q, self.beta = Phi, Phi_q, beta
         self.Phi_init, self.Phi_init_q, self.beta_init = Phi_init, Phi_init_q, beta_init
         self.dPhi_dq, self.dPhi_init_dq = dPhi_dq, dPhi_init_dq
         self.geom_eq_tol, self.geom_eq_relax = geom_eq_tol, geom_eq_relax
         self.geom_eq_init_tol, self.geom_eq_init_relax = geom_eq_init_tol, geom_eq_init_relax
+        self.method, self.max_iterations, self.reuse_jacobian = method, max_iterations, reuse_jacobian
+
+        # Compile fused numeric functions (the constraints and their jacobian share most of their atoms,
+        # so they are evaluated together)
+        compile_numeric_function = system.compile_numeric_function
+        self._coordinate_level = compile_numeric_function([Phi, Phi_q])
+        self._velocity_level = compile_numeric_function([dPhi_dq, beta])
+        self._coordinate_level_init = compile_numeric_function([Phi_init, Phi_init_q])
+        self._velocity_level_init = compile_numeric_function([dPhi_init_dq, beta_init])
 
 
 
@@ -54,23 +78,8 @@ class AssemblyProblemSolver:
         :param dq_values: Numpy array representing the velocities numeric values
         :param ddq_values: Numpy array representing the accelerations numeric values
         '''
-        evaluate = self._system.evaluate
-        Phi_init, Phi_init_q = self.Phi_init, self.Phi_init_q
-        dPhi_init_dq, beta_init = self.dPhi_init_dq, self.beta_init
-        geom_eq_init_tol, geom_eq_init_relax = self.geom_eq_init_tol, self.geom_eq_init_relax
-
-        # Coordinate level
-        Phi_init_num = evaluate(Phi_init)
-        q_values -= geom_eq_init_relax * pinv( evaluate(Phi_init_q) ) @ Phi_init_num
-        Phi_init_num = evaluate(Phi_init)
-
-        while norm(Phi_init_num) > geom_eq_init_tol:
-            q_values -= geom_eq_init_relax * (pinv( evaluate(Phi_init_q) ) @ Phi_init_num)
-            Phi_init_num = evaluate(Phi_init)
-
-        # Velocity level
-        dPhi_init_dq_num = evaluate(dPhi_init_dq)
-        dq_values += pinv(dPhi_init_dq_num) @ (evaluate(beta_init) - dPhi_init_dq_num @ dq_values)
+        self._solve_coordinate_level(q_values, self._coordinate_level_init, self.geom_eq_init_tol, self.geom_eq_init_relax)
+        self._solve_velocity_level(dq_values, self._velocity_level_init)
 
 
 
@@ -84,19 +93,72 @@ class AssemblyProblemSolver:
         :param ddq_values: Numpy array representing the accelerations numeric values
         :param float delta_t: This is the delta time used for this step
         '''
-        evaluate = self._system.evaluate
-        Phi, Phi_q = self.Phi, self.Phi_q
-        dPhi_dq, beta = self.dPhi_dq, self.beta
-        geom_eq_tol, geom_eq_relax = self.geom_eq_tol, self.geom_eq_relax
-
-        # Coordinate level
-        Phi_num = evaluate(Phi)
-        q_values -= geom_eq_relax * pinv( evaluate(Phi_q) ) @ Phi_num
-        Phi_num = evaluate(Phi)
-        while norm(Phi_num) > geom_eq_tol:
-            q_values -= geom_eq_relax *  pinv( evaluate(Phi_q) ) @ Phi_num
-            Phi_num = evaluate(Phi)
+        self._solve_coordinate_level(q_values, self._coordinate_level, self.geom_eq_tol, self.geom_eq_relax)
+        self._solve_velocity_level(dq_values, self._velocity_level)
+
+
 
-        # Velocity level
-        dPhi_dq_num = evaluate(dPhi_dq)
-        dq_values += pinv(dPhi_dq_num) @ (evaluate(beta) - dPhi_dq_num @ dq_values)
+    def _solve_coordinate_level(self, q_values, coordinate_level, geom_eq_tol, geom_eq_relax):
+        if self.method == 'newton':
+            self._solve_coordinate_level_newton(q_values, coordinate_level, geom_eq_tol)
+            return
+
+        max_iterations = self.max_iterations
+        Phi_num, Phi_q_num = coordinate_level()
+        q_values -= geom_eq_relax * pinv(Phi_q_num) @ Phi_num
+        Phi_num, Phi_q_num = coordinate_level()
+
+        iterations = 1
+        while norm(Phi_num) > geom_eq_tol:
+            if max_iterations is not None and iterations >= max_iterations:
+                raise RuntimeError(f'Assembly problem did not converge after {iterations} iterations')
+            q_values -= geom_eq_relax * (pinv(Phi_q_num) @ Phi_num)
+            Phi_num, Phi_q_num = coordinate_level()
+            iterations += 1
+
+
+
+    def _solve_coordinate_level_newton(self, q_values, coordinate_level, geom_eq_tol):
+        max_iterations, reuse_jacobian = self.max_iterations, self.reuse_jacobian
+
+        Phi_num, Phi_q_num = coordinate_level()
+        Phi_norm = norm(Phi_num)
+        q_prev, factorization, iterations = None, None, 0
+
+        while Phi_norm > geom_eq_tol:
+            if iterations >= max_iterations:
+                raise RuntimeError(f'Assembly problem did not converge after {iterations} iterations')
+            iterations += 1
+
+            # Newton step (least squares or minimum norm solution of Phi_q * delta_q = Phi)
+            if factorization is None or not reuse_jacobian:
+                factorization = qr_factor(Phi_q_num)
+            delta_q = qr_solve(factorization, Phi_num)
+
+            # Backtracking line search over the norm of the constraints
+            if q_prev is None:
+                q_prev = np.empty_like(q_values)
+            q_prev[:] = q_values
+            alpha = 1.0
+            while True:
+                np.subtract(q_prev, alpha * delta_q, out=q_values)
+                Phi_num, Phi_q_num = coordinate_level()
+                Phi_norm_next = norm(Phi_num)
+                if Phi_norm_next <= (1 - 1e-4 * alpha) * Phi_norm or alpha < 1e-3:
+                    break
+                alpha /= 2
+
+            # Refactorize the jacobian on the next iteration if convergence is slow
+            if Phi_norm_next > .5 * Phi_norm:
+                factorization = None
+            Phi_norm = Phi_norm_next
+
+
+
+    def _solve_velocity_level(self, dq_values, velocity_level):
+        dPhi_dq_num, beta_num = velocity_level()
+        rhs = beta_num - dPhi_dq_num @ dq_values
+        if self.method == 'newton':
+            dq_values += qr_solve(qr_factor(dPhi_dq_num), rhs)
+        else:
+            dq_values += pinv(dPhi_dq_num) @ rhs
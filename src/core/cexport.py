@@ -0,0 +1,441 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This file defines the routines to export a simulation of a system as standalone C code
+'''
+
+######## Import statements ########
+
+# Standard imports
+import os
+import os.path
+from string import Template
+from operator import methodcaller
+
+# Imports from other modules
+from lib3d_mec_ginac_ext import Matrix, _symbol_types
+
+
+
+######## C source templates ########
+
+# Header of the exported model
+_header_template = Template('''\
+/*
+ * Model "${name}" exported by lib3d_mec_ginac
+ *
+ * Symbol values are stored in global arrays which can be read & modified directly.
+ * Call ${name}_init() once, then ${name}_step(delta_t) on each integration step.
+ * Functions return 0 on success or -1 if a linear system is singular or
+ * the assembly problem does not converge.
+ */
+#ifndef ${guard}
+#define ${guard}
+
+#define ${NAME}_NUM_COORDINATES ${num_coordinates}
+#define ${NAME}_NUM_CONSTRAINTS ${num_constraints}
+${defines}
+
+extern double ${name}_t;
+${declarations}
+
+void ${name}_reset(void);
+int ${name}_init(void);
+int ${name}_assembly(void);
+int ${name}_accelerations(void);
+int ${name}_step(double delta_t);
+
+#endif
+''')
+
+
+# Source of the exported model
+_source_template = Template('''\
+/*
+ * Model "${name}" exported by lib3d_mec_ginac
+ */
+#include <math.h>
+#include <string.h>
+#include "${name}.h"
+
+#define EXPORT static
+#define N ${NAME}_NUM_COORDINATES
+#define M ${NAME}_NUM_CONSTRAINTS
+#define NONEMPTY(size) ((size) > 0 ? (size) : 1)
+#define N_ NONEMPTY(N)
+#define M_ NONEMPTY(M)
+
+#define GEOM_EQ_TOL ${geom_eq_tol}
+#define MAX_ITERATIONS ${max_iterations}
+#define REGULARIZATION 1e-12
+
+
+/* Symbol values */
+double ${name}_t = ${t};
+${definitions}
+
+
+/* Numeric functions */
+${evaluators}
+
+
+/* Workspace (arrays are never empty, which is not allowed in C) */
+static double coordinate_level[NONEMPTY(M + M*N)];
+static double velocity_level[NONEMPTY(M*N + M)];
+static double dynamics[NONEMPTY(N*N + N + M*N + M)];
+static double a[NONEMPTY((N + M)*(N + M))];
+static double b[NONEMPTY(N + M)];
+static double q0[N_], dq0[N_], kq[4][N_], kdq[4][N_];
+
+
+
+/* Solves the linear system a * x = b (a is a nxn matrix stored by rows) with a LU
+   factorization with partial pivoting. The solution is stored in b */
+static int lu_solve(double* a, double* b, int n) {
+	int i, j, k, p;
+	double tmp;
+	for(k = 0; k < n; k++) {
+		p = k;
+		for(i = k + 1; i < n; i++)
+			if(fabs(a[i*n + k]) > fabs(a[p*n + k]))
+				p = i;
+		if(a[p*n + k] == 0.0)
+			return -1;
+		if(p != k) {
+			for(j = 0; j < n; j++) {
+				tmp = a[k*n + j]; a[k*n + j] = a[p*n + j]; a[p*n + j] = tmp;
+			}
+			tmp = b[k]; b[k] = b[p]; b[p] = tmp;
+		}
+		for(i = k + 1; i < n; i++) {
+			tmp = a[i*n + k] / a[k*n + k];
+			for(j = k + 1; j < n; j++)
+				a[i*n + j] -= tmp * a[k*n + j];
+			b[i] -= tmp * b[k];
+		}
+	}
+	for(k = n - 1; k >= 0; k--) {
+		for(j = k + 1; j < n; j++)
+			b[k] -= a[k*n + j] * b[j];
+		b[k] /= a[k*n + k];
+	}
+	return 0;
+}
+
+
+/* Computes the minimum norm solution of the system jac * x = rhs (jac is a MxN matrix)
+   as x = jac^T * (jac * jac^T)^-1 * rhs (with a small regularization to support redundant
+   constraints). The result is stored in x */
+static int min_norm_solve(const double* jac, const double* rhs, double* x) {
+	int i, j, k;
+	for(i = 0; i < M; i++) {
+		for(j = 0; j < M; j++) {
+			a[i*M + j] = 0.0;
+			for(k = 0; k < N; k++)
+				a[i*M + j] += jac[i*N + k] * jac[j*N + k];
+		}
+		a[i*M + i] += REGULARIZATION;
+		b[i] = rhs[i];
+	}
+	if(lu_solve(a, b, M))
+		return -1;
+	for(k = 0; k < N; k++) {
+		x[k] = 0.0;
+		for(i = 0; i < M; i++)
+			x[k] += jac[i*N + k] * b[i];
+	}
+	return 0;
+}
+
+
+
+/* Solves the assembly problem at coordinate level (Newton iterations) */
+static int assembly_coordinate_level(void) {
+	const double* Phi = coordinate_level;
+	const double* Phi_q = coordinate_level + M;
+	double delta[N_], norm;
+	int i, iterations;
+	for(iterations = 0;; iterations++) {
+		${coordinate_level_call}
+		norm = 0.0;
+		for(i = 0; i < M; i++)
+			norm += Phi[i] * Phi[i];
+		if(sqrt(norm) <= GEOM_EQ_TOL)
+			return 0;
+		if(iterations >= MAX_ITERATIONS || min_norm_solve(Phi_q, Phi, delta))
+			return -1;
+		for(i = 0; i < N; i++)
+			${name}_coordinate[i] -= delta[i];
+	}
+}
+
+
+/* Solves the assembly problem at velocity level */
+static int assembly_velocity_level(void) {
+	const double* dPhi_dq = velocity_level;
+	const double* beta = velocity_level + M*N;
+	double rhs[M_], delta[N_];
+	int i, k;
+	${velocity_level_call}
+	for(i = 0; i < M; i++) {
+		rhs[i] = beta[i];
+		for(k = 0; k < N; k++)
+			rhs[i] -= dPhi_dq[i*N + k] * ${name}_velocity[k];
+	}
+	if(min_norm_solve(dPhi_dq, rhs, delta))
+		return -1;
+	for(k = 0; k < N; k++)
+		${name}_velocity[k] += delta[k];
+	return 0;
+}
+
+
+int ${name}_assembly(void) {
+	if(assembly_coordinate_level())
+		return -1;
+	return assembly_velocity_level();
+}
+
+
+
+/* Computes the accelerations solving the augmented system
+   [M_qq Phi_q^T; Phi_q 0] * [ddq; lambda] = [delta_q; gamma] */
+int ${name}_accelerations(void) {
+	const double* M_qq = dynamics;
+	const double* delta_q = dynamics + N*N;
+	const double* Phi_q = dynamics + N*N + N;
+	const double* gamma = dynamics + N*N + N + M*N;
+	const int n = N + M;
+	int i, j;
+	${dynamics_call}
+	for(i = 0; i < N; i++) {
+		for(j = 0; j < N; j++)
+			a[i*n + j] = M_qq[i*N + j];
+		for(j = 0; j < M; j++)
+			a[i*n + N + j] = Phi_q[j*N + i];
+		b[i] = delta_q[i];
+	}
+	for(i = 0; i < M; i++) {
+		for(j = 0; j < N; j++)
+			a[(N + i)*n + j] = Phi_q[i*N + j];
+		for(j = 0; j < M; j++)
+			a[(N + i)*n + N + j] = i == j ? -REGULARIZATION : 0.0;
+		b[N + i] = gamma[i];
+	}
+	if(lu_solve(a, b, n))
+		return -1;
+	memcpy(${name}_acceleration, b, N * sizeof(double));
+	return 0;
+}
+
+
+
+/* Numerical integration */
+${integration_method}
+
+
+
+void ${name}_reset(void) {
+	${name}_t = ${t};
+${reset}
+}
+
+
+int ${name}_init(void) {
+	if(${name}_assembly())
+		return -1;
+	return ${name}_accelerations();
+}
+
+
+int ${name}_step(double delta_t) {
+	if(integrate(delta_t))
+		return -1;
+	return ${name}_assembly();
+}
+''')
+
+
+# Integration methods (same as NumericIntegration.euler & NumericIntegration.rk4). They increase the time
+# (which is also updated at each stage) and the accelerations are consistent with the new state at the end
+_integration_methods = {
+    'euler': '''\
+static int integrate(double h) {
+	int i;
+	if(${name}_accelerations())
+		return -1;
+	for(i = 0; i < N; i++) {
+		${name}_coordinate[i] += h * (${name}_velocity[i] + 0.5 * h * ${name}_acceleration[i]);
+		${name}_velocity[i] += h * ${name}_acceleration[i];
+	}
+	${name}_t += h;
+	return ${name}_accelerations();
+}''',
+
+    'rk4': '''\
+static int integrate(double h) {
+	static const double c[4] = {0.0, 0.5, 0.5, 1.0};
+	static const double w[4] = {1.0/6.0, 1.0/3.0, 1.0/3.0, 1.0/6.0};
+	const double t0 = ${name}_t;
+	int i, s;
+	memcpy(q0, ${name}_coordinate, N * sizeof(double));
+	memcpy(dq0, ${name}_velocity, N * sizeof(double));
+	if(${name}_accelerations())
+		return -1;
+	for(s = 0; s < 4; s++) {
+		if(s > 0) {
+			for(i = 0; i < N; i++) {
+				${name}_coordinate[i] = q0[i] + c[s] * h * kq[s - 1][i];
+				${name}_velocity[i] = dq0[i] + c[s] * h * kdq[s - 1][i];
+			}
+			${name}_t = t0 + c[s] * h;
+			if(${name}_accelerations())
+				return -1;
+		}
+		memcpy(kq[s], ${name}_velocity, N * sizeof(double));
+		memcpy(kdq[s], ${name}_acceleration, N * sizeof(double));
+	}
+	for(i = 0; i < N; i++) {
+		${name}_coordinate[i] = q0[i] + h * (w[0]*kq[0][i] + w[1]*kq[1][i] + w[2]*kq[2][i] + w[3]*kq[3][i]);
+		${name}_velocity[i] = dq0[i] + h * (w[0]*kdq[0][i] + w[1]*kdq[1][i] + w[2]*kdq[2][i] + w[3]*kdq[3][i]);
+	}
+	${name}_t = t0 + h;
+	return ${name}_accelerations();
+}'''
+}
+
+
+# Reference driver of the exported model
+_driver_template = Template('''\
+/*
+ * Reference driver of the model "${name}" exported by lib3d_mec_ginac
+ * Usage: ${name} [delta_t] [t_end]
+ * Prints the time and coordinates after each step (CSV format)
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include "${name}.h"
+
+int main(int argc, char** argv) {
+	const double delta_t = argc > 1 ? atof(argv[1]) : 0.001;
+	const double t_end = argc > 2 ? atof(argv[2]) : 1.0;
+	int i;
+
+	if(${name}_init()) {
+		fprintf(stderr, "Failed to solve the initial assembly problem\\n");
+		return 1;
+	}
+	while(${name}_t < t_end - 0.5 * delta_t) {
+		if(${name}_step(delta_t)) {
+			fprintf(stderr, "Simulation failed at t = %g\\n", ${name}_t);
+			return 1;
+		}
+		printf("%.9g", ${name}_t);
+		for(i = 0; i < ${NAME}_NUM_COORDINATES; i++)
+			printf(",%.17g", ${name}_coordinate[i]);
+		printf("\\n");
+	}
+	return 0;
+}
+''')
+
+
+_makefile_template = Template('''\
+CC ?= cc
+CFLAGS ?= -O2
+
+${name}: main.c ${name}.c ${name}.h
+\t$$(CC) $$(CFLAGS) -o $$@ main.c ${name}.c -lm
+''')
+
+
+
+
+######## Export ########
+
+def export_simulation_C(system, directory, Phi, Phi_q, beta, M_qq, delta_q, gamma, dPhi_dq=None,
+    name='model', integration_method='rk4', geom_eq_tol=.05 * 10**-3, max_iterations=50):
+    # Exports a simulation of the given system as standalone C code (see System.export_simulation_C)
+    if not isinstance(directory, str):
+        raise TypeError('directory must be a string')
+    if not isinstance(name, str) or not name.isidentifier():
+        raise TypeError('name must be a valid C identifier')
+    if integration_method not in _integration_methods:
+        raise ValueError(f'integration_method must be one of: {", ".join(_integration_methods)}')
+    if not isinstance(max_iterations, int) or max_iterations <= 0:
+        raise TypeError('max_iterations must be an integer greater than zero')
+
+    # Parse & validate the matrices
+    if dPhi_dq is None:
+        dPhi_dq = Phi_q
+    matrices = [Phi, Phi_q, beta, M_qq, delta_q, gamma, dPhi_dq]
+    for k, matrix in enumerate(matrices):
+        if isinstance(matrix, str):
+            matrices[k] = system.get_matrix(matrix)
+        elif not isinstance(matrix, Matrix):
+            raise TypeError('Input arguments must be matrices or matrix names')
+    Phi, Phi_q, beta, M_qq, delta_q, gamma, dPhi_dq = matrices
+
+    n, m = system.get_coords_values().size, Phi.shape[0]
+    expected_shapes = {
+        'Phi': (Phi, (m, 1)), 'Phi_q': (Phi_q, (m, n)), 'beta': (beta, (m, 1)), 'dPhi_dq': (dPhi_dq, (m, n)),
+        'M_qq': (M_qq, (n, n)), 'delta_q': (delta_q, (n, 1)), 'gamma': (gamma, (m, 1))
+    }
+    for matrix_name, (matrix, shape) in expected_shapes.items():
+        if tuple(matrix.shape) != shape:
+            raise ValueError(f'{matrix_name} must be a matrix with shape {shape}')
+
+    # Generate the evaluators of the matrices (fused numeric functions, the same as the ones used by
+    # AssemblyProblemSolver & DynamicProblemSolver)
+    symbol_types = tuple(sorted(map(methodcaller('decode'), _symbol_types)))
+    args = ', '.join([f'{name}_{kind}' for kind in symbol_types] + [f'{name}_t'])
+    evaluators, calls = [], {}
+    for level, level_matrices in (
+        ('coordinate_level', [Phi, Phi_q]),
+        ('velocity_level', [dPhi_dq, beta]),
+        ('dynamics', [M_qq, delta_q, Phi_q, gamma])):
+        func = system._compile_numeric_function(level_matrices, False)
+        evaluators.extend(func._generate_c_source(f'{level}_', batch=False))
+        calls[f'{level}_call'] = f'{level}_evaluate({args}, {level});'
+
+    # Symbol storage (arrays are never empty, which is not allowed in C)
+    defines, declarations, definitions, reset = [], [], [], []
+    for kind in symbol_types:
+        values = system.get_symbols_values(kind).reshape(-1)
+        names = list(system._symbols_values[kind].keys())
+        init = ', '.join(map(repr, map(float, values))) if values.size > 0 else '0.0'
+        size = max(values.size, 1)
+        defines.append(f'#define {name.upper()}_{kind.upper()}_SIZE {values.size}')
+        defines.extend(
+            f'#define {name.upper()}_{kind.upper()}_{symbol_name} {k}'
+            for k, symbol_name in enumerate(names) if symbol_name.isidentifier())
+        declarations.append(f'extern double {name}_{kind}[{size}];')
+        definitions.append(f'double {name}_{kind}[{size}] = {{ {init} }};')
+        definitions.append(f'static const double {name}_{kind}_init[{size}] = {{ {init} }};')
+        reset.append(f'\tmemcpy({name}_{kind}, {name}_{kind}_init, sizeof({name}_{kind}));')
+
+    fields = dict(
+        name=name, NAME=name.upper(), guard=f'{name.upper()}_H',
+        num_coordinates=n, num_constraints=m,
+        t=repr(float(system.get_time().get_value())),
+        geom_eq_tol=repr(float(geom_eq_tol)), max_iterations=max_iterations,
+        defines='\n'.join(defines), declarations='\n'.join(declarations),
+        definitions='\n'.join(definitions), reset='\n'.join(reset),
+        evaluators='\n'.join(evaluators),
+        integration_method=Template(_integration_methods[integration_method]).substitute(name=name),
+        **calls)
+
+    # Write the files
+    os.makedirs(directory, exist_ok=True)
+    files = {
+        f'{name}.h': _header_template.substitute(fields),
+        f'{name}.c': _source_template.substitute(fields),
+        'main.c': _driver_template.substitute(fields),
+        'Makefile': _makefile_template.substitute(fields)
+    }
+    filenames = []
+    for filename, source in files.items():
+        filename = os.path.join(directory, filename)
+        with open(filename, 'w') as file:
+            file.write(source)
+        filenames.append(filename)
+    return filenames
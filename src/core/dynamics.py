@@ -0,0 +1,138 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This script defines the class DynamicProblemSolver
+'''
+
+######## Import statements ########
+
+import numpy as np
+from .linalg import lu_factor, lu_solve, cho_factor, cho_solve
+
+
+
+######## class DynamicProblemSolver ########
+
+class DynamicProblemSolver:
+    '''
+    This class can be used to solve the "dynamic problem" of a mechanical system: compute
+    the accelerations from the dynamic equations
+
+        M_qq * ddq + Phi_q^T * lambda = delta_q
+        Phi_q * ddq = gamma
+
+    where M_qq is the mass matrix, delta_q the right hand side of the dynamic equations,
+    Phi_q the jacobian of the constraints and lambda are the lagrange multipliers.
+    The method `solve` is invoked on each stage of the numerical integration when performing a simulation.
+    '''
+    def __init__(self, system, M_qq, delta_q, Phi_q=None, gamma=None, method='lu', c_optimized=False, regularization=1e-12):
+        '''
+        Constructor.
+        You must pass the symbolic matrices M_qq and delta_q. Phi_q and gamma are optional
+        (if the system has no constraints)
+
+        method can be 'lu' (the augmented system is solved with a LU factorization) or 'cholesky' (the mass
+        matrix is factorized with Cholesky and the system is projected onto the constraints, the mass matrix must be
+        positive definite)
+
+        If c_optimized is True, the numeric functions to evaluate the matrices are compiled as a cython
+        extension.
+
+        regularization is a small value added to the diagonal of the constraints block (with negative sign
+        in the augmented system), so that redundant constraints (a rank deficient Phi_q) can be handled by both
+        methods. A np.linalg.LinAlgError is raised by `solve` if the dynamic equations are still singular.
+        '''
+        if (Phi_q is None) != (gamma is None):
+            raise TypeError('Phi_q and gamma must be specified together')
+        if method not in ('lu', 'cholesky'):
+            raise ValueError('method must be "lu" or "cholesky"')
+
+        self._system = system
+        self.M_qq, self.delta_q = M_qq, delta_q
+        self.Phi_q, self.gamma = Phi_q, gamma
+        self.method, self.regularization = method, regularization
+
+        # Compile a fused numeric function (all matrices are evaluated at once)
+        matrices = [M_qq, delta_q] if Phi_q is None else [M_qq, delta_q, Phi_q, gamma]
+        self._func = system.compile_numeric_function(matrices, c_optimized)
+
+        # Preallocated buffers
+        n = M_qq.shape[0]
+        m = 0 if Phi_q is None else Phi_q.shape[0]
+        self._augmented_matrix = np.zeros((n + m, n + m), dtype=np.float64)
+        self._augmented_rhs = np.zeros((n + m, 1), dtype=np.float64)
+        self._lagrange_multipliers = np.zeros((m, 1), dtype=np.float64)
+
+
+
+    def get_lagrange_multipliers(self):
+        '''get_lagrange_multipliers() -> np.ndarray
+        Get the lagrange multipliers computed the last time `solve` was called
+        '''
+        return self._lagrange_multipliers
+
+
+
+    def solve(self, ddq_values):
+        '''solve(ddq_values)
+
+        This solves the dynamic problem and stores the accelerations in the given array
+
+        :param ddq_values: Numpy array representing the accelerations numeric values
+        '''
+        if self.Phi_q is None:
+            M_qq_num, delta_q_num = self._func()
+            Phi_q_num = gamma_num = None
+        else:
+            M_qq_num, delta_q_num, Phi_q_num, gamma_num = self._func()
+
+        if self.method == 'lu':
+            self._solve_augmented(ddq_values, M_qq_num, delta_q_num, Phi_q_num, gamma_num)
+        else:
+            self._solve_projected(ddq_values, M_qq_num, delta_q_num, Phi_q_num, gamma_num)
+
+
+
+    def _solve_augmented(self, ddq_values, M_qq_num, delta_q_num, Phi_q_num, gamma_num):
+        # Solve the augmented system [M_qq Phi_q^T; Phi_q 0] * [ddq; lambda] = [delta_q; gamma]
+        n = M_qq_num.shape[0]
+        a, b = self._augmented_matrix, self._augmented_rhs
+        a[:n, :n] = M_qq_num
+        b[:n] = delta_q_num
+        if Phi_q_num is not None:
+            a[:n, n:] = Phi_q_num.T
+            a[n:, :n] = Phi_q_num
+            a[n:, n:] = 0
+            np.fill_diagonal(a[n:, n:], -self.regularization)
+            b[n:] = gamma_num
+
+        x = lu_solve(lu_factor(a), b)
+        if not np.isfinite(x).all():
+            raise np.linalg.LinAlgError('The augmented matrix of the dynamic equations is singular')
+        ddq_values[:] = x[:n].reshape(ddq_values.shape)
+        self._lagrange_multipliers[:] = x[n:]
+
+
+
+    def _solve_projected(self, ddq_values, M_qq_num, delta_q_num, Phi_q_num, gamma_num):
+        # Solve the system with the Cholesky factorization of the mass matrix:
+        # (Phi_q * M_qq^-1 * Phi_q^T) * lambda = Phi_q * M_qq^-1 * delta_q - gamma
+        # ddq = M_qq^-1 * (delta_q - Phi_q^T * lambda)
+        n = M_qq_num.shape[0]
+        a = self._augmented_matrix[:n, :n]
+        a[:] = M_qq_num
+        try:
+            c = cho_factor(a)
+        except np.linalg.LinAlgError:
+            raise np.linalg.LinAlgError('The mass matrix is not positive definite') from None
+        ddq = cho_solve(c, delta_q_num)
+
+        if Phi_q_num is not None:
+            x = cho_solve(c, Phi_q_num.T)
+            s = self._augmented_matrix[n:, n:]
+            np.matmul(Phi_q_num, x, out=s)
+            s.flat[::s.shape[0] + 1] += self.regularization
+            lagrange_multipliers = cho_solve(cho_factor(s), Phi_q_num @ ddq - gamma_num)
+            ddq -= x @ lagrange_multipliers
+            self._lagrange_multipliers[:] = lagrange_multipliers
+
+        ddq_values[:] = ddq.reshape(ddq_values.shape)
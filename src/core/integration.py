@@ -6,6 +6,175 @@ Description: This script defines the class IntegrationMethod and its subclasses
 
 ######## Import statements ########
 
+import numpy as np
+from math import ceil
+
+
+
+######## Butcher tableaus ########
+
+# Classic Runge Kutta method of order 4
+_rk4_tableau = (
+    np.array([
+        [0,   0,   0, 0],
+        [1/2, 0,   0, 0],
+        [0,   1/2, 0, 0],
+        [0,   0,   1, 0]
+    ]),
+    np.array([1/6, 1/3, 1/3, 1/6]),
+    None,
+    np.array([0, 1/2, 1/2, 1])
+)
+
+
+# Dormand Prince method of order 5 with embedded order 4 (its last stage is evaluated
+# at the next step (first same as last))
+_rk45_tableau = (
+    np.array([
+        [0,          0,           0,          0,        0,           0,     0],
+        [1/5,        0,           0,          0,        0,           0,     0],
+        [3/40,       9/40,        0,          0,        0,           0,     0],
+        [44/45,      -56/15,      32/9,       0,        0,           0,     0],
+        [19372/6561, -25360/2187, 64448/6561, -212/729, 0,           0,     0],
+        [9017/3168,  -355/33,     46732/5247, 49/176,   -5103/18656, 0,     0],
+        [35/384,     0,           500/1113,   125/192,  -2187/6784,  11/84, 0]
+    ]),
+    np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0]),
+    np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40]),
+    np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+)
+
+
+# Bogacki Shampine method of order 3 with embedded order 2 (first same as last)
+_rk23_tableau = (
+    np.array([
+        [0,   0,   0,   0],
+        [1/2, 0,   0,   0],
+        [0,   3/4, 0,   0],
+        [2/9, 1/3, 4/9, 0]
+    ]),
+    np.array([2/9, 1/3, 4/9, 0]),
+    np.array([7/24, 1/4, 1/3, 1/8]),
+    np.array([0, 1/2, 3/4, 1])
+)
+
+
+
+
+######## Helper functions ########
+
+def _get_workspace_array(workspace, name, shape):
+    # Returns a preallocated array stored in the given workspace (it is created if it doesnt
+    # exist yet or its shape changed)
+    array = workspace.get(name)
+    if array is None or array.shape != shape:
+        array = np.empty(shape, dtype=np.float64)
+        workspace[name] = array
+    return array
+
+
+
+def _rk_combine(y, y0, coefs, k, delta_t, tmp):
+    # Computes y = y0 + delta_t * sum(coefs_j * k_j) in place
+    np.dot(coefs, k, out=tmp)
+    tmp *= delta_t
+    np.add(y0, tmp, out=y)
+
+
+
+def _rk_step(tableau, q_values, dq_values, ddq_values, delta_t, accelerations, workspace, time=None):
+    # Performs one step of an explicit Runge Kutta method with the given Butcher tableau.
+    # Accelerations must be consistent with the coordinates and velocities when this is called.
+    # The time (if specified) is set at each stage and increased by delta_t after the step. Then,
+    # accelerations are consistent with the new state (they are only evaluated again if the last
+    # stage is not the new state, first same as last methods).
+    # Returns the local error estimation of the coordinates and velocities if the tableau has
+    # an embedded method (None otherwise)
+    a, b, b_err, c = tableau
+    num_stages, n = len(b), q_values.size
+    q, dq, ddq = q_values.reshape(-1), dq_values.reshape(-1), ddq_values.reshape(-1)
+
+    # Stage buffers (derivatives of the coordinates & velocities at each stage)
+    q0, dq0 = _get_workspace_array(workspace, 'q0', (n,)), _get_workspace_array(workspace, 'dq0', (n,))
+    kq, kdq = _get_workspace_array(workspace, 'kq', (num_stages, n)), _get_workspace_array(workspace, 'kdq', (num_stages, n))
+    tmp = _get_workspace_array(workspace, 'tmp', (n,))
+
+    q0[:], dq0[:] = q, dq
+    kq[0], kdq[0] = dq, ddq
+    t0 = time.value if time is not None else None
+
+    for i in range(1, num_stages):
+        _rk_combine(q, q0, a[i, :i], kq[:i], delta_t, tmp)
+        _rk_combine(dq, dq0, a[i, :i], kdq[:i], delta_t, tmp)
+        if time is not None:
+            time.value = t0 + c[i] * delta_t
+        accelerations()
+        kq[i], kdq[i] = dq, ddq
+
+    _rk_combine(q, q0, b, kq, delta_t, tmp)
+    _rk_combine(dq, dq0, b, kdq, delta_t, tmp)
+    if time is not None:
+        time.value = t0 + delta_t
+    if b[-1] != 0 or not np.array_equal(a[-1, :-1], b[:-1]):
+        accelerations()
+
+    if b_err is None:
+        return None
+
+    # Local error estimation (difference between the solutions of both methods)
+    err = _get_workspace_array(workspace, 'err', (2, n))
+    coefs = _get_workspace_array(workspace, 'err_coefs', (num_stages,))
+    np.subtract(b, b_err, out=coefs)
+    np.dot(coefs, kq, out=err[0])
+    np.dot(coefs, kdq, out=err[1])
+    err *= delta_t
+    return err
+
+
+
+def _rk_adaptive(tableau, order, q_values, dq_values, ddq_values, delta_t, accelerations, workspace, rtol, atol, time=None):
+    # Integrates over delta_t with an embedded Runge Kutta pair, taking as many substeps as
+    # needed to keep the local error estimation below the given tolerances. The last step size is
+    # stored in the workspace and used as the initial guess on the next call. The remaining interval is
+    # divided in equal substeps no longer than the step size (a tiny substep is never left at the end).
+    # The time (if specified) is updated on each substep
+    n = q_values.size
+    q, dq, ddq = q_values.reshape(-1), dq_values.reshape(-1), ddq_values.reshape(-1)
+    y0 = _get_workspace_array(workspace, 'y0', (3, n))
+    scale = _get_workspace_array(workspace, 'scale', (2, n))
+
+    accelerations()
+    t0 = time.value if time is not None else None
+    elapsed, h = 0.0, workspace.get('h', delta_t)
+    while delta_t - elapsed > 1e-12 * delta_t:
+        remaining = delta_t - elapsed
+        step = remaining / ceil(remaining / h * (1 - 1e-12))
+        y0[0], y0[1], y0[2] = q, dq, ddq
+        if time is not None:
+            time.value = t0 + elapsed
+        err = _rk_step(tableau, q_values, dq_values, ddq_values, step, accelerations, workspace, time)
+
+        # Error norm (weighted root mean square)
+        np.maximum(np.abs(y0[:2]), np.abs(np.stack((q, dq))), out=scale)
+        scale *= rtol
+        scale += atol
+        err_norm = np.sqrt(np.mean(np.square(err / scale))) if n > 0 else 0.0
+
+        # Adjust the step size
+        factor = 5.0 if err_norm == 0 else min(5.0, max(0.2, 0.9 * err_norm ** (-1 / (order + 1))))
+        if err_norm <= 1:
+            elapsed += step
+            workspace['h'] = h = step * factor
+        else:
+            # Step rejected (restore the previous state)
+            q[:], dq[:], ddq[:] = y0
+            h = step * factor
+            if h < 1e-14 * delta_t:
+                raise RuntimeError('Step size too small while performing the numerical integration')
+
+    if time is not None:
+        time.value = t0 + delta_t
+
 
 
 
@@ -13,25 +182,107 @@ Description: This script defines the class IntegrationMethod and its subclasses
 
 class NumericIntegration:
     @staticmethod
-    def euler(q_values, dq_values, ddq_values, delta_t):
+    def euler(q_values, dq_values, ddq_values, delta_t, accelerations=None, workspace=None, time=None):
         '''
         This function performs the integration of the numeric values of the
         given coordinate variables ( and its derivatives ) using the
         euler method
+
+        :param accelerations: An optional callable with no arguments which updates the
+            acceleration values (in place) from the current coordinate & velocity values.
+            They are evaluated again after the step, so that they are consistent with the new state.
+            If not specified, accelerations are assumed to be constant.
+        :param workspace: Not used by this method (only for compatibility with the others)
+        :param time: An optional object with a ``value`` attribute (e.g. the time symbol of
+            the system) which is increased by delta_t
         '''
+        if accelerations is not None:
+            accelerations()
         q_values += delta_t * (dq_values + 0.5 * delta_t * ddq_values)
         dq_values += delta_t * ddq_values
+        if time is not None:
+            time.value += delta_t
+        if accelerations is not None:
+            accelerations()
 
 
     @staticmethod
-    def rk4(q_values, dq_values, ddq_values, delta_t):
+    def rk4(q_values, dq_values, ddq_values, delta_t, accelerations=None, workspace=None, time=None):
         '''
         This function performs the integration of the numeric values of the
         given coordinate variables ( and its derivatives ) using the
         Range Kutta Order 4 algorithm
+
+        :param accelerations: An optional callable with no arguments which updates the
+            acceleration values (in place) from the current coordinate & velocity values.
+            They are evaluated again after the step, so that they are consistent with the new state.
+            If not specified, accelerations are assumed to be constant: all the methods are exact in that
+            case, so the euler method is used instead.
+        :param workspace: An optional dictionary where the stage buffers are stored, so that
+            they can be reused between calls.
+        :param time: An optional object with a ``value`` attribute (e.g. the time symbol of
+            the system) which is set to the time of each stage and increased by delta_t after the step
+        '''
+        if accelerations is None:
+            return NumericIntegration.euler(q_values, dq_values, ddq_values, delta_t, time=time)
+        if workspace is None:
+            workspace = {}
+        accelerations()
+        _rk_step(_rk4_tableau, q_values, dq_values, ddq_values, delta_t, accelerations, workspace, time)
+
+
+    @staticmethod
+    def rk45(q_values, dq_values, ddq_values, delta_t, accelerations=None, workspace=None, rtol=1e-6, atol=1e-9, time=None):
+        '''
+        This function performs the integration of the numeric values of the
+        given coordinate variables ( and its derivatives ) using the adaptive
+        Dormand Prince method (Range Kutta order 5 with embedded order 4 error estimation).
+        The step is divided in as many substeps as needed to satisfy the given tolerances
+
+        :param accelerations: An optional callable with no arguments which updates the
+            acceleration values (in place) from the current coordinate & velocity values.
+            They are evaluated again after the step, so that they are consistent with the new state.
+            If not specified, accelerations are assumed to be constant: all the methods are exact in that
+            case, so the euler method is used instead.
+        :param workspace: An optional dictionary where the stage buffers and the last step size
+            are stored, so that they can be reused between calls.
+        :param rtol: Relative tolerance
+        :param atol: Absolute tolerance
+        :param time: An optional object with a ``value`` attribute (e.g. the time symbol of
+            the system) which is set to the time of each stage and increased by delta_t after the step
+        '''
+        if accelerations is None:
+            return NumericIntegration.euler(q_values, dq_values, ddq_values, delta_t, time=time)
+        if workspace is None:
+            workspace = {}
+        _rk_adaptive(_rk45_tableau, 4, q_values, dq_values, ddq_values, delta_t, accelerations, workspace, rtol, atol, time)
+
+
+    @staticmethod
+    def rk23(q_values, dq_values, ddq_values, delta_t, accelerations=None, workspace=None, rtol=1e-3, atol=1e-6, time=None):
+        '''
+        This function performs the integration of the numeric values of the
+        given coordinate variables ( and its derivatives ) using the adaptive
+        Bogacki Shampine method (Range Kutta order 3 with embedded order 2 error estimation).
+        The step is divided in as many substeps as needed to satisfy the given tolerances
+
+        :param accelerations: An optional callable with no arguments which updates the
+            acceleration values (in place) from the current coordinate & velocity values.
+            They are evaluated again after the step, so that they are consistent with the new state.
+            If not specified, accelerations are assumed to be constant: all the methods are exact in that
+            case, so the euler method is used instead.
+        :param workspace: An optional dictionary where the stage buffers and the last step size
+            are stored, so that they can be reused between calls.
+        :param rtol: Relative tolerance
+        :param atol: Absolute tolerance
+        :param time: An optional object with a ``value`` attribute (e.g. the time symbol of
+            the system) which is set to the time of each stage and increased by delta_t after the step
         '''
-        # To be developed ( for now its just the euler method )
-        return NumericIntegration.euler(q_values, dq_values, ddq_values, delta_t)
+        if accelerations is None:
+            return NumericIntegration.euler(q_values, dq_values, ddq_values, delta_t, time=time)
+        if workspace is None:
+            workspace = {}
+        _rk_adaptive(_rk23_tableau, 2, q_values, dq_values, ddq_values, delta_t, accelerations, workspace, rtol, atol, time)
 
 
 
@@ -59,4 +310,4 @@ class NumericIntegration:
         '''
         Returns a list of all the integration methods
         '''
-        return (cls.euler, cls.rk4)
+        return (cls.euler, cls.rk4, cls.rk45, cls.rk23)
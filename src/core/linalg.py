@@ -0,0 +1,107 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This script defines helper functions to factorize and solve dense linear
+systems. scipy is used if its installed, otherwise numpy is used instead
+'''
+
+######## Import statements ########
+
+import numpy as np
+
+try:
+    import scipy.linalg
+    _scipy_installed = True
+except ImportError:
+    # No problem, numpy is used instead
+    _scipy_installed = False
+
+
+
+
+######## Helper functions ########
+
+def lu_factor(a):
+    '''lu_factor(a: np.ndarray) -> Any
+    Compute the LU factorization of the given square matrix. Its contents can be
+    overwritten by this function.
+
+    :return: The factorization of the matrix (to be passed to ``lu_solve``)
+    '''
+    if _scipy_installed:
+        return scipy.linalg.lu_factor(a, overwrite_a=True, check_finite=False)
+    return a
+
+
+def lu_solve(lu, b):
+    '''lu_solve(lu: Any, b: np.ndarray) -> np.ndarray
+    Solve the linear system with the LU factorization returned by ``lu_factor``
+    '''
+    if _scipy_installed:
+        return scipy.linalg.lu_solve(lu, b, check_finite=False)
+    return np.linalg.solve(lu, b)
+
+
+
+def cho_factor(a):
+    '''cho_factor(a: np.ndarray) -> Any
+    Compute the Cholesky factorization of the given symmetric positive definite matrix. Its contents can be
+    overwritten by this function.
+
+    :return: The factorization of the matrix (to be passed to ``cho_solve``)
+    :raises np.linalg.LinAlgError: If the matrix is not positive definite
+    '''
+    if _scipy_installed:
+        try:
+            return scipy.linalg.cho_factor(a, lower=True, overwrite_a=True, check_finite=False)
+        except scipy.linalg.LinAlgError as e:
+            raise np.linalg.LinAlgError(*e.args)
+    return np.linalg.cholesky(a)
+
+
+def cho_solve(c, b):
+    '''cho_solve(c: Any, b: np.ndarray) -> np.ndarray
+    Solve the linear system with the Cholesky factorization returned by ``cho_factor``
+    '''
+    if _scipy_installed:
+        return scipy.linalg.cho_solve(c, b, check_finite=False)
+    return np.linalg.solve(c.T, np.linalg.solve(c, b))
+
+
+
+def qr_factor(a):
+    '''qr_factor(a: np.ndarray) -> Any
+    Compute the QR factorization of the given matrix (of any shape) to solve linear systems
+    in the least squares sense (if it has more rows than columns) or to find their minimum norm
+    solution (if it has more columns than rows). If the matrix is rank deficient, the systems will be
+    solved with ``numpy.linalg.lstsq`` instead.
+
+    :return: The factorization of the matrix (to be passed to ``qr_solve``)
+    '''
+    transposed = a.shape[0] < a.shape[1]
+    q, r = np.linalg.qr(a.T if transposed else a)
+    diag = np.abs(np.diag(r))
+    if diag.size > 0 and diag.min() <= diag.max() * max(a.shape) * np.finfo(np.float64).eps:
+        # Rank deficient matrix
+        return (None, None, np.array(a, dtype=np.float64))
+    return (transposed, q, r)
+
+
+def qr_solve(f, b):
+    '''qr_solve(f: Any, b: np.ndarray) -> np.ndarray
+    Solve the linear system with the QR factorization returned by ``qr_factor``
+    '''
+    transposed, q, r = f
+    if transposed is None:
+        return np.linalg.lstsq(r, b, rcond=None)[0]
+    if transposed:
+        # Minimum norm solution: a = r^T * q^T, x = q * r^-T * b
+        return q @ _solve_triangular(r, b, trans=True)
+    # Least squares solution: x = r^-1 * q^T * b
+    return _solve_triangular(r, q.T @ b)
+
+
+def _solve_triangular(r, b, trans=False):
+    # Solve the linear system with the given upper triangular matrix (or its transpose)
+    if _scipy_installed:
+        return scipy.linalg.solve_triangular(r, b, trans='T' if trans else 'N', check_finite=False)
+    return np.linalg.solve(r.T if trans else r, b)
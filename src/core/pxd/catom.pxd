@@ -0,0 +1,20 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This file will declare all the methods and classes defined in the lib3d
+mec ginac atom.h that will be used by this library
+'''
+
+
+
+######## Imports ########
+
+# Imports from other .pxd files
+from src.core.pxd.ginac.cexpr cimport ex
+from src.core.pxd.csymbol_numeric cimport symbol_numeric
+
+
+######## Class atom ########
+
+cdef extern from "atom.h":
+    cdef cppclass atom(symbol_numeric):
+        ex get_expression()
@@ -34,6 +34,7 @@ cdef extern from "Globals.h":
     
     # Atomization   
     ex atomize_ex(ex)
+    ex atom_to_expression(ex)
     
     # Substitution
     Matrix subs(Matrix, Matrix, float)
@@ -28,6 +28,11 @@ cdef extern from "ginac/ex.h" namespace "GiNaC":
         # Queries
         bint is_equal(ex&)
         bint is_zero()
+        unsigned gethash() const
+
+        # Operands
+        size_t nops() const
+        ex op(size_t) const
 
         # Evaluation
         ex eval() const
@@ -0,0 +1,29 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This file declares the C++ Class GiNaC::parser, which is used by this library
+to read back expressions printed in the GiNaC default format
+'''
+
+
+######## Imports ########
+
+from libcpp.string cimport string
+from libcpp.map cimport map
+
+from src.core.pxd.ginac.cexpr cimport ex
+
+
+
+######## Symbols table ########
+
+cdef extern from "ginac/parse_context.h" namespace "GiNaC":
+    ctypedef map[string, ex] symtab
+
+
+
+######## Class GiNaC::parser ########
+
+cdef extern from "ginac/parser.h" namespace "GiNaC":
+    cdef cppclass parser:
+        parser(const symtab&, const bint) except +
+        ex operator()(const string&) except +
@@ -1,6 +1,6 @@
 '''
 Author: Víctor Ruiz Gómez
-Description: This file declares the C++ print_context, print_python, print_latex
+Description: This file declares the C++ print_context, print_dflt, print_python, print_latex
 classes and the function set_print_func of GiNaC in order to be used by this
 library
 '''
@@ -17,6 +17,9 @@ cdef extern from "ginac/print.h" namespace "GiNaC":
     cdef cppclass print_context:
         ostream& s
 
+    cdef cppclass print_dflt(print_context):
+        print_dflt(ostream&) except +
+
     cdef cppclass print_python(print_context):
         print_python(ostream&) except +
 
@@ -27,6 +27,16 @@ cpdef str _print_expr_py(Expr atom_expr):
     return (<bytes>out.str()).decode()
 
 
+cpdef str _print_expr_dflt(Expr expr):
+    # This routine prints a GiNaC::ex (unatomized) with the GiNaC default format (its used
+    # to save expressions, which are read back later with the GiNaC parser)
+    cdef c_sstream out
+    cdef c_ginac_printer* c_printer = new c_ginac_dflt_printer(out)
+    c_unatomize(expr._c_handler).print(c_deref(c_printer))
+    del c_printer
+    return (<bytes>out.str()).decode()
+
+
 
 
 ######## Class Expr ########
@@ -288,6 +298,13 @@ cdef class Expr(Object):
 
 
 
+    def _get_hash(self):
+        # Returns the structural hash of this expression (computed by GiNaC). Expressions
+        # with the same contents have the same hash
+        return self._c_handler.gethash()
+
+
+
 LatexRenderable.register(Expr)
 
 
@@ -1164,6 +1164,19 @@ cdef class Matrix(Object):
 
     ######## Misc ########
 
+    def _get_hash(self):
+        # Returns a hash of the contents of this matrix: its shape and the structural hashes
+        # of its entries (computed by GiNaC). Matrices with the same contents have the same hash
+        cdef c_Matrix* c_mat = self._get_c_handler()
+        cdef long i, j
+        hashes = [c_mat.rows(), c_mat.cols()]
+        for i in range(0, c_mat.rows()):
+            for j in range(0, c_mat.cols()):
+                hashes.append(c_mat.get(i, j).gethash())
+        return hash(tuple(hashes))
+
+
+
     def __eq__(self, other):
         if not isinstance(other, Matrix):
             return False
@@ -18,6 +18,29 @@ cdef void outError(const char* msg):
 ctypedef c_vector[c_symbol_numeric*] c_symbol_numeric_list
 
 
+
+cdef frozenset _ex_symbols_names(c_ex e, dict atoms_symbols):
+    # Returns the names of the symbols (excluding atoms) which the given expression depends on.
+    # Atoms are replaced by the symbols of their expressions (they are computed only once and
+    # stored in the given dictionary)
+    cdef size_t i
+    if c_is_a[c_atom](e):
+        name = (<bytes>c_ex_to[c_symbol](e).get_name()).decode()
+        names = atoms_symbols.get(name)
+        if names is None:
+            names = _ex_symbols_names(c_atom_to_expression(e), atoms_symbols)
+            atoms_symbols[name] = names
+        return names
+
+    if c_is_a[c_symbol](e):
+        return frozenset(((<bytes>c_ex_to[c_symbol](e).get_name()).decode(),))
+
+    names = set()
+    for i in range(0, e.nops()):
+        names.update(_ex_symbols_names(e.op(i), atoms_symbols))
+    return frozenset(names)
+
+
 # All numeric symbol types
 _symbol_types = frozenset(map(str.encode, (
     'coordinate', 'velocity', 'acceleration',
@@ -50,6 +73,8 @@ cdef class _System:
 
     cdef c_System* _c_handler
     cdef bint _autogen_latex_names
+    cdef dict _derivatives
+    cdef dict _atoms_symbols
 
 
     ######## Constructor & Destructor ########
@@ -61,6 +86,11 @@ cdef class _System:
 
         self._autogen_latex_names = True
 
+        # Derivatives of expressions computed element by element (indexed by the structural hash
+        # of the expressions) & symbols which the atoms depend on
+        self._derivatives = {}
+        self._atoms_symbols = {}
+
 
     def __dealloc__(self):
         del self._c_handler
@@ -1352,6 +1382,43 @@ cdef class _System:
 
 
 
+    cpdef _sparse_jacobian(self, x, y):
+        if not isinstance(x, Matrix):
+            raise TypeError('The first argument must be a matrix')
+        if x.get_num_rows() != 1 and x.get_num_cols() != 1:
+            raise ValueError('The first argument must be a row-matrix or col-matrix')
+
+        if not isinstance(y, Matrix):
+            raise TypeError('The second argument must be a matrix')
+        if y.get_num_cols() != 1 and y.get_num_rows() != 1:
+            raise ValueError('The second argument must be a column-matrix')
+        if not y.are_all_values_symbols(self):
+            raise ValueError('All symbolic expressions in the second matrix should be composed only by one symbol')
+
+        symbols = y.get_values_as_symbols(self)
+        columns = dict(zip(map(methodcaller('get_name'), symbols), range(0, len(symbols))))
+
+        # Only the derivatives with respect the symbols each expression depends on are computed
+        rows, cols, values = [], [], []
+        for i, expr in enumerate(x):
+            indices = []
+            for name in _ex_symbols_names((<Expr>expr)._c_handler, self._atoms_symbols):
+                if name in columns:
+                    indices.append(columns[name])
+            indices.sort()
+
+            for j in indices:
+                value = self._cached_diff(expr, symbols[j])
+                if (<Expr>value)._c_handler.is_zero():
+                    continue
+                rows.append(i)
+                cols.append(j)
+                values.append(value)
+
+        return rows, cols, values
+
+
+
     cpdef _diff(self, x, symbol):
         if not isinstance(symbol, (str, SymbolNumeric)):
             raise TypeError('symbol must be a SymbolNumeric or str object')
@@ -1401,6 +1468,52 @@ cdef class _System:
 
 
 
+    cdef _cached_diff(self, Expr expr, SymbolNumeric symbol):
+        # Derivative of an expression with respect a symbol. Results are memoized by the
+        # structural hash of the expression, so that expressions which didnt change are
+        # not differentiated again when the model is redefined
+        key = (expr._c_handler.gethash(), symbol.get_name(), bool(c_atomization))
+        entries = self._derivatives.get(key)
+        if entries is None:
+            entries = self._derivatives[key] = []
+        for other, value in entries:
+            if expr._c_handler.is_equal((<Expr>other)._c_handler):
+                return value
+        value = self._diff(expr, symbol)
+        entries.append((Expr(expr), value))
+        return value
+
+
+
+    cpdef _parse_exprs(self, texts):
+        # Parses expressions printed with the GiNaC default format. Symbol names are replaced
+        # with the symbols defined within this system
+        cdef c_ginac_symtab table
+        cdef c_ginac_parser* parser
+        for symbol in self._get_symbols():
+            table[(<bytes>symbol.get_name().encode())] = c_ex(c_deref(<c_basic*>((<SymbolNumeric>symbol)._c_handler)))
+
+        parser = new c_ginac_parser(table, True)
+        exprs = []
+        try:
+            for text in texts:
+                exprs.append(_expr_from_c(c_deref(parser)(<c_string>(text.encode()))))
+        finally:
+            del parser
+        return exprs
+
+
+
+    def _clear_derivatives_cache(self):
+        self._derivatives.clear()
+
+
+
+    def _get_derivatives_cache_size(self):
+        return sum(map(len, self._derivatives.values()))
+
+
+
 
     ######## Solid operations ########
 
@@ -1428,9 +1541,11 @@ cdef class _System:
     ######## Numeric evaluation ########
 
 
-    cpdef _compile_numeric_function(self, matrix, c_optimized):
+    cpdef _compile_numeric_function(self, matrix, c_optimized, c_backend=False):
+        if isinstance(matrix, (list, tuple)):
+            return self._compile_numeric_function_fused(matrix, c_optimized, c_backend)
         if not isinstance(matrix, Matrix):
-            raise TypeError('Input argument must be a Matrix')
+            raise TypeError('Input argument must be a Matrix or a list of matrices')
 
         cdef c_lst atom_lst
         cdef c_lst expr_lst
@@ -1447,7 +1562,42 @@ cdef class _System:
         outputs = [[_print_expr_py(matrix.get(i, j)) for j in range(0, m)] for i in range(0, n)]
 
         # Create the numeric function
-        return NumericFunction(atoms, outputs, self, c_optimized=c_optimized)
+        return NumericFunction(atoms, outputs, self, c_optimized=c_optimized, c_backend=c_backend)
+
+
+    cpdef _compile_numeric_function_fused(self, matrices, c_optimized, c_backend=False):
+        matrices = tuple(matrices)
+        if not matrices:
+            raise ValueError('At least one matrix must be specified')
+        for matrix in matrices:
+            if not isinstance(matrix, Matrix):
+                raise TypeError('Input argument must be a Matrix or a list of matrices')
+
+        cdef c_lst atom_lst
+        cdef c_lst expr_lst
+
+        # Stack the elements of all the matrices in a single column matrix, so that
+        # atoms shared between them are only computed once
+        values = tuple(chain.from_iterable(map(methodcaller('get_values'), matrices)))
+        cdef Matrix stacked = Matrix(values, shape=(len(values), 1))
+
+        # Optimize matrix list
+        c_matrix_list_optimize(c_deref(stacked._get_c_handler()), atom_lst, expr_lst)
+
+        # Get the list of atoms with their expressions
+        atoms = dict(zip([(<bytes>(c_ex_to[c_symbol](atom_lst.op(i))).get_name()).decode() for i in range(0, atom_lst.nops())],
+                        [_print_expr_py(_expr_from_c(expr_lst.op(i))) for i in range(0, expr_lst.nops())]))
+
+        # Split the optimized elements again (one list of lists per matrix)
+        values = [_print_expr_py(stacked.get(k, 0)) for k in range(0, len(values))]
+        outputs, k = [], 0
+        for matrix in matrices:
+            n, m = matrix.shape
+            outputs.append([values[k+i*m : k+(i+1)*m] for i in range(0, n)])
+            k += n * m
+
+        # Create the numeric function
+        return NumericFunction(atoms, outputs, self, c_optimized=c_optimized, fused=True, c_backend=c_backend)
 
 
 
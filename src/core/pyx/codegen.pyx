@@ -0,0 +1,294 @@
+'''
+Author: Víctor Ruiz Gómez
+Description:
+This module defines helper routines to translate the expressions of numeric functions
+(python code) to C and to build them as shared libraries loaded with ctypes
+'''
+
+
+
+######## Translation of expressions to C ########
+
+# Numeric values of the constants which can appear in the expressions
+_c_constants = {'pi': repr(math.pi), 'tau': repr(math.tau), 'euler': repr(math.e)}
+
+# Math functions which can appear in the expressions and their C counterparts
+_c_functions = {
+    'sin': 'sin', 'cos': 'cos', 'tan': 'tan', 'asin': 'asin', 'acos': 'acos', 'atan': 'atan',
+    'atan2': 'atan2', 'sinh': 'sinh', 'cosh': 'cosh', 'tanh': 'tanh',
+    'exp': 'exp', 'log': 'log', 'sqrt': 'sqrt', 'abs': 'fabs'
+}
+
+# Subscripts are wrapped with ast.Index before python 3.9
+_ast_index = getattr(ast, 'Index', ())
+
+# Binary operators
+_c_binary_operators = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/'}
+
+# Precedence of the binary operators. Operands are only enclosed in parentheses when needed
+# (long sums would be printed with hundreds of nested parentheses otherwise, which cython and
+# some C compilers cannot parse). Unary operations, function calls, ... are never split
+_binary_operators_precedence = {ast.Add: 1, ast.Sub: 1, ast.Mult: 2, ast.Div: 2, ast.Pow: 3}
+
+
+
+def _expr_to_c(source, symbol_ref):
+    # Translates the given expression (python code generated for numeric functions) to C.
+    # symbol_ref is a function which takes a symbol type and the index of a symbol and returns
+    # the C expression to read its value
+    return _node_to_c(ast.parse(source, mode='eval').body, symbol_ref)
+
+
+
+def _node_constant(node):
+    # Returns the value of the given node if its a numeric constant or None otherwise
+    # (numbers are parsed as ast.Num instead of ast.Constant with python 3.7)
+    value = node.value if isinstance(node, ast.Constant) else getattr(node, 'n', None) if type(node).__name__ == 'Num' else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+
+def _binop_to_code(node, left, right, operator, split_pow=False):
+    # Prints the given binary operation with the code of its operands (parentheses are added
+    # only if the precedence of the operands requires them, the evaluation order is preserved).
+    # split_pow indicates if power operations are printed with an operator (python) or
+    # as function calls (C)
+    precedence = lambda child: _binary_operators_precedence.get(type(child.op), 4) \
+        if isinstance(child, ast.BinOp) and (split_pow or not isinstance(child.op, ast.Pow)) else 4
+    op_precedence = _binary_operators_precedence[type(node.op)]
+    if isinstance(node.op, ast.Pow):
+        # Power is right associative
+        left_parens, right_parens = precedence(node.left) <= op_precedence, precedence(node.right) < op_precedence
+    else:
+        left_parens, right_parens = precedence(node.left) < op_precedence, precedence(node.right) <= op_precedence
+    if left_parens:
+        left = f'({left})'
+    if right_parens:
+        right = f'({right})'
+    return f'{left}{operator}{right}'
+
+
+
+def _unary_operand_to_code(node, operand):
+    # Binary operations are printed without enclosing parentheses (see _binop_to_code), so
+    # they must be added when they are the operand of an unary operation e.g: -(x+y)
+    if isinstance(node.operand, ast.BinOp):
+        return f'({operand})'
+    return operand
+
+
+
+def _node_to_c(node, symbol_ref):
+    if isinstance(node, ast.BinOp):
+        left, right = _node_to_c(node.left, symbol_ref), _node_to_c(node.right, symbol_ref)
+        if isinstance(node.op, ast.Pow):
+            # Small integer exponents of atoms & symbols are expanded as products
+            exponent = node.right
+            if isinstance(exponent, ast.UnaryOp) and isinstance(exponent.op, ast.USub) and _node_constant(exponent.operand) is not None:
+                exponent = -_node_constant(exponent.operand)
+            else:
+                exponent = _node_constant(exponent)
+            if not isinstance(node.left, (ast.Name, ast.Subscript)) and exponent != 0.5:
+                exponent = None
+            if exponent in (2, 3, 4):
+                return '(' + '*'.join(repeat(left, exponent)) + ')'
+            if exponent in (-1, -2):
+                return '(1.0/(' + '*'.join(repeat(left, -exponent)) + '))'
+            if exponent == 0.5:
+                return f'sqrt({left})'
+            return f'pow({left}, {right})'
+        if type(node.op) not in _c_binary_operators:
+            raise ValueError(f'Unsupported operator "{type(node.op).__name__}"')
+        return _binop_to_code(node, left, right, _c_binary_operators[type(node.op)])
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _unary_operand_to_code(node, _node_to_c(node.operand, symbol_ref))
+        if isinstance(node.op, ast.USub):
+            return f'(-{operand})'
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        raise ValueError(f'Unsupported operator "{type(node.op).__name__}"')
+
+    if _node_constant(node) is not None:
+        # All numbers are written as floating point literals (to avoid integer divisions)
+        return repr(float(_node_constant(node)))
+
+    if isinstance(node, ast.Name):
+        return _c_constants.get(node.id, node.id)
+
+    if isinstance(node, ast.Subscript):
+        # Symbol values e.g: param[1, 0]
+        index = node.slice.value if isinstance(node.slice, _ast_index) else node.slice
+        if not isinstance(node.value, ast.Name) or not isinstance(index, ast.Tuple) or _node_constant(index.elts[0]) is None:
+            raise ValueError('Unsupported subscript')
+        return symbol_ref(node.value.id, _node_constant(index.elts[0]))
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _c_functions or node.keywords:
+            raise ValueError('Unsupported function call')
+        args = ', '.join(_node_to_c(arg, symbol_ref) for arg in node.args)
+        return f'{_c_functions[node.func.id]}({args})'
+
+    raise ValueError(f'Unsupported expression "{type(node).__name__}"')
+
+
+
+
+
+######## Common subexpressions elimination ########
+
+# Functions whose values are computed together when they have the same argument (compilers
+# fuse them into a single sincos call if they are evaluated next to each other)
+_paired_functions = {'sin': 'cos', 'cos': 'sin'}
+
+# Operators printed by _node_to_py
+_py_operators = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Pow: '**'}
+
+
+
+def _eliminate_common_subexpressions(atoms, outputs):
+    # Takes a list of pairs (name, expression) with the atoms of a numeric function and the list
+    # of its output expressions (python code). Subexpressions (operations & function calls) repeated
+    # among them are assigned to new temporal variables (__cse0__, __cse1__, ...).
+    # sin & cos of the same argument are also assigned to temporal variables next to each other.
+    # Returns the new list of atoms (including the temporal variables) and outputs
+    trees = [ast.parse(value, mode='eval').body for name, value in atoms]
+    trees.extend(ast.parse(output, mode='eval').body for output in outputs)
+
+    # Count the occurrences of each subexpression (subexpressions of a repeated one are
+    # only counted once)
+    counts, pairs = {}, {}
+    def count(node):
+        if _is_cse_candidate(node):
+            key = ast.dump(node)
+            counts[key] = counts.get(key, 0) + 1
+            if counts[key] > 1:
+                return
+            if isinstance(node, ast.Call) and node.func.id in _paired_functions and len(node.args) == 1:
+                partner = ast.Call(func=ast.Name(id=_paired_functions[node.func.id], ctx=ast.Load()), args=node.args, keywords=[])
+                pairs[key] = (ast.dump(partner), _paired_functions[node.func.id])
+        for child in ast.iter_child_nodes(node):
+            count(child)
+
+    for tree in trees:
+        count(tree)
+
+    hoisted = set(key for key, num in counts.items() if num > 1)
+    hoisted.update(key for key, (partner_key, partner) in pairs.items() if partner_key in counts)
+    if not hoisted:
+        return list(atoms), list(outputs)
+
+    # Replace the subexpressions with the temporal variables (they are defined before the
+    # first expression where they appear)
+    temps, lines = {}, []
+    def rewrite(node):
+        key = ast.dump(node) if _is_cse_candidate(node) else None
+        if key is not None and key in hoisted:
+            if key not in temps:
+                node = rewrite_children(node)
+                temps[key] = f'__cse{len(temps)}__'
+                lines.append((temps[key], _node_to_py(node)))
+                if key in pairs and pairs[key][0] in hoisted and pairs[key][0] not in temps:
+                    partner_key, partner = pairs[key]
+                    temps[partner_key] = f'__cse{len(temps)}__'
+                    lines.append((temps[partner_key], f'{partner}({_node_to_py(node.args[0])})'))
+            return ast.Name(id=temps[key], ctx=ast.Load())
+        return rewrite_children(node)
+
+    def rewrite_children(node):
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                setattr(node, field, [rewrite(item) if isinstance(item, ast.AST) else item for item in value])
+            elif isinstance(value, ast.AST):
+                setattr(node, field, rewrite(value))
+        return node
+
+    for (name, value), tree in zip(atoms, trees):
+        tree = rewrite(tree)
+        lines.append((name, _node_to_py(tree)))
+    # Temporal variables which only appear in the outputs are defined after the atoms
+    outputs = [_node_to_py(rewrite(tree)) for tree in trees[len(atoms):]]
+    return lines, outputs
+
+
+
+def _is_cse_candidate(node):
+    # Only operations & function calls which depend on symbols or atoms are candidates
+    # to be replaced by temporal variables
+    return isinstance(node, (ast.BinOp, ast.Call)) and _has_variables(node)
+
+
+
+def _has_variables(node):
+    if isinstance(node, ast.Subscript):
+        return True
+    if isinstance(node, ast.Name):
+        return node.id not in _c_constants
+    if isinstance(node, ast.Call):
+        return any(map(_has_variables, node.args))
+    return any(map(_has_variables, ast.iter_child_nodes(node)))
+
+
+
+def _node_to_py(node):
+    # Converts the given expression (parsed with the ast module) back to python code
+    if isinstance(node, ast.BinOp):
+        return _binop_to_code(node, _node_to_py(node.left), _node_to_py(node.right), _py_operators[type(node.op)], split_pow=True)
+    if isinstance(node, ast.UnaryOp):
+        return f'({"-" if isinstance(node.op, ast.USub) else "+"}{_unary_operand_to_code(node, _node_to_py(node.operand))})'
+    if _node_constant(node) is not None:
+        return repr(_node_constant(node))
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Subscript):
+        index = node.slice.value if isinstance(node.slice, _ast_index) else node.slice
+        return f'{_node_to_py(node.value)}[{", ".join(map(_node_to_py, index.elts))}]'
+    if isinstance(node, ast.Call):
+        return f'{_node_to_py(node.func)}({", ".join(map(_node_to_py, node.args))})'
+    raise ValueError(f'Unsupported expression "{type(node).__name__}"')
+
+
+
+
+
+######## Building C sources as shared libraries ########
+
+# Header of the C sources generated for numeric functions
+_c_source_header = [
+    '#include <math.h>',
+    '#include <stddef.h>',
+    '#ifdef _WIN32',
+    '#define EXPORT __declspec(dllexport)',
+    '#else',
+    '#define EXPORT',
+    '#endif'
+]
+
+
+
+def _build_shared_library(c_filepath_name, module_name, build_dir):
+    # Compiles the given C source file as a shared library in the given directory (the C compiler
+    # used to build python extensions is invoked via the distutils API) and returns its path
+    import setuptools
+    from distutils.ccompiler import new_compiler
+    from distutils.sysconfig import customize_compiler
+
+    compiler = new_compiler()
+    customize_compiler(compiler)
+    objects = compiler.compile([c_filepath_name], output_dir=build_dir,
+        extra_postargs=[] if os.name == 'nt' else ['-O3'])
+    filepath_name = os.path.join(build_dir, module_name + _shared_library_suffix())
+    compiler.link_shared_object(objects, filepath_name, libraries=[] if os.name == 'nt' else ['m'])
+    return filepath_name
+
+
+
+def _shared_library_suffix():
+    # Returns the file extension of shared libraries in this platform
+    if os.name == 'nt':
+        return '.dll'
+    if sys.platform == 'darwin':
+        return '.dylib'
+    return '.so'
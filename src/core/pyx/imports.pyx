@@ -46,6 +46,7 @@ from src.core.pxd.cpoint          cimport Point          as c_Point
 from src.core.pxd.cframe          cimport Frame          as c_Frame
 from src.core.pxd.csolid          cimport Solid          as c_Solid
 from src.core.pxd.cwrench3D       cimport Wrench3D       as c_Wrench3D
+from src.core.pxd.catom           cimport atom           as c_atom
 
 
 # Global functions
@@ -55,6 +56,7 @@ from src.core.pxd.cglobals        cimport unatomize            as c_unatomize
 from src.core.pxd.cglobals        cimport atomize_ex           as c_atomize_ex
 from src.core.pxd.cglobals        cimport subs                 as c_subs
 from src.core.pxd.cglobals        cimport matrix_list_optimize as c_matrix_list_optimize
+from src.core.pxd.cglobals        cimport atom_to_expression   as c_atom_to_expression
 
 
 
@@ -74,10 +76,14 @@ from src.core.pxd.ginac.cexpr cimport ex_to as c_ex_to
 
 # Printing classes & functions
 from src.core.pxd.ginac.cprint cimport print_context  as c_ginac_printer
+from src.core.pxd.ginac.cprint cimport print_dflt     as c_ginac_dflt_printer
 from src.core.pxd.ginac.cprint cimport print_python   as c_ginac_python_printer
 from src.core.pxd.ginac.cprint cimport print_latex    as c_ginac_latex_printer
 from src.core.pxd.ginac.cprint cimport set_print_func as c_ginac_set_print_func
 
+# Parsing
+from src.core.pxd.ginac.cparser cimport parser as c_ginac_parser, symtab as c_ginac_symtab
+
 # Symbolic math functions
 from src.core.pxd.ginac.cmath cimport pow as c_sym_pow
 from src.core.pxd.ginac.cmath cimport sin as c_sym_sin, cos as c_sym_cos, tan as c_sym_tan
@@ -93,17 +99,22 @@ from src.core.pxd.ginac.cmath cimport Pi as c_sym_pi, Catalan as c_sym_catalan,
 # Collections
 from collections import OrderedDict, deque
 from collections.abc import Iterable, Mapping, Sized
+from weakref import WeakValueDictionary
+from contextlib import contextmanager
 
 # Utilities
 from functools import partial, partialmethod, wraps
-from itertools import chain, starmap, repeat, product
+from itertools import chain, starmap, repeat, product, accumulate
 from operator import attrgetter, methodcaller, add
 from warnings import warn
 from abc import ABC
 from types import MethodType
-from re import match, finditer, sub
+from re import match, finditer, findall, sub
 from inspect import Signature, Parameter
+from concurrent.futures import Future, ThreadPoolExecutor
 import json
+import ast
+import ctypes
 
 # Math
 import math
@@ -117,6 +128,13 @@ import sys, os
 import os.path
 import subprocess
 import importlib
+import importlib.util
+import sysconfig
+import tempfile
+import threading
+import shutil
+import hashlib
+import time
 
 # Third party libraries
 from asciitree import LeftAligned
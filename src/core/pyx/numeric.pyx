@@ -6,65 +6,365 @@ This module defines the class NumericFunction
 
 
 
+######## Helper functions ########
+
+@contextmanager
+def _redirected_output(file):
+    # Context manager which redirects the standard output & error of this process (at the
+    # file descriptor level, so that the output of the C compiler is also captured) to the given file
+    sys.stdout.flush()
+    sys.stderr.flush()
+    prev_stdout_fd, prev_stderr_fd = os.dup(1), os.dup(2)
+    try:
+        os.dup2(file.fileno(), 1)
+        os.dup2(file.fileno(), 2)
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(prev_stdout_fd, 1)
+        os.dup2(prev_stderr_fd, 2)
+        os.close(prev_stdout_fd)
+        os.close(prev_stderr_fd)
+
+
+# Only one build can run in-process at the same time
+_in_process_build_lock = threading.Lock()
+
+
+def _run_build(function, *args, in_process=False):
+    # Invokes the given function of this module (which builds an extension or a shared library).
+    # Messages printed by cython or the C compiler are captured and attached to the exception
+    # raised if the build fails.
+    # If in_process is True, the function is called within this process and its output is captured
+    # redirecting the standard output & error file descriptors (this must only be done by the main
+    # thread, because they are shared by all threads and the cython compiler is not thread safe).
+    # Otherwise, it is called on a child python process (builds on background threads or many
+    # builds in parallel)
+    if in_process:
+        with _in_process_build_lock, tempfile.TemporaryFile(mode='w+') as log:
+            try:
+                with _redirected_output(log):
+                    function(*args)
+            except Exception as e:
+                log.seek(0)
+                raise RuntimeError(f'Failed to compile numeric function:\n{log.read()}') from e
+        return
+
+    name = function.__name__
+    result = subprocess.run(
+        [sys.executable, '-c', f'import sys; from {__name__} import {name}; {name}(*sys.argv[1:])', *args],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'Failed to compile numeric function:\n{result.stdout}')
+
+
+
+def _build_cython_extension(pyx_filepath_name, module_name, build_dir):
+    # Generates & compiles the given cython source file as an extension in the given directory
+    # (cython and the C compiler are invoked via their python API)
+    from Cython.Build import cythonize
+    from setuptools import Distribution, Extension
+
+    extensions = cythonize(
+        [Extension(module_name, [pyx_filepath_name])],
+        compiler_directives={'language_level': 3}, force=True, quiet=True)
+
+    distribution = Distribution({'name': module_name, 'ext_modules': extensions})
+    command = distribution.get_command_obj('build_ext')
+    command.build_lib, command.build_temp = build_dir, os.path.join(build_dir, 'temp')
+    command.force = True
+    command.ensure_finalized()
+    command.run()
+
+
+
+
 ######## class CythonNumericFunctionExtensionsCompiler  ########
 
 class CythonNumericFunctionExtensionsCompiler:
     '''
-    Helper class to compile numeric functions as cython extensions
+    Helper class to compile numeric functions as cython extensions.
+
+    The compiled extensions are stored in a persistent cache directory which is shared
+    between processes. Each extension is indexed by a hash of its source code and the versions of
+    the tools used to build it (python, cython, numpy and the C compiler), so that a numeric function
+    compiled previously (even by another process) is loaded directly without running cythonize again.
+
+    When the size of the cache exceeds its limit, the least recently used extensions are removed.
+
+    Many extensions can be compiled at once: those which are not cached are built in parallel
+    (one build process per core by default).
     '''
     _singleton = None
-    _numfuncs_dir = '_numfuncs'
-    _stdout_logfile = '.stdout.log.txt'
-    _stderr_logfile = '.stderr.log.txt'
+    _module_prefix = '_numfunc_'
+    _build_dir_prefix = '.build_'
 
 
     def __init__(self):
-        self._numfuncs_count = 0
-        self._initialized = False
+        self._cache_dir = None
+        self._cache_max_size = 256 * 2 ** 20
+        self._max_build_workers = None
+        self._modules = {}
+        self._build_tools = None
+        # One lock per cache entry being built by this process
+        self._build_locks, self._build_locks_lock = WeakValueDictionary(), threading.Lock()
+
+
+
+    ######## Cache configuration ########
+
+    def get_cache_dir(self):
+        if self._cache_dir is None:
+            cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            self._cache_dir = os.path.join(cache_home, 'lib3d_mec_ginac', 'numfuncs')
+        return self._cache_dir
+
+
+    def set_cache_dir(self, path):
+        if not isinstance(path, str):
+            raise TypeError('Cache directory must be a string')
+        if os.path.exists(path) and not os.path.isdir(path):
+            raise ValueError(f'"{path}" is not a directory')
+        self._cache_dir = path
+
+
+    def get_cache_max_size(self):
+        return self._cache_max_size
+
+
+    def set_cache_max_size(self, size):
+        if not isinstance(size, int) or size < 0:
+            raise TypeError('Cache size must be an integer greater or equal than zero')
+        self._cache_max_size = size
+
+
+    def get_max_build_workers(self):
+        if self._max_build_workers is None:
+            return os.cpu_count() or 1
+        return self._max_build_workers
 
 
-    def compile(self, source, funcname):
-        if not self._initialized:
-            self._initialized = True
-            numfuncs_dir = self._numfuncs_dir
+    def set_max_build_workers(self, num_workers):
+        if num_workers is not None and (not isinstance(num_workers, int) or num_workers <= 0):
+            raise TypeError('Number of build workers must be an integer greater than zero')
+        self._max_build_workers = num_workers
+
+
+    def clear_cache(self):
+        cache_dir = self.get_cache_dir()
+        if not os.path.isdir(cache_dir):
+            return
+        for filename in filter(methodcaller('startswith', self._module_prefix), os.listdir(cache_dir)):
             try:
-                if os.path.exists(numfuncs_dir) and not os.path.isdir(numfuncs_dir):
-                    raise RuntimeError
-                if not os.path.exists(numfuncs_dir):
-                    os.mkdir(numfuncs_dir)
-                with open(os.path.join(numfuncs_dir, '__init__.py'), 'w') as file:
-                    pass
+                os.remove(os.path.join(cache_dir, filename))
+            except FileNotFoundError:
+                pass
+
+
+
+    ######## Compilation ########
+
+    def _get_build_tools(self):
+        # Returns a dictionary with the versions of the building tools and the configuration of
+        # this python interpreter. It is computed only once with a lock held (neither sysconfig nor
+        # the import system are thread safe the first time they are used)
+        with self._build_locks_lock:
+            if self._build_tools is None:
+                try:
+                    cython_version = importlib.import_module('Cython').__version__
+                except ImportError:
+                    cython_version = ''
+                self._build_tools = {
+                    'python': sys.version, 'cython': cython_version, 'numpy': np.__version__,
+                    'cc': sysconfig.get_config_var('CC') or '',
+                    'ext_suffix': sysconfig.get_config_var('EXT_SUFFIX') or ''
+                }
+            return self._build_tools
+
+
+    def _get_source_hash(self, source):
+        # Returns a hash of the given source code (the version of the building tools
+        # are also taken into account)
+        tools = self._get_build_tools()
+        key = '\n'.join([
+            source, tools['python'], tools['cython'], tools['numpy'],
+            os.environ.get('CC', tools['cc']),
+            os.environ.get('CFLAGS', ''),
+            tools['ext_suffix']
+        ])
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+
+    def compile(self, source):
+        # Compiles the given cython source code as an extension and returns the module imported
+        return self.compile_many([source])[0]
+
 
-                for filename in filter(methodcaller('startswith', '_numfunc_'), os.listdir(numfuncs_dir)):
-                    os.remove(os.path.join(numfuncs_dir, filename))
+    def compile_c(self, source):
+        # Compiles the given C source code as a shared library and returns it loaded with ctypes
+        return self.compile_c_many([source])[0]
 
-            except FileExistsError:
-                raise RuntimeError
 
+    def compile_many(self, sources):
+        # Compiles each of the given cython sources as an extension and returns the list of modules
+        # imported. The extensions which are not cached are built in parallel
+        return self._compile(sources, self._get_build_tools()['ext_suffix'], self._build, self._import)
 
-        # Save the source code in a external file
-        self._numfuncs_count += 1
-        module_name = f'_numfunc_{self._numfuncs_count}'
 
-        filename = f'{module_name}.pyx'
-        filepath_name = os.path.join(self._numfuncs_dir, filename)
+    def compile_c_many(self, sources):
+        # Same as compile_many but for C sources, built as shared libraries loaded with ctypes
+        return self._compile(sources, _shared_library_suffix(), self._build_c, self._load_c)
 
-        with open(filepath_name, 'w') as file:
-            file.write(source)
 
-        # Call a subprocess to generate the cython extension
-        environ = os.environ.copy()
-        environ['CFLAGS'] = f'-I {np.get_include()}'
+    def _compile(self, sources, suffix, build, load):
+        cache_dir = self.get_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
 
-        stdout, stderr = open(os.path.join(self._numfuncs_dir, self._stdout_logfile), 'a'), open(os.path.join(self._numfuncs_dir, self._stderr_logfile), 'a')
+        targets, missing = [], OrderedDict()
+        for source in sources:
+            module_name = self._module_prefix + self._get_source_hash(source)
+            filepath_name = os.path.join(cache_dir, module_name + suffix)
+            targets.append((module_name, filepath_name))
+
+            if os.path.exists(filepath_name):
+                # Cache hit (update the modification time of the extension to track the least recently
+                # used entries of the cache)
+                try:
+                    os.utime(filepath_name)
+                except FileNotFoundError:
+                    # The extension was removed by another process in the meanwhile
+                    pass
+
+            if not os.path.exists(filepath_name):
+                # Cache miss
+                missing[filepath_name] = (source, module_name, filepath_name)
+
+        if missing:
+            # Build the missing extensions. When many of them are built in parallel, each build runs
+            # on a child process, so a pool of threads waiting for them is enough. Otherwise, they are built
+            # within this process (unless this is not the main thread e.g. a background compilation)
+            num_workers = min(len(missing), self.get_max_build_workers())
+            build = partial(self._build_once, build)
+            if num_workers > 1:
+                with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                    list(executor.map(build, *zip(*missing.values())))
+            else:
+                in_process = threading.current_thread() is threading.main_thread()
+                for args in missing.values():
+                    build(*args, in_process=in_process)
+            self._evict(keep=missing.keys())
+
+        # Import the extensions
+        return [load(module_name, filepath_name) for module_name, filepath_name in targets]
+
+
+
+    def _build_once(self, build, source, module_name, filepath_name, in_process=False):
+        # Builds the given cache entry unless another thread of this process built it in the meanwhile
+        # (e.g. a background compilation of the same numeric function)
+        with self._build_locks_lock:
+            lock = self._build_locks.setdefault(filepath_name, threading.Lock())
+        with lock:
+            if not os.path.exists(filepath_name):
+                build(source, module_name, filepath_name, in_process)
+
+
+
+    def _build(self, source, module_name, filepath_name, in_process=False):
+        # Builds the extension in a private temporal directory. Then it is moved atomically to the
+        # cache directory (this way, concurrent writers never see an incomplete extension file)
+        cache_dir = os.path.dirname(filepath_name)
+        build_dir = tempfile.mkdtemp(prefix=self._build_dir_prefix, dir=cache_dir)
         try:
-            subprocess.run(['cythonize', '-i', '-q', '-f', '-3', filepath_name], env=environ, stdout=stdout, stderr=stderr)
+            # Save the source code in a external file
+            pyx_filepath_name = os.path.join(build_dir, f'{module_name}.pyx')
+            with open(pyx_filepath_name, 'w') as file:
+                file.write(source)
+
+            # Generate & compile the cython extension
+            _run_build(_build_cython_extension, pyx_filepath_name, module_name, build_dir, in_process=in_process)
+
+            build_filepath_name = os.path.join(build_dir, os.path.basename(filepath_name))
+            if not os.path.exists(build_filepath_name):
+                raise RuntimeError('Failed to compile numeric function')
+            os.replace(build_filepath_name, filepath_name)
         finally:
-            stdout.close()
-            stderr.close()
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+
+
+    def _build_c(self, source, module_name, filepath_name, in_process=False):
+        # Builds the shared library in a private temporal directory and moves it atomically
+        # to the cache directory (same as _build but cython is not invoked)
+        cache_dir = os.path.dirname(filepath_name)
+        build_dir = tempfile.mkdtemp(prefix=self._build_dir_prefix, dir=cache_dir)
+        try:
+            c_filepath_name = os.path.join(build_dir, f'{module_name}.c')
+            with open(c_filepath_name, 'w') as file:
+                file.write(source)
+
+            _run_build(_build_shared_library, c_filepath_name, module_name, build_dir, in_process=in_process)
+
+            build_filepath_name = os.path.join(build_dir, module_name + _shared_library_suffix())
+            if not os.path.exists(build_filepath_name):
+                raise RuntimeError('Failed to compile numeric function')
+            os.replace(build_filepath_name, filepath_name)
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+
+
+    def _evict(self, keep=()):
+        # Removes the least recently used extensions until the total size of the cache
+        # is lower than the limit (the extensions in keep are never removed)
+        cache_dir = self.get_cache_dir()
+        entries, total_size = [], 0
+        for filename in os.listdir(cache_dir):
+            filepath_name = os.path.join(cache_dir, filename)
+            try:
+                stat = os.stat(filepath_name)
+            except FileNotFoundError:
+                continue
+            if filename.startswith(self._build_dir_prefix):
+                # Remove build directories left by processes which were killed while building
+                if time.time() - stat.st_mtime > 3600:
+                    shutil.rmtree(filepath_name, ignore_errors=True)
+                continue
+            if not filename.startswith(self._module_prefix):
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filepath_name))
+            total_size += stat.st_size
+
+        for mtime, size, filepath_name in sorted(entries):
+            if total_size <= self._cache_max_size:
+                break
+            if filepath_name in keep:
+                continue
+            try:
+                os.remove(filepath_name)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
 
-        # Import the function from the extension
-        return getattr(importlib.__import__('.'.join([self._numfuncs_dir, module_name]), globals(), locals(), [funcname]), funcname)
+    def _import(self, module_name, filepath_name):
+        # Imports the extension module located at the given path
+        if module_name not in self._modules:
+            spec = importlib.util.spec_from_file_location(module_name, filepath_name)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self._modules[module_name] = module
+        return self._modules[module_name]
+
+
+    def _load_c(self, module_name, filepath_name):
+        # Loads the shared library located at the given path
+        if module_name not in self._modules:
+            self._modules[module_name] = ctypes.CDLL(filepath_name)
+        return self._modules[module_name]
 
 
 _numfuncs_extension_compiler = CythonNumericFunctionExtensionsCompiler()
@@ -72,6 +372,167 @@ _numfuncs_extension_compiler = CythonNumericFunctionExtensionsCompiler()
 
 
 
+######## Numeric functions cache configuration ########
+
+def get_numeric_functions_cache_dir():
+    '''get_numeric_functions_cache_dir() -> str
+    Get the directory where the numeric functions compiled as cython extensions are stored
+
+    .. seealso:: :func:`set_numeric_functions_cache_dir`
+
+    '''
+    return _numfuncs_extension_compiler.get_cache_dir()
+
+
+def set_numeric_functions_cache_dir(path):
+    '''set_numeric_functions_cache_dir(path: str)
+    Change the directory where the numeric functions compiled as cython extensions are stored.
+    By default its ``$XDG_CACHE_HOME/lib3d_mec_ginac/numfuncs`` (``~/.cache/lib3d_mec_ginac/numfuncs``
+    if the environment variable is not set)
+
+    '''
+    _numfuncs_extension_compiler.set_cache_dir(path)
+
+
+def set_numeric_functions_cache_max_size(size):
+    '''set_numeric_functions_cache_max_size(size: int)
+    Change the maximum size (in bytes) of the directory where the numeric functions
+    compiled as cython extensions are stored. When the limit is exceeded, the least recently
+    used extensions are removed.
+
+    '''
+    _numfuncs_extension_compiler.set_cache_max_size(size)
+
+
+def set_numeric_functions_max_build_workers(num_workers):
+    '''set_numeric_functions_max_build_workers(num_workers: int)
+    Change the maximum number of processes which build numeric functions as cython extensions
+    (or C shared libraries) in parallel. By default, the number of cores. If it is None,
+    the default value is restored.
+
+    .. seealso:: :func:`compile_numeric_functions`
+
+    '''
+    _numfuncs_extension_compiler.set_max_build_workers(num_workers)
+
+
+def clear_numeric_functions_cache():
+    '''clear_numeric_functions_cache()
+    Remove all the numeric functions compiled as cython extensions stored in the cache directory
+
+    '''
+    _numfuncs_extension_compiler.clear_cache()
+
+
+
+
+
+######## Compilation of numeric functions as cython extensions ########
+
+# Imports of the cython extensions generated for numeric functions (math functions are taken
+# from the C library, so that numeric functions can be evaluated without holding the GIL)
+_cython_source_header = [
+    'cimport cython',
+    'from libc.math cimport ' + ', '.join(sorted(set(_c_functions.values()) | {'pow'}))
+]
+
+
+def _compile_numeric_functions_cython(funcs):
+    # Compiles the given numeric functions as cython extensions and binds them to the generated code.
+    # They are split in groups with a similar amount of code (one per build worker). Each group is
+    # compiled as one single extension and all of them are built in parallel
+    groups = _split_numeric_functions(funcs)
+    sources = []
+    for group in groups:
+        lines = list(_cython_source_header)
+        for k, func in enumerate(group):
+            lines.extend(func._generate_cython_source(f'_f{k}_'))
+        sources.append('\n'.join(lines))
+    modules = _numfuncs_extension_compiler.compile_many(sources)
+    for module, group in zip(modules, groups):
+        for k, func in enumerate(group):
+            func._bind_cython(module, f'_f{k}_')
+
+
+
+def _split_numeric_functions(funcs):
+    # Splits the given numeric functions in groups (at most one per build worker) with a similar
+    # amount of code. The largest functions are assigned first, each one to the group with less code
+    funcs = tuple(funcs)
+    num_groups = min(len(funcs), _numfuncs_extension_compiler.get_max_build_workers())
+    groups, sizes = [[] for k in range(num_groups)], [0] * num_groups
+    code_sizes = [sum(len(value) for name, value in func._code_atoms) + sum(map(len, func._code_outputs)) for func in funcs]
+    for index in sorted(range(len(funcs)), key=code_sizes.__getitem__, reverse=True):
+        k = sizes.index(min(sizes))
+        groups[k].append(index)
+        sizes[k] += code_sizes[index]
+    # Numeric functions keep their order within each group
+    return [[funcs[index] for index in sorted(group)] for group in groups if group]
+
+
+
+
+######## Compilation of numeric functions as C shared libraries ########
+
+def _compile_numeric_functions_c(funcs):
+    # Compiles the given numeric functions as shared libraries (the generated C code is built directly,
+    # without cython) and binds them to the generated code. They are grouped and built in parallel
+    # as with _compile_numeric_functions_cython
+    groups = _split_numeric_functions(funcs)
+    sources = []
+    for group in groups:
+        lines = list(_c_source_header)
+        for k, func in enumerate(group):
+            lines.extend(func._generate_c_source(f'_f{k}_'))
+        sources.append('\n'.join(lines))
+    libraries = _numfuncs_extension_compiler.compile_c_many(sources)
+    for library, group in zip(libraries, groups):
+        for k, func in enumerate(group):
+            func._bind_c(library, f'_f{k}_')
+
+
+
+
+######## Compilation of numeric functions in the background ########
+
+def _compile_numeric_functions_background(funcs, compile_funcs):
+    # Compiles the given numeric functions with compile_funcs (_compile_numeric_functions_cython or
+    # _compile_numeric_functions_c) on a background thread. Meanwhile, they are evaluated with their
+    # python version. Each one switches to the compiled code as soon as it is bound to it.
+    # Returns a future which is completed when the build finishes
+    funcs = tuple(funcs)
+    future = Future()
+    for func in funcs:
+        func._compilation_future = future
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            compile_funcs(funcs)
+        except BaseException as e:
+            warn(f'Numeric functions could not be compiled in the background: {e}')
+            future.set_exception(e)
+        else:
+            future.set_result(funcs)
+
+    threading.Thread(target=run, name='numeric_functions_compiler', daemon=True).start()
+    return future
+
+
+
+
+# Short names which can be used instead of the symbol types when evaluating numeric
+# functions at many states at once (see NumericFunction.evaluate_batch)
+_symbol_types_aliases = {
+    'q': 'coordinate', 'dq': 'velocity', 'ddq': 'acceleration',
+    'q_aux': 'aux_coordinate', 'dq_aux': 'aux_velocity', 'ddq_aux': 'aux_acceleration',
+    'param': 'parameter', 'unknown': 'joint_unknown'
+}
+
+
+
+
 
 ######## Class NumericFunction ########
 
@@ -86,7 +547,7 @@ class NumericFunction:
 
     ######## Constructor ########
 
-    def __init__(self, atoms, outputs, system, output_arrays=None, c_optimized=False):
+    def __init__(self, atoms, outputs, system, output_arrays=None, c_optimized=False, fused=False, c_backend=False):
         '''
         Initialize the numeric function. This class is not intended to be instantiated
         by the user directly.
@@ -98,17 +559,30 @@ class NumericFunction:
         :param system: The system where to take the symbol values at.
 
         :param outputs: Must be a matrix with strings representing the expressions to be evaluated
-            as the outputs of the numeric function.
+            as the outputs of the numeric function. If ``fused`` is True, it must be a list
+            of such matrices instead.
 
         :param output_arrays: An optional iterable (or the number) of independent preallocated numpy arrays where this numeric
             function will store the evaluation results (for optimization purposes).
             The first evaluation will store the result in the first array. The second in the next one
             and so on until the list is exhausted. Then the first array will be selected again.
+            Only the number of arrays can be indicated for fused numeric functions.
 
         :param c_optimized: If True, compile this numeric function as a Cython extension.
-            Otherwise, it is compiled as a python function.
+            Otherwise, it is compiled as a python function. The GIL is released while evaluating
+            the compiled code, so numeric functions of different systems can be evaluated
+            concurrently by several threads.
+
+        :param fused: If True, the numeric function has several outputs (one per matrix in ``outputs``)
+            which share the same atoms. They are all computed with a single evaluation.
+
+        :param c_backend: If True, generate C code for this numeric function and compile it as
+            a shared library (loaded via ctypes). Cython is not required and the build is faster
+            than with ``c_optimized``, which cannot be enabled at the same time.
         '''
         # Validate & parse input arguments
+        if c_optimized and c_backend:
+            raise ValueError('c_optimized and c_backend cannot be enabled at the same time')
 
 
         # Parse atoms & output expressions
@@ -143,38 +617,74 @@ class NumericFunction:
         atoms = dict(zip(atoms.keys(), map(parse_expr, atoms.values())))
 
         # Parse outputs
-        outputs = np.matrix(outputs)
-        outputs = np.matrix(tuple(map(parse_expr, map(methodcaller('item'), outputs.flat)))).reshape(outputs.shape)
+        def parse_outputs(outputs):
+            outputs = np.matrix(outputs)
+            return np.matrix(tuple(map(parse_expr, map(methodcaller('item'), outputs.flat)))).reshape(outputs.shape)
+
+        blocks = tuple(map(parse_outputs, outputs)) if fused else (parse_outputs(outputs),)
+        if not blocks:
+            raise ValueError('At least one output matrix must be specified')
 
 
         # Initialize internal fields
         self._atoms = atoms
-        self._outputs = outputs
+        self._blocks = blocks
+        self._outputs = blocks if fused else blocks[0]
+        self._fused = fused
         self._system = system
         self._c_optimized = c_optimized
 
+        # Outputs of all the blocks are stored contiguously in the same flat buffer
+        self._flat_outputs = tuple(map(str, chain.from_iterable(map(attrgetter('flat'), blocks))))
+
+        # Atoms & outputs used to generate the code of the numeric function (repeated subexpressions
+        # are computed only once)
+        self._code_atoms, self._code_outputs = _eliminate_common_subexpressions(list(atoms.items()), self._flat_outputs)
+        self._blocks_slices = tuple(
+            slice(offset - block.size, offset)
+            for block, offset in zip(blocks, accumulate(map(attrgetter('size'), blocks))))
+
 
         # Preallocate output arrays
         if output_arrays is None:
             output_arrays = 1
 
         if isinstance(output_arrays, int):
-            self._output_arrays = deque([np.zeros(self._outputs.shape, dtype=np.float64) for i in range(0, output_arrays)])
+            buffers = [np.zeros(len(self._flat_outputs), dtype=np.float64) for i in range(0, output_arrays)]
         else:
-            self._output_arrays = deque(output_arrays)
-
-        # Compile numeric function body
+            if fused:
+                raise TypeError('output_arrays must be a number for fused numeric functions')
+            buffers = []
+            for output_array in output_arrays:
+                if not isinstance(output_array, np.ndarray) or output_array.dtype != np.float64 or output_array.shape != blocks[0].shape:
+                    raise TypeError(f'output_arrays must be float64 numpy arrays with shape {blocks[0].shape}')
+                if not output_array.flags.c_contiguous:
+                    raise ValueError('output_arrays must be C contiguous')
+                buffers.append(output_array.reshape(-1))
+
+        # Each output buffer is stored along with views of it (one for each output block)
+        self._output_arrays = deque([(buffer, self._split_outputs(buffer)) for buffer in buffers])
+
+        # Compile numeric function body (the python version is always generated, it is also
+        # used as a fallback when evaluating the function at many states at once)
+        self._optimized_binding, self._binding_lock = None, threading.RLock()
+        self._compilation_future = None
+        self._compile_python()
         if self._c_optimized:
             self._compile_cython()
-        else:
-            self._compile_python()
+        elif c_backend:
+            self._compile_c()
+
+        # The numeric function is rebound when the arrays storing the symbol values are reallocated
+        for symbol_type in map(methodcaller('decode'), _symbol_types):
+            system._symbols_values[symbol_type]._add_listener(self._rebind_symbols_values)
 
 
 
 
     def _compile_python(self):
         # This private method is used to compile the internal numeric function (unoptimized version)
-        symbol_types = tuple(map(methodcaller('decode'), _symbol_types))
+        symbol_types = tuple(sorted(map(methodcaller('decode'), _symbol_types)))
         symbols = self._system.get_symbols()
 
         # Global variables to be used when evaluating the numeric function
@@ -183,52 +693,238 @@ class NumericFunction:
             globals[symbol_type] = self._system.get_symbols_values(kind=symbol_type)
         self._globals = globals
 
-        # Generate the source code to eval the numeric function
-        lines = [f'{name} = {value}' for name, value in self.atoms.items()]
-        lines.append(f'__output__.flat = [ {", ".join( map(str, self._outputs.flat) )} ]')
+        # Generate the source code of a function which evaluates the numeric function. It is defined
+        # within a factory function, so that the global variables (math functions & arrays with the symbol
+        # values) are bound as closure variables. Symbol values are read only once (as python floats) and the
+        # outputs are stored by index on a flat array
+        symbol_pattern = r'\b(' + '|'.join(symbol_types) + r')\[(\d+), 0\]'
+        code = [value for name, value in self._code_atoms] + list(self._code_outputs)
+        used_symbols = sorted(set(chain.from_iterable(map(partial(findall, symbol_pattern), code))))
+        symbol_expr = partial(sub, symbol_pattern, r'__\1_\2__')
+
+        lines = [f'def __factory__({", ".join(globals.keys())}):']
+        lines.extend(f'\t{kind}_item = {kind}.item' for kind in symbol_types)
+        lines.append('\tdef __evaluate__(t, __output__):')
+        body = [f'__{kind}_{index}__ = {kind}_item({index})' for kind, index in used_symbols]
+        body.extend(f'{name} = {symbol_expr(value)}' for name, value in self._code_atoms)
+        body.extend(f'__output__[{k}] = {symbol_expr(output)}' for k, output in enumerate(self._code_outputs))
+        lines.extend(map(partial(add, '\t\t'), body or ['pass']))
+        lines.append('\treturn __evaluate__')
+        source = '\n'.join(lines)
+
+        # Compile the code & create the function
+        namespace = {}
+        exec(compile(source, '<numeric function>', 'exec', optimize=2), namespace)
+        self._num_func_factory = namespace['__factory__']
+        self._num_func = self._num_func_factory(**globals)
+
+
+        # Global variables to be used when evaluating the numeric function at many states at once
+        # (math functions are replaced by numpy ufuncs)
+        batch_globals = {'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'euler': math.e, 'tau': math.tau, 'pi': math.pi}
+        self._batch_globals = batch_globals
+
+        # Generate the source code to eval the numeric function at many states at once
+        lines = [f'{name} = {value}' for name, value in self._code_atoms]
+        for k, output in enumerate(self._code_outputs):
+            lines.append(f'__output__[:, {k}] = {output}')
         source = '\n'.join(lines)
 
         # Compile the code
-        self._code = compile(source, '<string>', 'exec', optimize=2)
+        self._batch_code = compile(source, '<string>', 'exec', optimize=2)
 
 
 
 
     def _compile_cython(self):
         # This private method is used to compile the internal numeric function (optimized version)
+        _compile_numeric_functions_cython([self])
 
-        symbol_types = tuple(map(methodcaller('decode'), _symbol_types))
 
-        ## Generate cython source code
-        args = tuple(map(partial(add, 'np.ndarray[np.float64_t, ndim=2] '), chain(symbol_types, ['__output__'])))
-
-        # Imports & function signature
-        header = [
-            'cimport cython',
-            'from math import sin, cos, tan, pi, tau, e as euler',
-            'import numpy as np',
-            'cimport numpy as np',
+
+    def _generate_cython_source(self, prefix):
+        # This private method generates the cython source code of the functions which evaluate this
+        # numeric function (at one or many states). Their names are prefixed with the given string.
+        # Expressions are translated to C (see _expr_to_c), so the generated code only operates on
+        # C doubles and typed memoryviews and runs without the GIL
+        symbol_types = tuple(sorted(map(methodcaller('decode'), _symbol_types)))
+        directives = [
             '@cython.boundscheck(False)',
             '@cython.wraparound(False)',
-            f'cpdef evaluate({", ".join(args)}):'
+            '@cython.cdivision(True)'
         ]
 
-        # Body of the numeric function
-        body = [f'cdef np.float64_t {name} = {value}' for name, value in self.atoms.items()]
+        ## Generate cython source code
+
+        # C level function which evaluates the numeric function (symbol values are read from the
+        # C contiguous column arrays of the system). It has the same signature as the one generated
+        # by the C backend and can be called from other threads without holding the GIL
+        expr = partial(_expr_to_c, symbol_ref=lambda kind, index: f'{kind}[{index}]')
+        args = [f'const double* {kind}' for kind in symbol_types]
+        lines = list(directives)
+        lines.append(f'cdef void {prefix}evaluate_nogil({", ".join(args)}, const double t, double* __output__) nogil:')
+        body = [f'cdef double {name} = {expr(value)}' for name, value in self._code_atoms]
+        for k, output in enumerate(self._code_outputs):
+            body.append(f'__output__[{k}] = {expr(output)}')
+        lines.extend(map(partial(add, '\t'), body or ['pass']))
+
+        # Python wrapper of the function above (the GIL is released while evaluating it)
+        lines.extend(directives)
+        args = [f'const double[:, ::1] {kind}' for kind in symbol_types]
+        lines.append(f'def {prefix}evaluate({", ".join(args)}, double t, double[::1] __output__):')
+        lines.extend([
+            '\twith nogil:',
+            f'\t\t{prefix}evaluate_nogil({", ".join(f"&{kind}[0, 0]" for kind in symbol_types)}, t, &__output__[0])'
+        ])
+
+
+        # Signature & body of the numeric function evaluated at many states at once
+        # (symbol values of the kth state are stored in the kth column of the input arrays)
+        expr = partial(_expr_to_c, symbol_ref=lambda kind, index: f'{kind}[{index}, __k__]')
+        args = [f'const double[:, :] {kind}' for kind in symbol_types]
+        lines.extend(directives)
+        lines.append(f'def {prefix}evaluate_batch({", ".join(args)}, const double[::1] __t__, double[:, ::1] __output__):')
+        body = [f'cdef double {name}' for name, value in self._code_atoms]
+        body.extend([
+            'cdef double t',
+            'cdef Py_ssize_t __k__',
+            'with nogil:',
+            '\tfor __k__ in range(__output__.shape[0]):',
+            '\t\tt = __t__[__k__]'
+        ])
+        body.extend([f'\t\t{name} = {expr(value)}' for name, value in self._code_atoms])
+        for k, output in enumerate(self._code_outputs):
+            body.append(f'\t\t__output__[__k__, {k}] = {expr(output)}')
+        lines.extend(map(partial(add, '\t'), body))
+
+        return lines
+
+
+
+    def _bind_cython(self, module, prefix):
+        # This private method binds this numeric function to the cython functions defined in the
+        # given extension module (previously generated with _generate_cython_source)
+        # (it can be invoked from a background thread, see _compile_numeric_functions_background)
+        symbol_types = tuple(sorted(map(methodcaller('decode'), _symbol_types)))
+
+        with self._binding_lock:
+            self._num_func_optimized = partial(getattr(module, f'{prefix}evaluate'), *map(self._system.get_symbols_values, symbol_types))
+            self._num_func_batch_optimized = getattr(module, f'{prefix}evaluate_batch')
+            self._optimized_binding = (NumericFunction._bind_cython, module, prefix)
+            self._c_optimized = True
+
+
 
-        n, m = self._outputs.shape
-        for i, j in product(range(0, n), range(0, m)):
-            body.append(f'__output__[{i}, {j}] = {str(self._outputs[i, j])}')
+    def _compile_c(self):
+        # This private method is used to compile the internal numeric function (C backend)
+        _compile_numeric_functions_c([self])
 
-        # Put all source code together
-        lines = []
-        lines.extend(header)
+
+
+    def _generate_c_source(self, prefix, batch=True):
+        # This private method generates the C source code of the functions which evaluate this
+        # numeric function (at one or many states). Their names are prefixed with the given string.
+        # If batch is False, only the function which evaluates it at one state is generated
+        symbol_types = tuple(sorted(map(methodcaller('decode'), _symbol_types)))
+        num_outputs = len(self._code_outputs)
+
+        # Signature & body of the numeric function (symbol values are read from the C contiguous
+        # column arrays of the system)
+        expr = partial(_expr_to_c, symbol_ref=lambda kind, index: f'{kind}[{index}]')
+        args = [f'const double* {kind}' for kind in symbol_types]
+        lines = [f'EXPORT void {prefix}evaluate({", ".join(args)}, const double t, double* __output__) {{']
+        body = [f'const double {name} = {expr(value)};' for name, value in self._code_atoms]
+        for k, output in enumerate(self._code_outputs):
+            body.append(f'__output__[{k}] = {expr(output)};')
         lines.extend(map(partial(add, '\t'), body))
-        source = '\n'.join(lines)
+        lines.append('}')
+        if not batch:
+            return lines
+
+
+        # Signature & body of the numeric function evaluated at many states at once
+        # (strides of the input arrays are given in number of items, the output is C contiguous)
+        expr = partial(_expr_to_c, symbol_ref=lambda kind, index: f'{kind}[{index}*{kind}_s0 + __k__*{kind}_s1]')
+        args = [f'const double* {kind}, const ptrdiff_t {kind}_s0, const ptrdiff_t {kind}_s1' for kind in symbol_types]
+        lines.append(f'EXPORT void {prefix}evaluate_batch({", ".join(args)}, const double* __t__, const ptrdiff_t __n__, double* __output__) {{')
+        body = [
+            'ptrdiff_t __k__;',
+            'for(__k__ = 0; __k__ < __n__; __k__++) {',
+            '\tconst double t = __t__[__k__];'
+        ]
+        body.extend([f'\tconst double {name} = {expr(value)};' for name, value in self._code_atoms])
+        for k, output in enumerate(self._code_outputs):
+            body.append(f'\t__output__[__k__*{num_outputs} + {k}] = {expr(output)};')
+        body.append('}')
+        lines.extend(map(partial(add, '\t'), body))
+        lines.append('}')
+
+        return lines
+
+
+
+    def _bind_c(self, library, prefix):
+        # This private method binds this numeric function to the C functions defined in the
+        # given shared library (previously generated with _generate_c_source)
+        symbol_types = tuple(sorted(map(methodcaller('decode'), _symbol_types)))
+
+        evaluate, evaluate_batch = getattr(library, f'{prefix}evaluate'), getattr(library, f'{prefix}evaluate_batch')
+        evaluate.restype, evaluate_batch.restype = None, None
+        evaluate.argtypes = [ctypes.c_void_p] * len(symbol_types) + [ctypes.c_double, ctypes.c_void_p]
+        evaluate_batch.argtypes = [ctypes.c_void_p, ctypes.c_ssize_t, ctypes.c_ssize_t] * len(symbol_types) + \
+            [ctypes.c_void_p, ctypes.c_ssize_t, ctypes.c_void_p]
+
+        with self._binding_lock:
+            # The arrays with the symbol values are bound to the function (same as the cython version).
+            # Pointers to the output buffers are also computed only once
+            arrays = tuple(map(self._system.get_symbols_values, symbol_types))
+            for array in arrays:
+                if not array.flags.c_contiguous:
+                    raise ValueError('Symbol values must be stored in C contiguous arrays')
+            pointers = tuple(array.ctypes.data for array in arrays)
+            output_pointers = {id(buffer): buffer.ctypes.data for buffer, views in self._output_arrays}
+
+            self._c_symbols_values = arrays
+
+            def evaluate_optimized(t, output):
+                pointer = output_pointers.get(id(output))
+                evaluate(*pointers, t, output.ctypes.data if pointer is None else pointer)
+
+            def evaluate_batch_optimized(*args):
+                *values, t, output = args
+                args = []
+                for value in values:
+                    args.extend((value.ctypes.data, value.strides[0] // 8, value.strides[1] // 8))
+                t, output = np.ascontiguousarray(t, dtype=np.float64), np.ascontiguousarray(output)
+                evaluate_batch(*args, t.ctypes.data, output.shape[0], output.ctypes.data)
+
+            self._num_func_optimized = evaluate_optimized
+            self._num_func_batch_optimized = evaluate_batch_optimized
+            self._optimized_binding = (NumericFunction._bind_c, library, prefix)
+            self._c_optimized = True
+
+
+
+    def _rebind_symbols_values(self):
+        # This private method binds again this numeric function to the arrays storing the symbol values
+        # of the system (it is invoked when they are reallocated)
+        with self._binding_lock:
+            for symbol_type in map(methodcaller('decode'), _symbol_types):
+                self._globals[symbol_type] = self._system.get_symbols_values(symbol_type)
+            self._num_func = self._num_func_factory(**self._globals)
+            if self._optimized_binding is not None:
+                bind, library, prefix = self._optimized_binding
+                bind(self, library, prefix)
 
-        # Compile cython extension
-        func = _numfuncs_extension_compiler.compile( source, 'evaluate' )
-        self._num_func_optimized = partial(func, *map(self._system.get_symbols_values, symbol_types))
+
+
+    def _split_outputs(self, buffer):
+        # This private method returns views of the given buffer (which stores the outputs of
+        # all the blocks contiguously) for each output block. The buffer can have an extra leading
+        # dimension (one item per state)
+        return tuple(
+            buffer[..., block_slice].reshape(buffer.shape[:-1] + block.shape)
+            for block, block_slice in zip(self._blocks, self._blocks_slices))
 
 
 
@@ -251,7 +947,8 @@ class NumericFunction:
 
     def get_outputs(self):
         '''get_outputs() -> List[List[str]]
-        Get the list of output expressions for this numeric function
+        Get the list of output expressions for this numeric function.
+        If the numeric function is fused, a tuple with the output expressions of each block is returned.
 
         :rtype: List[str]
 
@@ -260,6 +957,17 @@ class NumericFunction:
 
 
 
+    def is_fused(self):
+        '''is_fused() -> bool
+        Check if this numeric function is fused (it has several outputs sharing the same atoms)
+
+        :rtype: bool
+
+        '''
+        return self._fused
+
+
+
     def get_globals(self):
         '''get_globals() -> Dict[str, Any]
         Get the global variables and functions used by this numeric function
@@ -268,15 +976,40 @@ class NumericFunction:
 
 
 
+    def get_compilation_future(self):
+        '''get_compilation_future() -> concurrent.futures.Future
+        Get a future which is completed when this numeric function finishes compiling in the
+        background (see the ``background`` argument of ``compile_numeric_function``).
+        Until then, it is evaluated with its python version.
+
+            :Example:
+
+            >>> func = compile_numeric_function(Phi, c_optimized=True, background=True)
+            >>> func.evaluate() # Evaluated with the python version
+            >>> func.get_compilation_future().result() # Wait until the cython extension is built
+            >>> func.evaluate() # Evaluated with the cython version
+
+        :return: The future or None if this numeric function was not compiled in the background
+        :rtype: concurrent.futures.Future
+
+        '''
+        return self._compilation_future
+
+
+
 
     ######## Export/Import  ########
 
     @classmethod
-    def load_from_file(cls, filename):
-        '''load_from_file(filename: str) -> NumericFunction
+    def load_from_file(cls, filename, system, c_optimized=False, c_backend=False):
+        '''load_from_file(filename: str, system: System[, c_optimized: bool[, c_backend: bool]]) -> NumericFunction
         Create a numeric function with the information provided by the file in the given
         path (previously created by the function ``save_to_file``)
 
+        :param system: The system where to take the symbol values at. It must define the same
+            symbols (in the same order) as the system of the saved numeric function
+            (e.g. it was restored with ``System.load``)
+
         .. seealso::
             :func:`save_to_file`
 
@@ -286,8 +1019,8 @@ class NumericFunction:
         with open(filename, 'r') as file:
             data = json.load(file)
         try:
-            return cls(**data)
-        except TypeError:
+            return cls(data['atoms'], data['outputs'], system, c_optimized=c_optimized, fused=data.get('fused', False), c_backend=c_backend)
+        except (TypeError, KeyError):
             raise RuntimeError(f'Failed to load numeric function from "{filename}"')
 
 
@@ -299,8 +1032,9 @@ class NumericFunction:
         if not isinstance(filename, str):
             raise TypeError('filename must be a string')
         data = {
-            'atoms': self.atoms,
-            'outputs': self.outputs
+            'atoms': self._atoms,
+            'outputs': [block.tolist() for block in self._blocks] if self._fused else self._blocks[0].tolist(),
+            'fused': self._fused
         }
         with open(filename, 'w') as file:
             json.dump(data, file)
@@ -327,25 +1061,173 @@ class NumericFunction:
         :param inputs: Must be a dictionary with additional inputs for the numeric function.
             The keys must be valid python variable names and values must be all floats.
 
-        :return: This function evaluated numerically. Returns a numpy array.
+        :return: This function evaluated numerically. Returns a numpy array
+            (or a tuple of numpy arrays, one per output block, if the numeric function is fused).
         :rtype: np.ndarray
 
         '''
-        output_array = self._output_arrays.popleft()
-        self._output_arrays.append(output_array)
+        output_array, output_views = self._output_arrays.popleft()
+        self._output_arrays.append((output_array, output_views))
 
         # Add also the current time value as a global variable
-        self._globals['t'] = self._system.get_time().get_value()
+        t = self._system.get_time().get_value()
+
+        if self._c_optimized:
+            # Evaluate numeric function optimized
+            self._num_func_optimized(t, output_array)
+        else:
+            # Evaluate numeric function unoptimized
+            self._num_func(t, output_array)
+
+        if self._fused:
+            return output_views
+        return output_views[0].view()
+
+
+
+    def evaluate_into(self, out):
+        '''evaluate_into(out: np.ndarray) -> np.ndarray
+        Evaluate this numeric function storing the results in the given array. Unlike ``evaluate``,
+        no new arrays (or views) are created, and the results are not overwritten by later evaluations.
 
+            :Example:
+
+            >>> func = compile_numeric_function(Matrix([a + b, a * b]))
+            >>> out = np.zeros(2)
+            >>> func.evaluate_into(out)
+            array([3., 2.])
+
+        :param out: A C contiguous float64 array with one item per output of this numeric function
+            (e.g. an array with the same shape as its outputs or a slice of a larger buffer). For fused
+            numeric functions, the outputs of all the blocks are stored one after another. 1D arrays
+            are preferred (otherwise, a flat view of the array is created with the optimized versions)
+
+        :return: The given array
+        :rtype: np.ndarray
+
+        :raises TypeError: If out is not a float64 numpy array
+        :raises ValueError: If out has an invalid size or its not C contiguous
+
+        '''
+        if not isinstance(out, np.ndarray) or out.dtype != np.float64:
+            raise TypeError('out must be a float64 numpy array')
+        if out.size != len(self._flat_outputs):
+            raise ValueError(f'out must have {len(self._flat_outputs)} items')
+        if not out.flags.c_contiguous:
+            raise ValueError('out must be C contiguous')
+
+        t = self._system.get_time().get_value()
         if self._c_optimized:
             # Evaluate numeric function optimized
-            self._num_func_optimized(output_array)
+            self._num_func_optimized(t, out if out.ndim == 1 else out.reshape(-1))
         else:
             # Evaluate numeric function unoptimized
-            self._globals['__output__'] = output_array
-            exec(self._code, None, self._globals)
+            self._num_func(t, out if out.ndim == 1 else out.reshape(-1))
+        return out
+
+
+
+    def _evaluate_scalar(self):
+        # This private method evaluates this numeric function (it must have only one output) with its
+        # python version and returns the result as a float. No arrays or views are created
+        # (used by System.evaluate on expressions)
+        buffer = self._output_arrays[0][0]
+        self._num_func(self._system.get_time().get_value(), buffer)
+        return buffer.item(0)
+
+
+
+    def evaluate_batch(self, **kwargs):
+        '''evaluate_batch(**values) -> np.ndarray
+        Evaluate this numeric function at many states at once.
 
-        return output_array.view()
+            :Example:
+
+            >>> a, b = new_param('a', 1), new_input('b', 2)
+            >>> func = compile_numeric_function(Matrix([a + b, a * b]))
+            >>> func.evaluate_batch(param=[[9.8, 9.8, 9.8], [1, 2, 3]])
+            array([[[3., 2.]],
+                   [[4., 4.]],
+                   [[5., 6.]]])
+
+        :param values: Keyword arguments where keys are symbol types ('coordinate', 'velocity', 'parameter', ...)
+            or one of their aliases ('q', 'dq', 'ddq', 'q_aux', 'dq_aux', 'ddq_aux', 'param', 'unknown')
+            and values must be 2D arrays with one row per symbol and one column per state.
+            Symbol types not indicated will take their current numeric values for all the states.
+            The additional keyword argument ``t`` can be used to specify the time (a number or
+            a 1D array with one value per state)
+
+        :return: A numpy array with shape (N, n, m) where N is the number of states and nxm the
+            shape of the outputs of this numeric function. The ith item is the function evaluated
+            at the ith state. If the numeric function is fused, a tuple with one such array per
+            output block is returned.
+        :rtype: np.ndarray
+
+        :raises TypeError: If an invalid keyword argument is specified
+        :raises ValueError: If the input arrays have invalid shapes
+
+        '''
+        symbol_types = tuple(sorted(map(methodcaller('decode'), _symbol_types)))
+
+        # Validate & parse input arguments
+        t = kwargs.pop('t', None)
+        values, num_states = {}, None
+        for key, value in kwargs.items():
+            kind = _symbol_types_aliases.get(key, key)
+            if kind not in symbol_types:
+                raise TypeError(f'Got an unexpected keyword argument "{key}"')
+            if kind in values:
+                raise TypeError(f'Got multiple values for "{kind}" symbols')
+            value = np.asarray(value, dtype=np.float64)
+            if value.ndim != 2:
+                raise ValueError(f'Values for "{kind}" symbols must be a 2D array')
+            if value.shape[0] != len(self._system.get_symbols_values(kind)):
+                raise ValueError(f'Number of rows for "{kind}" symbol values must match the number of symbols of that type')
+            if num_states is not None and value.shape[1] != num_states:
+                raise ValueError('All input arrays must have the same number of columns (states)')
+            num_states = value.shape[1]
+            values[kind] = value
+
+        if t is None:
+            t = self._system.get_time().get_value()
+        t = np.asarray(t, dtype=np.float64)
+        if t.ndim > 1:
+            raise ValueError('Time values must be a number or a 1D array')
+        if t.ndim == 1:
+            if num_states is not None and t.shape[0] != num_states:
+                raise ValueError('Number of time values must match the number of states')
+            num_states = t.shape[0]
+        if num_states is None:
+            num_states = 1
+
+        # Symbol values which are not indicated are broadcasted over all the states (no copy is made)
+        for kind in symbol_types:
+            if kind not in values:
+                current = self._system.get_symbols_values(kind)
+                values[kind] = np.lib.stride_tricks.as_strided(current, shape=(current.shape[0], num_states), strides=(current.strides[0], 0))
+
+        output = np.empty((num_states, len(self._flat_outputs)), dtype=np.float64)
+
+        if self._c_optimized:
+            # Evaluate numeric function optimized
+            self._num_func_batch_optimized(
+                *[np.asarray(values[kind], dtype=np.float64) for kind in symbol_types],
+                np.ascontiguousarray(np.broadcast_to(t, (num_states,))),
+                output)
+        else:
+            # Evaluate numeric function unoptimized (symbol arrays are reshaped so that indexing
+            # a symbol returns its values on all the states)
+            batch_globals = self._batch_globals
+            for kind in symbol_types:
+                batch_globals[kind] = values[kind][:, np.newaxis, :]
+            batch_globals['t'] = t
+            batch_globals['__output__'] = output
+            exec(self._batch_code, None, batch_globals)
+
+        outputs = self._split_outputs(output)
+        if self._fused:
+            return outputs
+        return outputs[0]
 
 
 
@@ -0,0 +1,263 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This file defines the class TrajectoryRecorder
+'''
+
+######## Import statements ########
+
+# Standard imports
+from collections.abc import Mapping
+from functools import partial
+import json
+import os
+import os.path
+import numpy as np
+
+# Imports from other modules
+from lib3d_mec_ginac_ext import Matrix, NumericFunction
+
+
+
+######## Helper functions ########
+
+def _parse_recorded_values(system, record):
+    # Returns a dictionary where keys are the names of the values to be recorded and values
+    # functions with no arguments which return their current numeric values
+    if not isinstance(record, Mapping):
+        record = dict(zip(record, record))
+    states = {
+        'q': system.get_coords_values(), 'dq': system.get_velocities_values(), 'ddq': system.get_accelerations_values()
+    }
+    getters = {}
+    for name, value in record.items():
+        if not isinstance(name, str):
+            raise TypeError('Names of the recorded values must be strings')
+        if name == 't':
+            raise ValueError('"t" cannot be used as the name of a recorded value')
+        if isinstance(value, str):
+            if value not in states:
+                raise ValueError(f'Invalid value to be recorded "{value}"')
+            getters[name] = partial(np.ravel, states[value])
+        elif isinstance(value, (Matrix, NumericFunction)):
+            getters[name] = value.evaluate if isinstance(value, NumericFunction) else system.compile_numeric_function(value).evaluate
+        else:
+            raise TypeError('Recorded values must be "q", "dq", "ddq", a matrix or a numeric function')
+    return getters
+
+
+
+
+######## class TrajectoryRecorder ########
+
+class TrajectoryRecorder:
+    '''
+    This class stores the history of a simulation (time, coordinates, velocities, accelerations
+    or any other evaluated matrix) in columns: one array for each recorded value with one item per step.
+
+    Values are stored in preallocated chunks. If a directory is specified, full chunks are written to
+    disk (one raw binary file per column and a ``meta.json`` file with their dtypes and shapes),
+    so that the memory used does not grow with the length of the simulation. Those files can be
+    loaded later without copying them into memory with ``TrajectoryRecorder.load``
+
+        :Example:
+
+        >>> recorder = TrajectoryRecorder(get_default_system(), ['q', 'dq'], directory='results')
+        >>> get_simulation().get_simulator().attach_recorder(recorder)
+        >>> ...
+        >>> recorder.close()
+        >>> TrajectoryRecorder.load('results')['q'].shape
+        (1001, 3)
+
+    '''
+
+    ######## Constructor ########
+
+    def __init__(self, system, record=('q', 'dq', 'ddq'), chunk_size=4096, directory=None):
+        '''
+        Constructor.
+
+        :param record: The values to be recorded. It can be a list with the items 'q', 'dq', 'ddq'
+            (coordinates, velocities and accelerations) or a dictionary where keys are names and values
+            are one of those items or a matrix (or numeric function) to be evaluated.
+            Time values are always recorded with the name 't'
+        :param chunk_size: Number of steps stored on each chunk
+        :param directory: The directory where the recorded values are written (it is created if it doesnt exist).
+            If None (by default), they are only kept in memory.
+        '''
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise TypeError('chunk_size must be an integer greater than zero')
+        if directory is not None and not isinstance(directory, str):
+            raise TypeError('directory must be a string or None')
+
+        getters = _parse_recorded_values(system, record)
+        for name in getters.keys():
+            if not name.isidentifier():
+                raise ValueError(f'Invalid name for a recorded value "{name}"')
+
+        time = system.get_time()
+        getters = dict(t=time.get_value, **getters)
+
+        # Initialize internal fields
+        self._getters = getters
+        self._shapes = {name: np.shape(getter()) for name, getter in getters.items()}
+        self._chunk_size = chunk_size
+        self._directory = directory
+        self._chunks = {name: [] for name in getters.keys()}
+        self._files = {}
+        self._size, self._pos, self._written = 0, chunk_size, 0
+        self._closed = False
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            for name in getters.keys():
+                self._files[name] = open(os.path.join(directory, f'{name}.bin'), 'wb')
+            self._write_meta()
+
+
+
+
+    ######## Getters ########
+
+    def get_names(self):
+        '''get_names() -> List[str]
+        Get the names of the recorded values
+        '''
+        return list(self._getters.keys())
+
+
+    def is_closed(self):
+        '''is_closed() -> bool
+        Check if this recorder was closed
+        '''
+        return self._closed
+
+
+    def get_directory(self):
+        '''get_directory() -> str | None
+        Get the directory where the recorded values are written
+        '''
+        return self._directory
+
+
+    def get(self, name):
+        '''get(name: str) -> np.ndarray
+        Get all the values recorded with the given name. The first dimension of the
+        returned array is the number of recorded steps.
+        If the recorder writes to disk, a read only memory-mapped array is returned.
+        '''
+        if name not in self._getters:
+            raise KeyError(f'There is no recorded value called "{name}"')
+        shape = (self._size,) + self._shapes[name]
+
+        if self._directory is None:
+            if not self._chunks[name]:
+                return np.empty(shape, dtype=np.float64)
+            return np.concatenate(self._chunks[name])[:self._size]
+
+        self.flush()
+        if self._size == 0:
+            return np.empty(shape, dtype=np.float64)
+        return np.memmap(os.path.join(self._directory, f'{name}.bin'), dtype=np.float64, mode='r', shape=shape)
+
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+
+    def __len__(self):
+        return self._size
+
+
+
+
+    ######## Recording ########
+
+    def record(self):
+        '''record()
+        Store the current values
+        '''
+        if self._closed:
+            raise RuntimeError('Recorder is closed')
+        if self._pos == self._chunk_size:
+            self._next_chunk()
+        pos = self._pos
+        for name, getter in self._getters.items():
+            self._chunks[name][-1][pos] = getter()
+        self._pos += 1
+        self._size += 1
+
+
+
+    def _next_chunk(self):
+        # Start a new chunk. If the recorder writes to disk, the current chunk is written and its
+        # buffers are reused. Otherwise, new buffers are allocated
+        if self._directory is not None and self._chunks['t']:
+            self.flush()
+            self._pos = self._written = 0
+            return
+
+        for name, shape in self._shapes.items():
+            self._chunks[name].append(np.empty((self._chunk_size,) + shape, dtype=np.float64))
+        self._pos = self._written = 0
+
+
+
+    def flush(self):
+        '''flush()
+        Write the values recorded which are still in memory to disk (only if a directory was specified)
+        '''
+        if self._directory is None or self._closed or not self._chunks['t']:
+            return
+        for name, file in self._files.items():
+            self._chunks[name][-1][self._written:self._pos].tofile(file)
+            file.flush()
+        self._written = self._pos
+        self._write_meta()
+
+
+
+    def close(self):
+        '''close()
+        Write the remaining values to disk and close the files (only if a directory was specified)
+        No more values can be recorded after this.
+        '''
+        self.flush()
+        for file in self._files.values():
+            file.close()
+        self._closed = True
+
+
+
+    def _write_meta(self):
+        meta = {
+            'size': self._size,
+            'columns': {
+                name: {'file': f'{name}.bin', 'dtype': 'float64', 'shape': list(shape)}
+                for name, shape in self._shapes.items()
+            }
+        }
+        with open(os.path.join(self._directory, 'meta.json'), 'w') as file:
+            json.dump(meta, file)
+
+
+
+
+    ######## Load ########
+
+    @staticmethod
+    def load(directory):
+        '''load(directory: str) -> Dict[str, np.ndarray]
+        Load the values recorded in the given directory. Arrays are memory-mapped (they are not copied into memory)
+
+        :return: A dictionary with one read only array for each recorded value.
+        '''
+        with open(os.path.join(directory, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+        size, arrays = meta['size'], {}
+        for name, column in meta['columns'].items():
+            shape = (size,) + tuple(column['shape'])
+            if size == 0:
+                arrays[name] = np.empty(shape, dtype=column['dtype'])
+            else:
+                arrays[name] = np.memmap(os.path.join(directory, column['file']), dtype=column['dtype'], mode='r', shape=shape)
+        return arrays
@@ -0,0 +1,317 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This file defines the class Simulator
+'''
+
+######## Import statements ########
+
+# Standard imports
+from functools import partial
+from math import ceil
+import numpy as np
+
+# Imports from other modules
+from .integration import NumericIntegration
+from .assembly import AssemblyProblemSolver
+from .dynamics import DynamicProblemSolver
+from .recorder import _parse_recorded_values
+from lib3d_mec_ginac_ext import Matrix, NumericFunction
+
+
+
+######## class Simulator ########
+
+class Simulator:
+    '''
+    This class performs the temporal integration of a system (integration method, assembly
+    problem and dynamic problem) without any graphical environment, timer or events.
+    It can be used to run simulations as fast as possible (e.g: batch simulations).
+
+        :Example:
+
+        >>> simulator = Simulator(get_default_system())
+        >>> simulator.set_integration_method('rk4')
+        >>> simulator.assembly_problem(Phi, Phi_q, beta, Phi_init, Phi_init_q, beta_init, dPhi_dq, dPhi_init_dq)
+        >>> results = simulator.run(10, 0.01)
+        >>> results['q'].shape
+        (1001, 3)
+    '''
+
+    ######## Constructor ########
+
+    def __init__(self, system):
+        # Initialize internal fields
+        self._system = system
+        self._accelerations = None
+        self._assembly_problem_init = lambda *args, **kwargs: None
+        self._assembly_problem_step = lambda *args, **kwargs: None
+        self._recorders = []
+        self.set_integration_method('euler')
+
+
+
+
+    ######## Getters ########
+
+    def get_system(self):
+        '''get_system() -> System
+        Get the system being simulated
+        '''
+        return self._system
+
+
+    def get_recorders(self):
+        '''get_recorders() -> List[TrajectoryRecorder]
+        Get the recorders attached to this simulator
+        '''
+        return list(self._recorders)
+
+
+    def get_integration_method(self):
+        '''get_integrator() -> Callable
+        Get the current integration method to adjust system's symbol values
+        '''
+        return self._integration_method
+
+
+    def get_integration_method_name(self):
+        '''get_integration_method_name() -> str
+        Get the current integration method`s name to adjust system's symbol values
+        '''
+        method = self.get_integration_method()
+        if isinstance(method, partial):
+            return method.func.__name__
+        return method.__name__
+
+
+
+
+    ######## Setters ########
+
+    def set_integration_method(self, method, **kwargs):
+        '''set_integrator(method: IntegrationMethod)
+        Change integration method to adjust system's symbol values
+        :param method: Must be a callable for a custom integration method or
+            the name of a predefined integrator like 'euler', 'rk4', 'rk45', 'rk23'
+        :param kwargs: Additional keyword arguments for the predefined integrators
+            (e.g: ``rtol`` and ``atol`` for the adaptive methods 'rk45' and 'rk23')
+
+        .. note::
+            The predefined integrators update the time symbol at each of their stages and evaluate
+            the accelerations set with ``set_accelerations``. If they are not set, accelerations are
+            constant during each step and all the integrators give the same results as 'euler'.
+            Custom integration methods are called after the time is increased.
+        '''
+        if not isinstance(method, str) and not callable(method):
+            raise TypeError('Integration method must be a callable or a string')
+
+        if isinstance(method, str):
+            method = NumericIntegration.get_method(method)
+
+        system = self._system
+        q_values   = system.get_coords_values()
+        dq_values  = system.get_velocities_values()
+        ddq_values = system.get_accelerations_values()
+
+        if method in NumericIntegration.get_methods():
+            # Predefined integrators evaluate the accelerations at each stage (updating the time)
+            # and reuse their stage buffers between steps
+            self._integration_method = partial(method, q_values, dq_values, ddq_values,
+                accelerations=self._accelerations, workspace={}, time=system.get_time(), **kwargs)
+        else:
+            if kwargs:
+                raise TypeError('Additional arguments can only be specified for predefined integration methods')
+            self._integration_method = partial(method, q_values, dq_values, ddq_values)
+
+
+
+    def set_accelerations(self, accelerations):
+        '''set_accelerations(accelerations: Matrix | NumericFunction | Callable | None)
+        Set how the accelerations are computed from the coordinates and velocities.
+        The predefined integration methods evaluate them at each of their stages.
+
+        :param accelerations: It can be a column matrix (or a numeric function) with the
+            expressions of the accelerations, a callable with no arguments which updates the
+            accelerations numeric values in place, or None (accelerations remain constant
+            during the integration)
+        '''
+        if accelerations is not None and not isinstance(accelerations, (Matrix, NumericFunction)) and not callable(accelerations):
+            raise TypeError('Input argument must be a Matrix, NumericFunction, callable or None')
+
+        if isinstance(accelerations, (Matrix, NumericFunction)):
+            func = accelerations
+            if isinstance(func, Matrix):
+                func = self._system.compile_numeric_function(func)
+            ddq_values = self._system.get_accelerations_values()
+            def accelerations():
+                func.evaluate_into(ddq_values)
+
+        self._accelerations = accelerations
+
+        # Rebind the current integration method
+        method = self._integration_method
+        if method.func in NumericIntegration.get_methods():
+            self._integration_method = partial(method, accelerations=accelerations)
+
+
+
+    def assembly_problem(self, *args, **kwargs):
+        '''assembly_problem(...)
+        Setup assembly problem constraints and parameters
+
+        You must pass first the next constraints as positional arguments:
+        Phi, Phi_q, beta, Phi_init, Phi_init_q, beta_init, dPhi_dq, dPhi_init_dq
+
+        and then you can specify additional parameters (this is optional):
+        geom_eq_tol, geom_eq_relax, geom_eq_init_tol, geom_eq_init_relax,
+        method ('pinv' or 'newton'), max_iterations, reuse_jacobian
+        '''
+        solver = AssemblyProblemSolver(self._system, *args, **kwargs)
+        system = self._system
+        q_values   = system.get_coords_values()
+        dq_values  = system.get_velocities_values()
+        ddq_values = system.get_accelerations_values()
+        self._assembly_problem_init = partial(solver.init, q_values, dq_values, ddq_values)
+        self._assembly_problem_step = partial(solver.step, q_values, dq_values, ddq_values)
+
+
+
+    def dynamic_problem(self, *args, **kwargs):
+        '''dynamic_problem(...)
+        Setup the dynamic equations, so that the accelerations are computed from them
+        on each integration step
+
+        You must pass first the next matrices as positional arguments:
+        M_qq, delta_q and optionally Phi_q, gamma
+
+        and then you can specify additional parameters (this is optional):
+        method ('lu' or 'cholesky'), c_optimized, regularization
+        '''
+        solver = DynamicProblemSolver(self._system, *args, **kwargs)
+        ddq_values = self._system.get_accelerations_values()
+        self.set_accelerations(partial(solver.solve, ddq_values))
+
+
+
+
+    def attach_recorder(self, recorder):
+        '''attach_recorder(recorder: TrajectoryRecorder)
+        Attach a recorder to this simulator. It will store the state of the system
+        after the initialization and each simulation step.
+        '''
+        if not hasattr(recorder, 'record') or not callable(recorder.record):
+            raise TypeError('Input argument must be a TrajectoryRecorder')
+        if recorder not in self._recorders:
+            self._recorders.append(recorder)
+
+
+    def detach_recorder(self, recorder):
+        '''detach_recorder(recorder: TrajectoryRecorder)
+        Detach a recorder previously attached to this simulator
+        '''
+        try:
+            self._recorders.remove(recorder)
+        except ValueError:
+            raise ValueError('The recorder is not attached to this simulator')
+
+
+
+
+    ######## Simulation ########
+
+    def init(self):
+        '''init()
+        Solve the assembly problem initialization (if it was configured)
+        '''
+        self._assembly_problem_init()
+        for recorder in self._recorders:
+            recorder.record()
+
+
+
+    def step(self, delta_t, update_time=True):
+        '''step(delta_t: float[, update_time: bool])
+        Perform one integration step and solve the assembly problem
+
+        :param delta_t: The integration time
+        :param update_time: If True (by default), the time symbol is also increased by delta_t
+        '''
+        time, method = self._system.get_time(), self._integration_method
+        if method.func in NumericIntegration.get_methods():
+            # Predefined integration methods increase the time by themselves
+            t0 = time.value
+            method(delta_t)
+            if not update_time:
+                time.value = t0
+        else:
+            if update_time:
+                time.value += delta_t
+            method(delta_t)
+        self._assembly_problem_step(delta_t)
+        for recorder in self._recorders:
+            recorder.record()
+
+
+
+    def run(self, t_end, delta_t, record=('q', 'dq', 'ddq'), init=True):
+        '''run(t_end: float, delta_t: float[, record: Iterable | Mapping[, init: bool]]) -> Dict[str, np.ndarray]
+        Run the simulation from the current time until ``t_end`` with a fixed integration time.
+        The last step is shortened to finish exactly at ``t_end``
+
+        :param record: The values to be stored after each step. It can be a list with
+            the items 'q', 'dq', 'ddq' (coordinates, velocities and accelerations) or a dictionary
+            where keys are names and values are one of those items or a matrix (or numeric function)
+            to be evaluated.
+        :param init: If True (by default), the assembly problem initialization is solved first.
+
+        :return: A dictionary with the recorded values. Each one is a numpy array with one
+            item per step (including the initial state). The key 't' stores the time values.
+        :rtype: Dict[str, np.ndarray]
+
+        '''
+        try:
+            t_end, delta_t = float(t_end), float(delta_t)
+            if delta_t <= 0:
+                raise TypeError
+        except (TypeError, ValueError):
+            raise TypeError('t_end must be a number and delta_t a number greater than zero')
+
+        system = self._system
+        t = system.get_time()
+
+        # Parse the values to be recorded
+        getters = _parse_recorded_values(system, record)
+
+        if init:
+            self.init()
+
+        # Preallocate the output arrays
+        num_steps = max(ceil((t_end - t.value) / delta_t - 1e-9), 0)
+        times = np.empty(num_steps + 1, dtype=np.float64)
+        outputs = {}
+        for name, getter in getters.items():
+            value = getter()
+            outputs[name] = np.empty((num_steps + 1,) + value.shape, dtype=np.float64)
+            outputs[name][0] = value
+        times[0] = t.value
+
+        # Simulation loop
+        integration_method, assembly_problem_step = self._integration_method, self._assembly_problem_step
+        updates_time = integration_method.func in NumericIntegration.get_methods()
+        recorders = tuple(self._recorders)
+        items = tuple((outputs[name], getter) for name, getter in getters.items())
+        for k in range(1, num_steps + 1):
+            h = min(delta_t, t_end - t.value)
+            if not updates_time:
+                t.value += h
+            integration_method(h)
+            assembly_problem_step(h)
+            for recorder in recorders:
+                recorder.record()
+
+            times[k] = t.value
+            for output, getter in items:
+                output[k] = getter()
+
+        outputs['t'] = times
+        return outputs
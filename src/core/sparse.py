@@ -0,0 +1,246 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This file defines the classes SparseMatrix and SparseNumericFunction
+'''
+
+######## Import statements ########
+
+# Standard imports
+import numpy as np
+
+# Imports from other modules
+from lib3d_mec_ginac_ext import Matrix
+
+try:
+    import scipy.sparse
+    _scipy_installed = True
+except ImportError:
+    # No problem, sparse matrices can be converted to dense arrays anyway
+    _scipy_installed = False
+
+
+
+
+######## class SparseMatrix ########
+
+class SparseMatrix:
+    '''
+    This class represents a symbolic matrix where only the non zero entries are stored
+    (in compressed sparse row format). Instances of this class are returned by ``sparse_jacobian``
+
+        :Example:
+
+        >>> Phi_q = sparse_jacobian(Phi, q)
+        >>> Phi_q.shape
+        (40, 45)
+        >>> Phi_q.nnz
+        112
+        >>> func = compile_numeric_function(Phi_q)
+        >>> func.evaluate_sparse()
+        <40x45 sparse matrix of type '<class 'numpy.float64'>' with 112 stored elements in Compressed Sparse Row format>
+
+    '''
+
+    ######## Constructor ########
+
+    def __init__(self, shape, rows, cols, values):
+        '''
+        Constructor.
+
+        :param shape: The shape of the matrix (number of rows and columns)
+        :param rows: The row index of each non zero entry
+        :param cols: The column index of each non zero entry
+        :param values: The symbolic expression of each non zero entry
+        '''
+        num_rows, num_cols = shape
+        rows, cols, values = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64), list(values)
+        if rows.shape != cols.shape or len(values) != rows.shape[0]:
+            raise ValueError('rows, cols and values must have the same length')
+        if rows.size > 0 and (rows.min() < 0 or rows.max() >= num_rows or cols.min() < 0 or cols.max() >= num_cols):
+            raise IndexError('Indices of the non zero entries are out of range')
+
+        # Sort the entries by row (and column)
+        order = np.lexsort((cols, rows))
+        rows, cols, values = rows[order], cols[order], [values[k] for k in order]
+
+        # Initialize internal fields
+        self._shape = (num_rows, num_cols)
+        self._indices = cols
+        self._indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=num_rows)))).astype(np.int64)
+        self._values = Matrix(values, shape=(len(values), 1)) if values else None
+
+
+
+    ######## Getters ########
+
+    def get_shape(self):
+        '''get_shape() -> Tuple[int, int]
+        Get the shape of this matrix
+        '''
+        return self._shape
+
+
+    def get_nnz(self):
+        '''get_nnz() -> int
+        Get the number of non zero entries stored in this matrix
+        '''
+        return self._indices.shape[0]
+
+
+    def get_indptr(self):
+        '''get_indptr() -> np.ndarray
+        Get the row pointers of this matrix (in compressed sparse row format)
+        '''
+        return self._indptr
+
+
+    def get_indices(self):
+        '''get_indices() -> np.ndarray
+        Get the column indices of the non zero entries (in compressed sparse row format)
+        '''
+        return self._indices
+
+
+    def get_values(self):
+        '''get_values() -> Matrix | None
+        Get the non zero entries as a column matrix (or None if there are no entries)
+        '''
+        return self._values
+
+
+    def to_dense(self):
+        '''to_dense() -> Matrix
+        Convert this matrix to a regular (dense) symbolic matrix
+        '''
+        num_rows, num_cols = self._shape
+        dense = Matrix(shape=self._shape)
+        if self._values is not None:
+            for i in range(0, num_rows):
+                for k in range(self._indptr[i], self._indptr[i + 1]):
+                    dense[i, int(self._indices[k])] = self._values[int(k)]
+        return dense
+
+
+
+    ######## Properties ########
+
+    @property
+    def shape(self):
+        '''
+        Only read property that returns the shape of this matrix
+
+        .. seealso:: :func:`get_shape`
+        '''
+        return self.get_shape()
+
+
+    @property
+    def nnz(self):
+        '''
+        Only read property that returns the number of non zero entries of this matrix
+
+        .. seealso:: :func:`get_nnz`
+        '''
+        return self.get_nnz()
+
+
+
+    ######## Printing ########
+
+    def __str__(self):
+        return f'SparseMatrix(shape={self._shape}, nnz={self.nnz})'
+
+
+    def __repr__(self):
+        return str(self)
+
+
+
+
+######## class SparseNumericFunction ########
+
+class SparseNumericFunction:
+    '''
+    Objects of this class can be used to evaluate numerically a sparse symbolic matrix.
+    Only the non zero entries are computed. They are returned by ``compile_numeric_function``
+    when a ``SparseMatrix`` is given.
+    '''
+
+    ######## Constructor ########
+
+    def __init__(self, matrix, func):
+        '''
+        Constructor.
+
+        :param matrix: The sparse symbolic matrix
+        :param func: The numeric function which evaluates the non zero entries (None if there are not any)
+        '''
+        self._matrix, self._func = matrix, func
+        self._data = np.zeros(matrix.nnz, dtype=np.float64)
+        self._csr = None
+
+
+
+    ######## Getters ########
+
+    def get_matrix(self):
+        '''get_matrix() -> SparseMatrix
+        Get the sparse symbolic matrix evaluated by this function
+        '''
+        return self._matrix
+
+
+    def get_numeric_function(self):
+        '''get_numeric_function() -> NumericFunction | None
+        Get the numeric function which evaluates the non zero entries
+        '''
+        return self._func
+
+
+
+    ######## Evaluation ########
+
+    def evaluate(self):
+        '''evaluate() -> np.ndarray
+        Evaluate the non zero entries of the matrix.
+
+        :return: A 1D array with the values of the non zero entries (in the same order as the
+            column indices of the matrix). The same array is reused on each call
+        :rtype: np.ndarray
+        '''
+        if self._func is not None:
+            self._func.evaluate_into(self._data)
+        return self._data
+
+
+    def evaluate_sparse(self):
+        '''evaluate_sparse() -> scipy.sparse.csr_matrix
+        Evaluate the matrix as a scipy sparse matrix (in compressed sparse row format).
+        The same matrix object is updated and returned on each call (scipy must be installed).
+        '''
+        if not _scipy_installed:
+            raise ImportError('scipy must be installed to evaluate sparse matrices')
+        data = self.evaluate()
+        if self._csr is None:
+            matrix = self._matrix
+            self._csr = scipy.sparse.csr_matrix((data, matrix.get_indices(), matrix.get_indptr()), shape=matrix.shape, copy=False)
+        return self._csr
+
+
+    def evaluate_dense(self):
+        '''evaluate_dense() -> np.ndarray
+        Evaluate the matrix as a regular (dense) numpy array
+        '''
+        matrix = self._matrix
+        data = self.evaluate()
+        dense = np.zeros(matrix.shape, dtype=np.float64)
+        rows = np.repeat(np.arange(0, matrix.shape[0]), np.diff(matrix.get_indptr()))
+        dense[rows, matrix.get_indices()] = data
+        return dense
+
+
+    def __call__(self):
+        '''
+        This is an alias of ``evaluate``
+        '''
+        return self.evaluate()
@@ -0,0 +1,260 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This file defines the class ParameterSweep
+'''
+
+######## Import statements ########
+
+# Standard imports
+from collections.abc import Mapping, Iterable
+from copy import deepcopy
+from math import ceil
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import numpy as np
+
+# Imports from other modules
+from .recorder import _parse_recorded_values
+
+
+
+######## Worker processes ########
+
+# State of the sweep in the worker processes (it is inherited from the parent process
+# when forking or initialized by _init_sweep_worker otherwise)
+_sweep_state = None
+
+
+
+def _init_sweep_worker(builder, settings, shm_specs):
+    # Builds the system replica on a worker process which was not forked from the parent
+    global _sweep_state
+    simulator = builder()
+    buffers, shms = {}, []
+    for name, (shm_name, shape) in shm_specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        shms.append(shm)
+        buffers[name] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _sweep_state = _SweepState(simulator, settings, buffers)
+    _sweep_state.shms = shms
+
+
+
+def _run_sweep_worker(index):
+    # Simulates the system with the kth parameter set. Results are written directly to
+    # the shared memory buffers
+    _sweep_state.run(index)
+    return index
+
+
+
+class _SweepState:
+    # Stores the system replica and the output buffers of a sweep in a worker process
+    def __init__(self, simulator, settings, buffers):
+        system = simulator.get_system()
+        self.simulator, self.system = simulator, system
+        self.settings, self.buffers = settings, buffers
+
+        # Initial state of the system (including the auxiliar coordinates)
+        self.state = tuple((values, values.copy()) for values in (
+            system.get_coords_values(), system.get_velocities_values(), system.get_accelerations_values(),
+            system.get_aux_coords_values(), system.get_aux_velocities_values(), system.get_aux_accelerations_values()))
+        self.t0 = system.get_time().get_value()
+
+        # Initial state of the integrator (e.g. the last step size of the adaptive methods)
+        self.workspace = simulator.get_integration_method().keywords.get('workspace')
+        if self.workspace is not None:
+            self.initial_workspace = deepcopy(self.workspace)
+
+
+    def run(self, index):
+        simulator, system, settings = self.simulator, self.system, self.settings
+
+        # Restore the initial state (of the system and the integrator) and set the parameter values
+        for values, initial_values in self.state:
+            np.copyto(values, initial_values)
+        system.get_time().set_value(self.t0)
+        if self.workspace is not None:
+            self.workspace.clear()
+            self.workspace.update(deepcopy(self.initial_workspace))
+        for name, value in zip(settings['names'], settings['values'][index]):
+            system.set_value(name, value)
+
+        # Run the simulation
+        results = simulator.run(settings['t_end'], settings['delta_t'], settings['record'])
+        for name, values in results.items():
+            self.buffers[name][index] = values
+
+
+
+
+######## class ParameterSweep ########
+
+class ParameterSweep:
+    '''
+    This class runs many simulations of the same model with different parameter values
+    in parallel (one worker process per core).
+
+    The model is defined by a builder: a function with no arguments which creates the system,
+    its symbolic matrices and returns a configured ``Simulator``. It is called once in this process.
+    When the platform supports it, worker processes are forked from it (system replicas and their
+    compiled numeric functions are inherited). Otherwise, the builder is invoked once on each worker
+    (in that case, it must be picklable e.g a function defined at module level).
+    The results are written by the workers directly on shared memory.
+
+        :Example:
+
+        >>> def build():
+        ...     ... # Define the system & matrices
+        ...     simulator = Simulator(get_default_system())
+        ...     simulator.assembly_problem(Phi, Phi_q, beta, Phi_init, Phi_init_q, beta_init, dPhi_dq, dPhi_init_dq)
+        ...     return simulator
+        >>> sweep = ParameterSweep(build, {'l1': [0.4, 0.5, 0.6], 'K': [10, 10, 20]})
+        >>> results = sweep.run(t_end=5, delta_t=0.01, record=['q'])
+        >>> results['q'].shape
+        (3, 501, 4)
+
+    '''
+
+    ######## Constructor ########
+
+    def __init__(self, builder, parameters, num_workers=None):
+        '''
+        Constructor.
+
+        :param builder: A callable with no arguments which returns a ``Simulator`` instance.
+        :param parameters: The parameter sets to be simulated. It can be a dictionary where keys
+            are parameter names and values lists with one value for each set (all with the same length) or
+            a list of dictionaries (one for each parameter set).
+        :param num_workers: Number of worker processes. By default, the number of cores.
+        '''
+        if not callable(builder):
+            raise TypeError('builder must be a callable object')
+
+        # Parse parameter sets
+        if isinstance(parameters, Mapping):
+            names = tuple(parameters.keys())
+            values = np.array([np.asarray(parameters[name], dtype=np.float64) for name in names]).T
+            if values.ndim != 2:
+                raise ValueError('All the parameters must have the same number of values')
+        elif isinstance(parameters, Iterable):
+            parameters = list(parameters)
+            if not all(map(lambda item: isinstance(item, Mapping), parameters)):
+                raise TypeError('parameters must be a dictionary or a list of dictionaries')
+            names = tuple(parameters[0].keys()) if parameters else ()
+            if any(map(lambda item: set(item.keys()) != set(names), parameters)):
+                raise ValueError('All parameter sets must have the same parameters')
+            values = np.array([[item[name] for name in names] for item in parameters], dtype=np.float64).reshape(len(parameters), len(names))
+        else:
+            raise TypeError('parameters must be a dictionary or a list of dictionaries')
+
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        if not isinstance(num_workers, int) or num_workers <= 0:
+            raise TypeError('num_workers must be an integer greater than zero')
+
+        # Build the model on this process
+        simulator = builder()
+        system = simulator.get_system()
+        for name in names:
+            if not system.has_parameter(name):
+                raise IndexError(f'There is no parameter called "{name}"')
+
+        # Initialize internal fields
+        self._builder, self._simulator = builder, simulator
+        self._names, self._values = names, values
+        self._num_workers = num_workers
+
+
+
+    ######## Getters ########
+
+    def get_parameter_names(self):
+        '''get_parameter_names() -> Tuple[str]
+        Get the names of the parameters modified by this sweep
+        '''
+        return self._names
+
+
+    def get_parameter_values(self):
+        '''get_parameter_values() -> np.ndarray
+        Get the parameter values of this sweep (one row for each parameter set and one column for
+        each parameter)
+        '''
+        return self._values
+
+
+    def __len__(self):
+        return self._values.shape[0]
+
+
+
+
+    ######## Simulation ########
+
+    def run(self, t_end, delta_t, record=('q', 'dq', 'ddq'), callback=None):
+        '''run(t_end: float, delta_t: float[, record: Iterable | Mapping[, callback: Callable]]) -> Dict[str, np.ndarray]
+        Run all the simulations from the initial state of the model until t_end.
+
+        :param record: The values to be stored after each step (see :func:`Simulator.run`)
+        :param callback: An optional callable invoked with the index of each parameter set when its
+            simulation finishes (in this process)
+
+        :return: A dictionary with the recorded values. Each item is an array where the first dimension
+            is the parameter set and the second one the simulation step.
+        :rtype: Dict[str, np.ndarray]
+        '''
+        if callback is not None and not callable(callback):
+            raise TypeError('callback must be a callable object')
+
+        simulator, system = self._simulator, self._simulator.get_system()
+        num_sets = len(self)
+
+        # Compute the shape of the results
+        t0 = system.get_time().get_value()
+        num_steps = max(ceil((float(t_end) - t0) / float(delta_t) - 1e-9), 0)
+        getters = _parse_recorded_values(system, record)
+        shapes = {name: (num_sets, num_steps + 1) + np.shape(getter()) for name, getter in getters.items()}
+        shapes['t'] = (num_sets, num_steps + 1)
+
+        settings = {
+            'names': self._names, 'values': self._values,
+            't_end': t_end, 'delta_t': delta_t, 'record': record
+        }
+
+        # Allocate the results on shared memory
+        shms, buffers = {}, {}
+        try:
+            for name, shape in shapes.items():
+                shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+                shms[name] = shm
+                buffers[name] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+            global _sweep_state
+            if 'fork' in multiprocessing.get_all_start_methods():
+                # Workers inherit the system replica & the output buffers
+                context = multiprocessing.get_context('fork')
+                _sweep_state = _SweepState(simulator, settings, buffers)
+                pool = context.Pool(min(self._num_workers, max(num_sets, 1)))
+            else:
+                context = multiprocessing.get_context()
+                shm_specs = {name: (shm.name, shapes[name]) for name, shm in shms.items()}
+                pool = context.Pool(min(self._num_workers, max(num_sets, 1)),
+                    initializer=_init_sweep_worker, initargs=(self._builder, settings, shm_specs))
+
+            try:
+                with pool:
+                    for index in pool.imap_unordered(_run_sweep_worker, range(0, num_sets)):
+                        if callback is not None:
+                            callback(index)
+            finally:
+                _sweep_state = None
+
+            return {name: buffer.copy() for name, buffer in buffers.items()}
+
+        finally:
+            buffers.clear()
+            for shm in shms.values():
+                shm.close()
+                shm.unlink()
@@ -10,17 +10,28 @@ This module defines the class System
 
 # From the Cython extension
 from lib3d_mec_ginac_ext import _System, _symbol_types, _geom_types, _parse_symbol_type, _parse_numeric_value
+from lib3d_mec_ginac_ext import _compile_numeric_functions_cython, _compile_numeric_functions_c, _print_expr_dflt
+from lib3d_mec_ginac_ext import _compile_numeric_functions_background
 from lib3d_mec_ginac_ext import *
 
 # From other modules
 from ..utils.events import EventProducer
+from .sparse import SparseMatrix, SparseNumericFunction
+from .cexport import export_simulation_C as _export_simulation_C
 
 # Standard imports
 import math
+import gzip
+import multiprocessing
+import json
+import warnings
+from collections import OrderedDict, namedtuple
 from collections.abc import MutableMapping
+from weakref import WeakKeyDictionary
 from types import SimpleNamespace
-from functools import partial, lru_cache
-from operator import methodcaller
+from functools import partial
+from itertools import chain
+from operator import methodcaller, attrgetter
 import numpy as np
 from tabulate import tabulate
 
@@ -63,6 +74,9 @@ class System(_System, EventProducer):
         # to restore them when the simulation is restarted.
         self._state = None
 
+        # Numeric functions compiled (indexed by the contents of the matrices)
+        self._compiled_functions = CompiledFunctionsCache()
+
         try:
             from ..drawing.scene import Scene
             # Create scene visualizer (to show drawings)
@@ -1486,8 +1500,8 @@ class System(_System, EventProducer):
 
 
 
-    def jacobian(self, *args, **kwargs):
-        '''jacobian(x: Matrix, y: Matrix | SymbolNumeric, symmetric: Expr) -> Matrix
+    def jacobian(self, *args, num_workers=None, **kwargs):
+        '''jacobian(x: Matrix, y: Matrix | SymbolNumeric, symmetric: Expr[, num_workers: int]) -> Matrix
         Compute the jacobian matrix between two matrices or a matrix and a symbol
 
         The next example shows how to calculate the jacobian of a row matrix with respect
@@ -1532,15 +1546,75 @@ class System(_System, EventProducer):
             jacobian matrix computation should be symmetric or not. 0 for non symmetric.
             Otherwise it will be symmetric ( when evaluating the expression numerically )
             By default it is set to 0
+        :param int num_workers: If it is greater than 1, the entries of the first matrix are differentiated
+            in parallel by that number of worker processes (it cannot be combined with ``symmetric``).
+            The derivatives are returned unatomized. By default, they are computed on this process.
+
+        .. seealso:: :func:`sparse_jacobian` (only the entries which depend on the symbols are
+            differentiated, which is much faster for large systems)
 
         '''
+        if _parse_num_workers(num_workers) > 1:
+            if len(args) != 2 or kwargs:
+                raise TypeError('num_workers can only be specified with two positional arguments')
+            x, y = args
+            if not isinstance(x, Matrix):
+                raise TypeError('The first argument must be a matrix')
+            if x.get_num_rows() != 1 and x.get_num_cols() != 1:
+                raise ValueError('The first argument must be a row-matrix or col-matrix')
+            if not isinstance(y, (Matrix, SymbolNumeric)):
+                raise TypeError('The second argument after the matrix must be a matrix or a symbol')
+            if isinstance(y, Matrix):
+                if y.get_num_cols() != 1 and y.get_num_rows() != 1:
+                    raise ValueError('The second argument must be a column-matrix or a symbol')
+                if not y.are_all_values_symbols(self):
+                    raise ValueError('All symbolic expressions in the second matrix should be composed only by one symbol')
+            symbols = [y] if isinstance(y, SymbolNumeric) else y.get_values_as_symbols(self)
+            return Matrix(self._parallel_diff(list(x), symbols, num_workers), shape=[len(x), len(symbols)])
         return self._jacobian(args, kwargs)
 
 
 
+    def sparse_jacobian(self, x, y):
+        '''sparse_jacobian(x: Matrix, y: Matrix) -> SparseMatrix
+        Compute the jacobian matrix between two matrices, storing only its non zero entries.
+        Each expression is only derived with respect the symbols it depends on (atoms are
+        taken into account), so this is much faster than ``jacobian`` for large systems
+        where each constraint involves only a few coordinates.
+
+            :Example:
+
+            >>> a, b, c = new_coord('a'), new_coord('b'), new_coord('c')
+            >>> m = Matrix([a ** 2 + b, c * b, c])
+            >>> J = sparse_jacobian(m, Matrix([a, b, c]))
+            >>> J.shape, J.nnz
+            ((3, 3), 5)
+            >>> J.to_dense()
+            ╭             ╮
+            │ 2*a  1    0 │
+            │   0  c    b │
+            │   0  0    1 │
+            ╰             ╯
+
+        :param Matrix x: Must be a row or column matrix
+        :param Matrix y: Must be a row or column matrix whose values are all symbols
+        :rtype: SparseMatrix
+
+        The derivatives are memoized by the structural hash of each expression, so when the model is
+        redefined only the entries which changed are differentiated again (see :func:`clear_derivatives_cache`).
+        Call ``to_dense`` on the result to get a regular matrix.
+
+        .. seealso:: :func:`jacobian`, :class:`SparseMatrix`
+
+        '''
+        rows, cols, values = self._sparse_jacobian(x, y)
+        return SparseMatrix((len(x), len(y)), rows, cols, values)
+
 
-    def diff(self, x, symbol):
-        '''diff(x: Expr | Matrix | Wrench3D, symbol: SymbolNumeric) -> Expr | Matrix | Wrench3D
+
+
+    def diff(self, x, symbol, num_workers=None):
+        '''diff(x: Expr | Matrix | Wrench3D, symbol: SymbolNumeric[, num_workers: int]) -> Expr | Matrix | Wrench3D
         Computes the derivative of the given expression, matrix, vector, tensor or wrench
         with respect a symbol.
 
@@ -1572,14 +1646,68 @@ class System(_System, EventProducer):
         :type symbol: SymbolNumeric, str
 
 
+        :param int num_workers: If it is greater than 1 and a matrix is given, its entries are differentiated
+            in parallel by that number of worker processes (the derivatives are returned unatomized).
+            By default, they are computed on this process.
+
         :rtype: Expr, Matrix, Wrench3D
 
 
         '''
+        if _parse_num_workers(num_workers) > 1 and isinstance(x, Matrix) and not isinstance(x, (Vector3D, Tensor3D)):
+            if isinstance(symbol, str):
+                symbol = self.get_symbol(symbol)
+            if not isinstance(symbol, SymbolNumeric):
+                raise TypeError('symbol must be a SymbolNumeric or str object')
+            return Matrix(self._parallel_diff(list(x), [symbol], num_workers), shape=x.shape)
         return self._diff(x, symbol)
 
 
 
+    def _parallel_diff(self, exprs, symbols, num_workers):
+        # Computes the derivatives of the given expressions with respect the given symbols (a list with
+        # the derivatives of the first expression, then the second, ...) with many worker processes.
+        # Expressions are sent to the workers printed with the GiNaC default format in blocks and each
+        # worker parses them with a system which has the same symbols. The derivatives are sent back as text
+        # and parsed with this system
+        if not exprs or not symbols:
+            return []
+        num_workers = min(num_workers, len(exprs))
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with context.Pool(num_workers, initializer=_init_diff_worker,
+            initargs=(self._dump_symbols(), [symbol.get_name() for symbol in symbols])) as pool:
+            texts = pool.map(_diff_worker, map(_print_expr_dflt, exprs), chunksize=math.ceil(len(exprs) / (4 * num_workers)))
+        return self._parse_exprs(list(chain.from_iterable(texts)))
+
+
+
+    def get_derivatives_cache_size(self):
+        '''get_derivatives_cache_size() -> int
+        Get the number of derivatives memoized by ``sparse_jacobian``
+
+        .. seealso:: :func:`clear_derivatives_cache`
+
+        '''
+        return self._get_derivatives_cache_size()
+
+
+
+    def clear_derivatives_cache(self):
+        '''clear_derivatives_cache()
+        Remove all the derivatives memoized by ``sparse_jacobian``.
+
+        Derivatives are indexed by the structural hash of the expressions (not by the identity of
+        the python objects), so when a model is redefined (e.g. a notebook cell is executed again) only the
+        expressions which actually changed are differentiated again. Call this method to release the memory
+        they use.
+
+        .. seealso:: :func:`get_derivatives_cache_size`
+
+        '''
+        self._clear_derivatives_cache()
+
+
+
 
     def to_symbol(self, x):
         '''to_symbol(x: Expr | SymbolNumeric) -> SymbolNumeric
@@ -1633,25 +1761,109 @@ class System(_System, EventProducer):
 
     ######## Numeric evaluation ########
 
-    @lru_cache(maxsize=256)
-    def _compile_numeric_function_cached(self, matrix, c_optimized=False):
-        return self._compile_numeric_function(matrix.wrapped, c_optimized)
+    def _compile_numeric_function_cached(self, matrix, c_optimized=False, c_backend=False, background=False):
+        matrices = tuple(matrix) if isinstance(matrix, list) else (matrix,)
+        for item in matrices:
+            if not isinstance(item, Matrix):
+                raise TypeError('Input argument must be a Matrix or a list of matrices')
+        background = background and (c_optimized or c_backend)
+
+        def compile():
+            if background:
+                # The python version is returned and compiled in the background
+                func = self._compile_numeric_function(matrix, False)
+                _compile_numeric_functions_background([func], _compile_numeric_functions_cython if c_optimized else _compile_numeric_functions_c)
+                return func
+            return self._compile_numeric_function(matrix, c_optimized, c_backend)
 
+        options = (isinstance(matrix, list), c_optimized, c_backend, background, get_atomization_state())
+        return self._compiled_functions.get(matrices, options, compile)
 
-    def compile_numeric_function(self, matrix, c_optimized=False):
+
+    def compile_numeric_function(self, matrix, c_optimized=False, c_backend=False, background=False):
         '''
         Get a function that can be used to evaluate the given matrix numerically.
 
+        If a list of matrices is given instead, a fused numeric function is returned:
+        the atoms shared by all the matrices are computed only once and its evaluation
+        returns a tuple with one numpy array for each matrix.
+
+            :Example:
+
+            >>> func = compile_numeric_function([Phi, Phi_q])
+            >>> Phi_num, Phi_q_num = func.evaluate()
+
         :param c_optimized: If set to True, compile the underline numeric function
             as a cython extension. The numeric function evaluation will be faster but
             this method will be slower (a few seconds to generate and compile the cython extension)
             Otherwise, if its False (by default), the underline function is compiled as a
             regular python function.
 
+        :param c_backend: If set to True, C code is generated for the numeric function and
+            compiled directly as a shared library (loaded via ctypes). Cython is not needed, only
+            a C compiler. It cannot be enabled along with ``c_optimized``
+
+        :param background: If set to True along with ``c_optimized`` or ``c_backend``, this method
+            returns immediately and the numeric function is compiled on a background thread.
+            Until the build finishes, it is evaluated with its python version. Then it
+            switches to the compiled code automatically.
+            Use ``get_compilation_future`` to wait for it.
+
+        If a sparse matrix is given (see :func:`sparse_jacobian`), only its non zero entries
+        are evaluated and a ``SparseNumericFunction`` is returned.
+
+        The numeric functions compiled are cached by the contents of the matrices: compiling again
+        a matrix with the same expressions (even if its a different object) returns the same numeric function
+        (see :func:`get_compiled_functions_cache_info`).
+
         .. seealso:: :func:`evaluate`
 
         '''
-        return self._compile_numeric_function_cached(HashObjectWrapper(matrix), c_optimized)
+        if c_optimized and c_backend:
+            raise ValueError('c_optimized and c_backend cannot be enabled at the same time')
+        if isinstance(matrix, SparseMatrix):
+            values = matrix.get_values()
+            func = self._compile_numeric_function_cached(values, c_optimized, c_backend, background) if values is not None else None
+            return SparseNumericFunction(matrix, func)
+        if isinstance(matrix, (list, tuple)):
+            return self._compile_numeric_function_cached(list(matrix), c_optimized, c_backend, background)
+        return self._compile_numeric_function_cached(matrix, c_optimized, c_backend, background)
+
+
+
+    def compile_numeric_functions(self, *matrices, c_optimized=False, c_backend=False, background=False):
+        '''compile_numeric_functions(*matrices: Matrix[, c_optimized: bool[, c_backend: bool[, background: bool]]]) -> Tuple[NumericFunction]
+        Get a list of functions that can be used to evaluate the given matrices numerically.
+
+            :Example:
+
+            >>> Phi_func, Phi_q_func = compile_numeric_functions(Phi, Phi_q, c_optimized=True)
+
+        :param c_optimized: If set to True, all the numeric functions are compiled together
+            as cython extensions, which is much faster than compiling each matrix separately with
+            ``compile_numeric_function``: they are split in groups with a similar amount of code
+            (one per core, see :func:`set_numeric_functions_max_build_workers`), each group is
+            compiled as one extension and all of them are built in parallel.
+
+        :param c_backend: If set to True, all the numeric functions are generated as C code and
+            compiled together as shared libraries (grouped and built in parallel as with ``c_optimized``).
+
+        :param background: If set to True, the numeric functions are returned immediately and
+            compiled on a background thread (see :func:`compile_numeric_function`)
+
+        .. seealso:: :func:`compile_numeric_function`
+
+        '''
+        if c_optimized and c_backend:
+            raise ValueError('c_optimized and c_backend cannot be enabled at the same time')
+        funcs = tuple(self._compile_numeric_function(matrix, False) for matrix in matrices)
+        if c_optimized or c_backend:
+            compile_funcs = _compile_numeric_functions_cython if c_optimized else _compile_numeric_functions_c
+            if background:
+                _compile_numeric_functions_background(funcs, compile_funcs)
+            else:
+                compile_funcs(funcs)
+        return funcs
 
 
 
@@ -1666,10 +1878,56 @@ class System(_System, EventProducer):
 
 
     compile_numeric_func = compile_numeric_function
+    compile_numeric_funcs = compile_numeric_functions
     compile_numeric_func_c_optimized  = compile_numeric_function_c_optimized
 
 
 
+    def get_compiled_functions_cache_info(self):
+        '''get_compiled_functions_cache_info() -> CacheInfo
+        Get statistics of the cache of numeric functions compiled by ``compile_numeric_function``
+
+            :Example:
+
+            >>> compile_numeric_function(Phi)
+            >>> compile_numeric_function(Phi)
+            >>> get_compiled_functions_cache_info()
+            CacheInfo(hits=1, misses=1, max_size=256, size=1)
+
+        :return: A named tuple with the number of hits and misses, the maximum number of
+            entries and the current number of entries of the cache
+        :rtype: CacheInfo
+
+        .. seealso:: :func:`clear_compiled_functions_cache`
+
+        '''
+        return self._compiled_functions.get_info()
+
+
+
+    def set_compiled_functions_cache_max_size(self, size):
+        '''set_compiled_functions_cache_max_size(size: int)
+        Change the maximum number of numeric functions cached by ``compile_numeric_function``
+        (256 by default). When the limit is exceeded, the least recently used ones are removed.
+        If its zero, numeric functions are not cached.
+
+        '''
+        self._compiled_functions.set_max_size(size)
+
+
+
+    def clear_compiled_functions_cache(self):
+        '''clear_compiled_functions_cache()
+        Remove all the numeric functions cached by ``compile_numeric_function`` (and reset its statistics).
+        The next call to ``compile_numeric_function`` will compile the matrices again.
+
+        .. seealso:: :func:`get_compiled_functions_cache_info`
+
+        '''
+        self._compiled_functions.clear()
+
+
+
     def evaluate(self, x):
         '''evaluate(func: NumericFunction | Matrix) -> np.ndarray
         Evaluate the given numeric function, symbolic matrix or expression
@@ -1698,7 +1956,11 @@ class System(_System, EventProducer):
         if isinstance(x, SymbolNumeric):
             return x.get_value()
         if isinstance(x, Expr):
-            return next(iter(self.evaluate(Matrix([x])).flat)).item()
+            # Expressions are evaluated with a numeric function cached by their contents
+            # (it is compiled only the first time)
+            options = ('scalar', get_atomization_state())
+            func = self._compiled_functions.get((x,), options, lambda: self._compile_numeric_function(Matrix([x]), False))
+            return func._evaluate_scalar()
         if isinstance(x, Matrix):
             x = self.compile_numeric_func(x)
         return x.evaluate()
@@ -1732,12 +1994,227 @@ class System(_System, EventProducer):
         '''
         self._export_environment_MATLAB()
 
+    def export_simulation_C(self, directory, Phi, Phi_q, beta, M_qq, delta_q, gamma, dPhi_dq=None,
+        name='model', integration_method='rk4', geom_eq_tol=.05 * 10**-3, max_iterations=50):
+        '''export_simulation_C(directory: str, Phi, Phi_q, beta, M_qq, delta_q, gamma[, dPhi_dq[, name: str[, integration_method: str[, geom_eq_tol: float[, max_iterations: int]]]]]) -> List[str]
+
+        Export a simulation of this system as standalone C code (only the C standard library is required),
+        e.g to run it at a fixed rate outside python. The files ``<name>.h``, ``<name>.c``, ``main.c``
+        (a reference driver which prints the coordinates after each step) and ``Makefile`` are generated
+        in the given directory.
+
+            :Example:
+
+            >>> export_simulation_C('pendulum', Phi, Phi_q, beta, M_qq, delta_q, gamma, name='pendulum')
+            ['pendulum/pendulum.h', 'pendulum/pendulum.c', 'pendulum/main.c', 'pendulum/Makefile']
+
+        The exported code stores the symbol values (initialized with their current values), evaluates
+        the given matrices, computes the accelerations from the dynamic equations, integrates them
+        ('euler' or 'rk4' methods, as :class:`NumericIntegration`) and solves the assembly problem
+        (newton iterations at coordinate level and a projection at velocity level) after each step.
+
+        :param dPhi_dq: The jacobian of the velocity constraints (by default, ``Phi_q``)
+        :param name: The prefix of the exported C functions & variables
+        :return: The paths of the generated files
+        :rtype: List[str]
+
+        '''
+        return _export_simulation_C(self, directory, Phi, Phi_q, beta, M_qq, delta_q, gamma, dPhi_dq,
+            name, integration_method, geom_eq_tol, max_iterations)
+
+
     export_numeric_func_MATLAB = export_numeric_function_MATLAB
     export_numeric_init_func_MATLAB = export_numeric_init_function_MATLAB
 
 
 
 
+    ######## Serialization ########
+
+
+    def save(self, filename):
+        '''save(filename: str)
+        Save this system (symbols & their values, bases, matrices, vectors, tensors, points,
+        frames, solids and wrenches) to a file, so that it can be restored later with ``System.load``
+        without defining and deriving the model again.
+
+            :Example:
+
+            >>> get_default_system().save('four_bar.sys')
+            >>> sys = System.load('four_bar.sys')
+
+        Expressions are stored unatomized in the GiNaC default format (each one only once) and the
+        file is compressed.
+
+        .. seealso:: :func:`load`
+
+        '''
+        if not isinstance(filename, str):
+            raise TypeError('filename must be a string')
+
+        exprs, exprs_indices = [], {}
+        def dump(values):
+            # Returns the indices of the given expressions in the list of stored expressions
+            indices = []
+            for value in values:
+                text = _print_expr_dflt(Expr(value))
+                index = exprs_indices.get(text)
+                if index is None:
+                    index = exprs_indices[text] = len(exprs)
+                    exprs.append(text)
+                indices.append(index)
+            return indices
+
+        def dump_geom(x):
+            # Stores a vector or tensor (its name, base and components)
+            return [x.get_name(), x.get_base().get_name(), dump(x)]
+
+        data = {
+            'format': 'lib3d_mec_ginac.System', 'version': 1,
+            'time': self.get_time().get_value(),
+            'symbols': self._dump_symbols(),
+            'bases': [
+                [base.get_name(), base.get_previous_base().get_name(), dump(base.get_rotation_tupla()), dump([base.get_rotation_angle()])[0]]
+                for base in self._get_bases() if base.has_previous_base()
+            ],
+            'matrices': [
+                [matrix.get_name(), list(matrix.get_shape()), dump(matrix)]
+                for matrix in self._get_matrices() if not isinstance(matrix, (Vector3D, Tensor3D))
+            ],
+            'vectors': list(map(dump_geom, self._get_vectors())),
+            'tensors': list(map(dump_geom, self._get_tensors())),
+            'points': [
+                [point.get_name(), point.get_previous().get_name(), dump_geom(point.get_position_vector())]
+                for point in self._get_points() if point.has_previous()
+            ],
+            'frames': [
+                [frame.get_name(), frame.get_point().get_name(), frame.get_base().get_name()]
+                for frame in self._get_frames() if not self._has_solid(frame.get_name())
+            ],
+            'solids': [
+                [solid.get_name(), solid.get_point().get_name(), solid.get_base().get_name(), solid.get_mass().get_name(),
+                dump_geom(solid.get_CM()), dump_geom(solid.get_IT())]
+                for solid in self._get_solids()
+            ],
+            'wrenches': [
+                [wrench.get_name(), dump_geom(wrench.get_force()), dump_geom(wrench.get_moment()),
+                wrench.get_point().get_name(), wrench.get_solid().get_name(), wrench.get_type()]
+                for wrench in self._get_wrenches()
+            ],
+            'exprs': exprs
+        }
+
+        with gzip.open(filename, 'wt', encoding='utf-8') as file:
+            json.dump(data, file, separators=(',', ':'))
+
+
+
+    @classmethod
+    def load(cls, filename):
+        '''load(filename: str) -> System
+        Create a new system with the contents of the file in the given path (previously created
+        with ``save``)
+
+        :raises ValueError: If the file is not valid
+
+        .. seealso:: :func:`save`
+
+        '''
+        if not isinstance(filename, str):
+            raise TypeError('filename must be a string')
+        with gzip.open(filename, 'rt', encoding='utf-8') as file:
+            data = json.load(file)
+        if not isinstance(data, dict) or data.get('format') != 'lib3d_mec_ginac.System' or data.get('version') != 1:
+            raise ValueError(f'"{filename}" is not a valid system file')
+
+        system = cls()
+        with warnings.catch_warnings():
+            # Predefined symbols & objects are updated silently
+            warnings.simplefilter('ignore', UserWarning)
+
+            # Symbols are created first (in the same order, so that their numeric values are
+            # stored at the same positions)
+            system._load_symbols(data['symbols'])
+            system.get_time().set_value(data['time'])
+
+            exprs = system._parse_exprs(data['exprs'])
+            load = lambda indices: [exprs[index] for index in indices]
+
+            # Vectors & tensors which are not registered in the system (e.g. position vectors of points)
+            # are kept alive by the system
+            system._unnamed_objects = []
+            def load_geom(item, cls):
+                name, base, values = item
+                if name and (system.has_vector(name) if cls is Vector3D else system.has_tensor(name)):
+                    return system.get_vector(name) if cls is Vector3D else system.get_tensor(name)
+                x = cls(load(values), base=base, system=system)
+                system._unnamed_objects.append(x)
+                return x
+
+            for name, previous, rotation_tupla, rotation_angle in data['bases']:
+                if not system.has_base(name):
+                    system.new_base(name, previous=previous, rotation_tupla=load(rotation_tupla), rotation_angle=exprs[rotation_angle])
+
+            for name, shape, values in data['matrices']:
+                system.new_matrix(name, load(values), shape=shape)
+
+            for name, base, values in data['vectors']:
+                system.new_vector(name, load(values), base=base)
+
+            for name, base, values in data['tensors']:
+                system.new_tensor(name, load(values), base=base)
+
+            for name, previous, position in data['points']:
+                if not system.has_point(name):
+                    system.new_point(name, previous, load_geom(position, Vector3D))
+
+            for name, point, base in data['frames']:
+                if not system.has_frame(name):
+                    system.new_frame(name, point, base)
+
+            for name, point, base, mass, CM, IT in data['solids']:
+                if not system.has_solid(name):
+                    system.new_solid(name, point, base, mass, load_geom(CM, Vector3D), load_geom(IT, Tensor3D))
+
+            for name, force, moment, point, solid, type in data['wrenches']:
+                if not system.has_wrench(name):
+                    system.new_wrench(name, load_geom(force, Vector3D), load_geom(moment, Vector3D), point, solid, type)
+
+        return system
+
+
+
+
+    def _dump_symbols(self):
+        # Returns the names, latex names and values of the symbols of this system (by kind). Coordinates
+        # are stored together with their velocities and accelerations
+        symbols = {}
+        for kind in ('coordinate', 'aux_coordinate'):
+            components = [self._get_symbols(kind), self._get_symbols(kind.replace('coordinate', 'velocity')),
+                self._get_symbols(kind.replace('coordinate', 'acceleration'))]
+            symbols[kind] = [
+                [symbol.get_name() for symbol in items] + [symbol.get_tex_name() for symbol in items] + [symbol.get_value() for symbol in items]
+                for items in zip(*components)
+            ]
+        for kind in ('parameter', 'input', 'joint_unknown'):
+            symbols[kind] = [[symbol.get_name(), symbol.get_tex_name(), symbol.get_value()] for symbol in self._get_symbols(kind)]
+        return symbols
+
+
+    def _load_symbols(self, symbols):
+        # Creates the symbols returned by _dump_symbols (in the same order)
+        for kind, items in symbols.items():
+            for item in items:
+                if kind.endswith('coordinate'):
+                    self.new_symbol(kind, **dict(zip(
+                        ('name', 'vel_name', 'acc_name', 'tex_name', 'vel_tex_name', 'acc_tex_name', 'value', 'vel_value', 'acc_value'),
+                        item)))
+                else:
+                    self.new_symbol(kind, name=item[0], tex_name=item[1], value=item[2])
+
+
+
+
     ######## Restoring/Saving state ########
 
 
@@ -1977,22 +2454,136 @@ class System(_System, EventProducer):
 
 
 
-class HashObjectWrapper:
-    '''
-    This is a class that can be used to wrap an unhasable object in order to be passed to
-    a function which is decorated with lru_cache. The id of the object is used as
-    the hash.
-    '''
-    def __init__(self, obj):
-        self.wrapped = obj
+######## Parallel differentiation ########
+
+# System replica of the worker processes which compute derivatives in parallel (and the
+# symbols used to differentiate)
+_diff_worker_state = None
+
+
+
+def _init_diff_worker(symbols, names):
+    # Creates a system with the same symbols as the parent process (expressions are received as text
+    # and parsed with them)
+    global _diff_worker_state
+    system = System()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        system._load_symbols(symbols)
+    _diff_worker_state = system, [system.get_symbol(name) for name in names]
+
+
+
+def _diff_worker(text):
+    # Returns the derivatives of the given expression (printed with the GiNaC default format) with
+    # respect each symbol (also as text)
+    system, symbols = _diff_worker_state
+    expr = system._parse_exprs([text])[0]
+    return [_print_expr_dflt(system._diff(expr, symbol)) for symbol in symbols]
+
+
+
+def _parse_num_workers(num_workers):
+    # Validates the number of worker processes used to compute derivatives (1 if it is None)
+    if num_workers is None:
+        return 1
+    if not isinstance(num_workers, int) or num_workers <= 0:
+        raise TypeError('num_workers must be an integer greater than zero')
+    return num_workers
+
+
+
+
+######## class CompiledFunctionsCache ########
+
+# Statistics of a CompiledFunctionsCache
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'max_size', 'size'])
+
+
+
+class _CompiledFunctionKey:
+    # Key of a numeric function stored in a CompiledFunctionsCache: the matrices (or expressions)
+    # it was compiled from and the compilation options. Keys are compared by the contents of the matrices
+    __slots__ = ('values', 'options', '_hash')
+
+    def __init__(self, values, options):
+        self.values, self.options = values, options
+        self._hash = hash((options, tuple(map(methodcaller('_get_hash'), values))))
 
     def __eq__(self, other):
-        if not isinstance(other, HashObjectWrapper):
+        if not isinstance(other, _CompiledFunctionKey) or self._hash != other._hash or self.options != other.options:
+            return False
+        if len(self.values) != len(other.values):
             return False
-        return self.wrapped == other.wrapped
+        return all(map(_same_contents, self.values, other.values))
 
     def __hash__(self):
-        return hash((HashObjectWrapper, id(self.wrapped)))
+        return self._hash
+
+
+
+def _same_contents(a, b):
+    # Compares two matrices or expressions by their contents
+    if isinstance(a, Matrix) or isinstance(b, Matrix):
+        return isinstance(a, Matrix) and isinstance(b, Matrix) and a.shape == b.shape and a == b
+    return a == b
+
+
+
+class CompiledFunctionsCache:
+    '''
+    An instance of this class stores the numeric functions compiled by a system (by ``compile_numeric_function``
+    and ``evaluate``). They are indexed by the contents of the matrices or expressions (the structural hashes
+    computed by GiNaC) instead of the identity of the python objects, so a matrix built again with the same
+    expressions (e.g. a notebook cell is executed again) reuses the numeric function compiled before.
+    Snapshots of the matrices are stored, so modifying them later does not alter the cache.
+    When the number of entries exceeds the maximum size, the least recently used ones are removed.
+    '''
+    def __init__(self, max_size=256):
+        self._entries = OrderedDict()
+        self._max_size = max_size
+        self._hits, self._misses = 0, 0
+
+
+    def get(self, values, options, compile):
+        # Returns the numeric function compiled from the given matrices or expressions with the given
+        # options (a hashable object). On a cache miss, compile is invoked to create it
+        key = _CompiledFunctionKey(tuple(values), options)
+        func = self._entries.get(key)
+        if func is not None:
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return func
+
+        self._misses += 1
+        func = compile()
+        if self._max_size > 0:
+            key.values = tuple(Matrix(value) if isinstance(value, Matrix) else Expr(value) for value in key.values)
+            self._entries[key] = func
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return func
+
+
+    def get_info(self):
+        return CacheInfo(self._hits, self._misses, self._max_size, len(self._entries))
+
+
+    def get_max_size(self):
+        return self._max_size
+
+
+    def set_max_size(self, size):
+        if not isinstance(size, int) or size < 0:
+            raise TypeError('Cache size must be an integer greater or equal than zero')
+        self._max_size = size
+        while len(self._entries) > size:
+            self._entries.popitem(last=False)
+
+
+    def clear(self):
+        self._entries.clear()
+        self._hits, self._misses = 0, 0
 
 
 
@@ -2003,7 +2594,10 @@ class HashObjectWrapper:
 
 class SymbolsValuesMapping(MutableMapping):
     '''
-    An instance of this class is used to represent and store pairs of symbols names and their associated numeric values
+    An instance of this class is used to represent and store pairs of symbols names and their associated numeric values.
+    Values are looked up by name in constant time and they are stored contiguously in a buffer which grows
+    geometrically (the arrays returned by ``as_array`` keep pointing to the values of the symbols
+    unless the buffer is reallocated; compiled numeric functions are notified when that happens)
 
         :Example:
 
@@ -2035,7 +2629,17 @@ class SymbolsValuesMapping(MutableMapping):
 
     def __init__(self):
         self._names  = []
-        self._values = np.array(np.zeros(shape=(0,1), dtype=np.float64), copy=False, order='C', subok=True)
+        # Index of each symbol in the array of values
+        self._indices = {}
+        # The values are stored at the beginning of a larger buffer whose capacity is doubled when its
+        # exhausted (arrays returned by as_array() remain valid while the buffer is not reallocated)
+        self._buffer = np.zeros(shape=(self._initial_capacity, 1), dtype=np.float64)
+        self._values = self._buffer[:0]
+        # Objects notified when the buffer is reallocated
+        self._listeners = WeakKeyDictionary()
+
+
+    _initial_capacity = 8
 
 
     ######## Getters ########
@@ -2045,7 +2649,26 @@ class SymbolsValuesMapping(MutableMapping):
         return self._values
 
     def index(self, name):
-        return self._names.index(name)
+        try:
+            return self._indices[name]
+        except KeyError:
+            raise ValueError(f'"{name}" is not in the mapping')
+
+
+
+    ######## Listeners ########
+
+
+    def _add_listener(self, callback):
+        # Register a bound method which will be invoked each time the array of values is reallocated,
+        # so that its owner can rebind to the new array (as_array() must be called again).
+        # Only a weak reference to its owner is stored
+        self._listeners[callback.__self__] = callback.__func__
+
+
+    def _notify_listeners(self):
+        for listener, callback in list(self._listeners.items()):
+            callback(listener)
 
 
 
@@ -2054,26 +2677,41 @@ class SymbolsValuesMapping(MutableMapping):
 
 
     def __getitem__(self, name):
-        try:
-            return self._values[self._names.index(name)].item()
-        except ValueError:
-            raise KeyError
+        return self._values.item(self._indices[name])
 
     def __setitem__(self, name, value):
-        if name in self._names:
-            self._values[self._names.index(name)] = value
-        else:
-            index = len(self._names)
-            self._names.append(name)
-            self._values = np.insert(self._values, index, value, axis=0)
+        index = self._indices.get(name)
+        if index is not None:
+            self._values[index] = value
+            return
+
+        index = len(self._names)
+        reallocated = index == self._buffer.shape[0]
+        if reallocated:
+            # The buffer is full. Its capacity is doubled
+            buffer = np.zeros(shape=(2 * self._buffer.shape[0], 1), dtype=np.float64)
+            buffer[:index] = self._values
+            self._buffer = buffer
+
+        self._names.append(name)
+        self._indices[name] = index
+        self._buffer[index] = value
+        self._values = self._buffer[:index+1]
+        if reallocated:
+            self._notify_listeners()
 
 
     def __delitem__(self, name):
-        if name not in self._names:
+        if name not in self._indices:
             raise KeyError
-        index = self._names.index(name)
-        self._names.remove(name)
-        self._values = np.delete(self._values, index, axis=0)
+        index = self._indices.pop(name)
+        del self._names[index]
+        for k in range(index, len(self._names)):
+            self._indices[self._names[k]] = k
+        # Values of the next symbols are moved in place
+        self._buffer[index:len(self._names)] = self._buffer[index+1:len(self._names)+1]
+        self._values = self._buffer[:len(self._names)]
+        self._notify_listeners()
 
     def __iter__(self):
         return iter(self._names)
@@ -2081,6 +2719,9 @@ class SymbolsValuesMapping(MutableMapping):
     def __len__(self):
         return len(self._names)
 
+    def __contains__(self, name):
+        return name in self._indices
+
     def __repr__(self):
         data = list(zip(self._names, self._values.flat))
         return tabulate(data, tablefmt='plain')
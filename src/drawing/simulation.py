@@ -15,9 +15,7 @@ from functools import partial
 from ..utils.events import EventProducer
 from .timer import Timer
 from ..config import runtime_config
-from ..core.integration import NumericIntegration
-from ..core.assembly import AssemblyProblemSolver
-from lib3d_mec_ginac_ext import Matrix, NumericFunction
+from ..core.simulator import Simulator
 
 
 
@@ -43,9 +41,7 @@ class Simulation(EventProducer):
         self._elapsed_time, self._last_update_time = 0.0, None
         self._looped, self._time_limit = False, None
         self._diff_times = deque(maxlen=10)
-        self._assembly_problem_init = lambda *args, **kwargs: None
-        self._assembly_problem_step = lambda *args, **kwargs: None
-        self.set_integration_method('euler')
+        self._simulator = Simulator(system)
 
         self._timer = Timer()
         self.add_event_handler(self._on_timer_tick, 'tick')
@@ -69,9 +65,10 @@ class Simulation(EventProducer):
         self._timer.set_time_interval(self._delta_t)
         self._timer.start(resumed=True)
 
-        self._system.save_state()
-        self._assembly_problem_init()
+        # Time is reset first, so that the initial state is recorded at t = 0
         self._system.get_time().value = 0
+        self._system.save_state()
+        self._simulator.init()
 
         self.fire_event('simulation_started')
 
@@ -110,6 +107,26 @@ class Simulation(EventProducer):
 
 
 
+    def run(self, t_end, delta_t=None, record=('q', 'dq', 'ddq'), init=True):
+        '''run(t_end: float[, delta_t: float[, record: Iterable | Mapping[, init: bool]]]) -> Dict[str, np.ndarray]
+        Run the simulation from the current time until ``t_end`` as fast as possible
+        (no events are fired and the scene is not updated).
+        If delta_t is not specified, the simulation delta time is used.
+
+        .. seealso:: :func:`Simulator.run`
+
+        '''
+        if not self.is_stopped():
+            raise RuntimeError('Simulation is already running')
+        if delta_t is None:
+            delta_t = self._delta_t
+            if delta_t is None:
+                raise ValueError('delta_t must be specified if the simulation delta time is not set')
+        return self._simulator.run(t_end, delta_t, record, init)
+
+
+
+
     ######## Getters ########
 
     def is_running(self):
@@ -158,7 +175,7 @@ class Simulation(EventProducer):
         Get the current integration method to adjust system's symbol values while
         the simulation is running
         '''
-        return self._integration_method
+        return self._simulator.get_integration_method()
 
 
     def get_integration_method_name(self):
@@ -166,10 +183,15 @@ class Simulation(EventProducer):
         Get the current integration method`s name to adjust system's symbol values
         while the simulation is running
         '''
-        method = self.get_integration_method()
-        if isinstance(method, partial):
-            return method.func.__name__
-        return method.__name__
+        return self._simulator.get_integration_method_name()
+
+
+    def get_simulator(self):
+        '''get_simulator() -> Simulator
+        Get the simulator which performs the temporal integration of the system
+        (it can be used to run the simulation without the graphical environment)
+        '''
+        return self._simulator
 
 
 
@@ -230,26 +252,32 @@ class Simulation(EventProducer):
 
 
 
-    def set_integration_method(self, method):
+    def set_integration_method(self, method, **kwargs):
         '''set_integrator(method: IntegrationMethod)
         Change integration method to adjust system's symbol values while the
         simulation is running
         :param method: Must be a callable for a custom integration method or
-            the name of a predefined integrator like 'euler', 'rk4'
+            the name of a predefined integrator like 'euler', 'rk4', 'rk45', 'rk23'
+        :param kwargs: Additional keyword arguments for the predefined integrators
+            (e.g: ``rtol`` and ``atol`` for the adaptive methods 'rk45' and 'rk23')
         '''
-        if not isinstance(method, str) and not callable(method):
-            raise TypeError('Integration method must be a callable or a string')
+        self._simulator.set_integration_method(method, **kwargs)
+        self.fire_event('integration_method_changed')
 
-        if isinstance(method, str):
-            method = NumericIntegration.get_method(method)
 
-        system = self._system
-        q_values   = system.get_coords_values()
-        dq_values  = system.get_velocities_values()
-        ddq_values = system.get_accelerations_values()
 
-        self._integration_method = partial(method, q_values, dq_values, ddq_values)
-        self.fire_event('integration_method_changed')
+    def set_accelerations(self, accelerations):
+        '''set_accelerations(accelerations: Matrix | NumericFunction | Callable | None)
+        Set how the accelerations are computed from the coordinates and velocities
+        while the simulation is running. The predefined integration methods evaluate them
+        at each of their stages.
+
+        :param accelerations: It can be a column matrix (or a numeric function) with the
+            expressions of the accelerations, a callable with no arguments which updates the
+            accelerations numeric values in place, or None (accelerations remain constant
+            during the integration)
+        '''
+        self._simulator.set_accelerations(accelerations)
 
 
 
@@ -261,15 +289,44 @@ class Simulation(EventProducer):
         Phi, Phi_q, beta, Phi_init, Phi_init_q, beta_init, dPhi_dq, dPhi_init_dq
 
         and then you can specify additional parameters (this is optional):
-        geom_eq_tol, geom_eq_relax, geom_eq_init_tol, geom_eq_init_relax
+        geom_eq_tol, geom_eq_relax, geom_eq_init_tol, geom_eq_init_relax,
+        method ('pinv' or 'newton'), max_iterations, reuse_jacobian
         '''
-        solver = AssemblyProblemSolver(self._system, *args, **kwargs)
-        system = self._system
-        q_values   = system.get_coords_values()
-        dq_values  = system.get_velocities_values()
-        ddq_values = system.get_accelerations_values()
-        self._assembly_problem_init = partial(solver.init, q_values, dq_values, ddq_values)
-        self._assembly_problem_step = partial(solver.step, q_values, dq_values, ddq_values)
+        self._simulator.assembly_problem(*args, **kwargs)
+
+
+
+    def dynamic_problem(self, *args, **kwargs):
+        '''dynamic_problem(...)
+        Setup the dynamic equations, so that the accelerations are computed from them
+        on each integration step
+
+        You must pass first the next matrices as positional arguments:
+        M_qq, delta_q and optionally Phi_q, gamma
+
+        and then you can specify additional parameters (this is optional):
+        method ('lu' or 'cholesky'), c_optimized, regularization
+        '''
+        self._simulator.dynamic_problem(*args, **kwargs)
+
+
+
+    def attach_recorder(self, recorder):
+        '''attach_recorder(recorder: TrajectoryRecorder)
+        Attach a recorder to this simulation. It will store the state of the system
+        after the initialization and each simulation step.
+
+        .. seealso:: :class:`TrajectoryRecorder`
+
+        '''
+        self._simulator.attach_recorder(recorder)
+
+
+    def detach_recorder(self, recorder):
+        '''detach_recorder(recorder: TrajectoryRecorder)
+        Detach a recorder previously attached to this simulation
+        '''
+        self._simulator.detach_recorder(recorder)
 
 
 
@@ -296,27 +353,25 @@ class Simulation(EventProducer):
         # Update elapsed time
         self._elapsed_time += delta_t
 
-        # Update time
+        # Perform the simulation step (and update time)
         t = self._system.get_time()
-        t.value += delta_t
-
-        if self._delta_t is not None:
+        if self._delta_t is None:
+            self._simulator.step(delta_t)
+        else:
             # Use the user delta_t to perform the numerical integration and solve
-            # the assembly problem
-            delta_t = self._delta_t
-
-        self._integration_method(delta_t)
-        self._assembly_problem_step(delta_t)
+            # the assembly problem (time is increased by the real delta time)
+            self._simulator.step(self._delta_t, update_time=False)
+            t.value += delta_t
         self.fire_event('simulation_step')
 
         t_limit = self._time_limit
         if t_limit is not None and t.value >= t_limit:
             if self._looped:
                 delta_t = t.value - t_limit
-                t.value -= t_limit
+                t.value = 0
                 self._system.restore_previous_state()
-                self._assembly_problem_init()
-                self._integration_method(delta_t)
+                self._simulator.init()
+                self._simulator.step(delta_t)
                 self.fire_event('simulation_step')
             else:
                 self.stop()
@@ -0,0 +1,109 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This is a unitary test for the class AssemblyProblemSolver
+'''
+
+
+######## Imports ########
+
+from lib3d_mec_ginac import *
+import pytest
+import numpy as np
+
+
+######## Fixtures ########
+
+@pytest.fixture
+def four_bar():
+    '''
+    This fixture creates a four bar linkage (a closed loop system) with the angles of its bars
+    as coordinates. The constraints used for the initialization fix also the angle of the crank
+    and its angular velocity.
+    It returns the system and the arguments to instantiate the assembly problem solver
+    '''
+    sys = System()
+    l1, l2, l3, d = sys.new_parameter('l1', 1), sys.new_parameter('l2', 2), sys.new_parameter('l3', 2), sys.new_parameter('d', 1.5)
+    theta1, dtheta1, ddtheta1 = sys.new_coordinate('theta1', 1)
+    theta2, dtheta2, ddtheta2 = sys.new_coordinate('theta2', 0.5)
+    theta3, dtheta3, ddtheta3 = sys.new_coordinate('theta3', 1.7)
+    q = Matrix([theta1, theta2, theta3])
+
+    Phi = Matrix([
+        l1 * cos(theta1) + l2 * cos(theta2) - l3 * cos(theta3) - d,
+        l1 * sin(theta1) + l2 * sin(theta2) - l3 * sin(theta3)], shape=[2, 1])
+    Phi_q = sys.jacobian(Phi, q)
+    beta = Matrix([0, 0], shape=[2, 1])
+    Phi_init = Matrix([Phi[0, 0], Phi[1, 0], theta1 - 1.2], shape=[3, 1])
+    Phi_init_q = sys.jacobian(Phi_init, q)
+    beta_init = Matrix([0, 0, 1], shape=[3, 1])
+
+    return sys, (Phi, Phi_q, beta, Phi_init, Phi_init_q, beta_init, Phi_q, Phi_init_q)
+
+
+
+######## Tests ########
+
+def _init_assembly_problem(sys, args, **kwargs):
+    q_values, dq_values = sys.get_coords_values(), sys.get_velocities_values()
+    solver = AssemblyProblemSolver(sys, *args, **kwargs)
+    solver.init(q_values, dq_values, sys.get_accelerations_values())
+    return solver
+
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize('reuse_jacobian', [False, True])
+def test_assembly_problem_newton(four_bar, reuse_jacobian):
+    '''
+    This test checks that the assembly problem of a closed loop system is solved with the newton method
+    '''
+    sys, args = four_bar
+    Phi, Phi_q = args[0], args[1]
+    q_values, dq_values = sys.get_coords_values(), sys.get_velocities_values()
+
+    solver = _init_assembly_problem(sys, args, method='newton', reuse_jacobian=reuse_jacobian)
+    assert np.linalg.norm(sys.evaluate(Phi)) < 1e-10
+    assert q_values[0, 0] == pytest.approx(1.2) and dq_values[0, 0] == pytest.approx(1)
+    assert np.linalg.norm(sys.evaluate(Phi_q) @ dq_values) < 1e-10
+
+    # Assembly problem step (more coordinates than constraints)
+    q_values += np.array([[0.01], [-0.02], [0.03]])
+    solver.step(q_values, dq_values, sys.get_accelerations_values(), 0.1)
+    assert np.linalg.norm(sys.evaluate(Phi)) <= solver.geom_eq_tol
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_assembly_problem_methods_agree(four_bar):
+    '''
+    This test checks that the newton and pinv methods find the same solution of the assembly problem
+    '''
+    sys, args = four_bar
+    q_values, dq_values = sys.get_coords_values(), sys.get_velocities_values()
+    q_start = q_values.copy()
+
+    _init_assembly_problem(sys, args, method='pinv')
+    q_pinv, dq_pinv = q_values.copy(), dq_values.copy()
+
+    q_values[:], dq_values[:] = q_start, 0
+    _init_assembly_problem(sys, args, method='newton')
+    assert list(map(pytest.approx, q_values.flat)) == list(q_pinv.flat)
+    assert list(map(pytest.approx, dq_values.flat)) == list(dq_pinv.flat)
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_assembly_problem_max_iterations(four_bar):
+    '''
+    This test checks that an exception is raised if the assembly problem does not converge
+    after the maximum number of iterations
+    '''
+    sys, args = four_bar
+    with pytest.raises(RuntimeError):
+        _init_assembly_problem(sys, args, method='newton', max_iterations=1)
+    with pytest.raises(RuntimeError):
+        _init_assembly_problem(sys, args, method='pinv', max_iterations=1)
+
+    # Invalid methods
+    with pytest.raises(ValueError):
+        AssemblyProblemSolver(sys, *args, method='foo')
@@ -0,0 +1,72 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This is a unitary test for the class DynamicProblemSolver
+'''
+
+
+######## Imports ########
+
+from lib3d_mec_ginac import *
+import pytest
+import numpy as np
+
+
+######## Fixtures ########
+
+
+
+######## Tests ########
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize('method', ['lu', 'cholesky'])
+def test_dynamic_problem_solver(method):
+    '''
+    This test checks that the accelerations are computed from the dynamic equations
+    '''
+    sys = System()
+    m, f = sys.new_parameter('m', 2), sys.new_parameter('f', 4)
+    x, dx, ddx = sys.new_coordinate('x', 0)
+    y, dy, ddy = sys.new_coordinate('y', 0)
+    M_qq = Matrix([m, 0, 0, m], shape=[2, 2])
+    delta_q = Matrix([f, 0], shape=[2, 1])
+
+    # Without constraints
+    ddq_values = np.zeros((2, 1))
+    DynamicProblemSolver(sys, M_qq, delta_q, method=method).solve(ddq_values)
+    assert list(map(pytest.approx, ddq_values.flat)) == [ 2, 0 ]
+
+    # Constraint x = y
+    Phi_q, gamma = Matrix([1, -1], shape=[1, 2]), Matrix([0], shape=[1, 1])
+    solver = DynamicProblemSolver(sys, M_qq, delta_q, Phi_q, gamma, method=method)
+    solver.solve(ddq_values)
+    assert list(map(pytest.approx, ddq_values.flat)) == [ 1, 1 ]
+    assert list(map(pytest.approx, solver.get_lagrange_multipliers().flat)) == [ 2 ]
+
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize('method', ['lu', 'cholesky'])
+def test_dynamic_problem_solver_redundant_constraints(method):
+    '''
+    This test checks that the dynamic problem can be solved with redundant constraints, and that
+    an exception is raised if the dynamic equations are singular
+    '''
+    sys = System()
+    m, f = sys.new_parameter('m', 2), sys.new_parameter('f', 4)
+    x, dx, ddx = sys.new_coordinate('x', 0)
+    y, dy, ddy = sys.new_coordinate('y', 0)
+    M_qq = Matrix([m, 0, 0, m], shape=[2, 2])
+    delta_q = Matrix([f, 0], shape=[2, 1])
+
+    # Constraints x = y and 2x = 2y
+    Phi_q, gamma = Matrix([1, -1, 2, -2], shape=[2, 2]), Matrix([0, 0], shape=[2, 1])
+    ddq_values = np.zeros((2, 1))
+    solver = DynamicProblemSolver(sys, M_qq, delta_q, Phi_q, gamma, method=method)
+    solver.solve(ddq_values)
+    assert list(map(pytest.approx, ddq_values.flat)) == [ 1, 1 ]
+    assert list(map(pytest.approx, (np.array([[1, -1], [2, -2]]).T @ solver.get_lagrange_multipliers()).flat)) == [ 2, -2 ]
+
+    # Singular mass matrix
+    m.value = 0
+    with pytest.raises(np.linalg.LinAlgError):
+        DynamicProblemSolver(sys, M_qq, delta_q, Phi_q, gamma, method=method).solve(ddq_values)
@@ -0,0 +1,94 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This is a unitary test for the class NumericIntegration
+'''
+
+
+######## Imports ########
+
+from lib3d_mec_ginac import *
+import pytest
+import numpy as np
+from math import cos, sin
+
+
+######## Fixtures ########
+
+
+
+######## Tests ########
+
+@pytest.mark.parametrize('method, tol', [('rk4', 1e-4), ('rk45', 1e-6), ('rk23', 1e-2)])
+def test_integration_methods(method, tol):
+    '''
+    This test checks the integration methods with a harmonic oscillator (ddq = -q)
+    '''
+    q_values, dq_values = np.array([[1.0]]), np.array([[0.0]])
+    ddq_values = np.zeros((1, 1))
+
+    def accelerations():
+        ddq_values[:] = -q_values
+
+    method, workspace = NumericIntegration.get_method(method), {}
+    for i in range(0, 100):
+        method(q_values, dq_values, ddq_values, 0.1, accelerations=accelerations, workspace=workspace)
+
+    assert q_values.item() == pytest.approx(cos(10), abs=tol)
+    assert dq_values.item() == pytest.approx(-sin(10), abs=tol)
+
+
+
+def test_integration_methods_constant_accelerations():
+    '''
+    This test checks that all integration methods are exact when accelerations are constant
+    '''
+    for method in NumericIntegration.get_methods():
+        q_values, dq_values, ddq_values = np.array([[1.0]]), np.array([[2.0]]), np.array([[3.0]])
+        method(q_values, dq_values, ddq_values, 0.5)
+        assert q_values.item() == pytest.approx(1 + 2 * 0.5 + 3 * 0.5 ** 2 / 2)
+        assert dq_values.item() == pytest.approx(2 + 3 * 0.5)
+
+
+
+@pytest.mark.parametrize('method, tol', [('euler', 1e-1), ('rk4', 1e-6), ('rk45', 1e-6), ('rk23', 1e-3)])
+def test_integration_methods_time(method, tol):
+    '''
+    This test checks that the integration methods update the time at each stage with time
+    dependent accelerations (ddq = cos(t)) and that the accelerations are consistent with the
+    state after each step
+    '''
+    class Time:
+        value = 0.0
+    time = Time()
+    q_values, dq_values, ddq_values = np.array([[0.0]]), np.array([[0.0]]), np.zeros((1, 1))
+
+    def accelerations():
+        ddq_values[:] = cos(time.value)
+
+    method, workspace = NumericIntegration.get_method(method), {}
+    for i in range(0, 20):
+        method(q_values, dq_values, ddq_values, 0.1, accelerations=accelerations, workspace=workspace, time=time)
+
+    assert time.value == pytest.approx(2)
+    assert q_values.item() == pytest.approx(1 - cos(2), abs=tol)
+    assert dq_values.item() == pytest.approx(sin(2), abs=tol)
+    assert ddq_values.item() == pytest.approx(cos(2))
+
+
+
+@pytest.mark.parametrize('method', ['rk45', 'rk23'])
+def test_integration_methods_step_size(method):
+    '''
+    This test checks that the adaptive methods do not take tiny substeps to finish exactly at the end
+    of each step (and that the step size stored for the next call is not reduced because of that)
+    '''
+    q_values, dq_values = np.array([[1.0]]), np.array([[0.0]])
+    ddq_values = np.zeros((1, 1))
+
+    def accelerations():
+        ddq_values[:] = -q_values
+
+    method, workspace = NumericIntegration.get_method(method), {}
+    for i in range(0, 27):
+        method(q_values, dq_values, ddq_values, 0.37, accelerations=accelerations, workspace=workspace)
+        assert workspace['h'] > 0.05
@@ -10,6 +10,8 @@ from lib3d_mec_ginac import *
 import pytest
 import numpy as np
 from functools import partial
+from sys import executable
+import subprocess
 
 
 ######## Fixtures ########
@@ -53,3 +55,340 @@ def test_numeric_func_atomization_disabled():
     assert isinstance(output, np.ndarray) and output.dtype == np.float64
     assert output.shape == m.shape
     assert list(map(pytest.approx, output.flat)) == [ 2, 5, -0.25, 6 ]
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_numeric_func_evaluate_batch():
+    '''
+    This test checks that the numeric function can be evaluated at many states at once
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_input('b', 3)
+    x, dx, ddx = sys.new_coordinate('x', 1)
+    m = Matrix([a, a ** 2 + 1, (a - b) / 4, a * b * x], shape=[2, 2])
+    func = sys.compile_numeric_function(m)
+
+    q = np.array([[1, 2, 3]], dtype=np.float64)
+    output = func.evaluate_batch(q=q)
+    assert isinstance(output, np.ndarray) and output.dtype == np.float64
+    assert output.shape == (3,) + m.shape
+    assert list(map(pytest.approx, output[:, 1, 1])) == [ 6, 12, 18 ]
+    assert list(map(pytest.approx, output[0].flat)) == list(func.evaluate().flat)
+
+    # The number of rows must match the number of symbols
+    with pytest.raises(ValueError):
+        func.evaluate_batch(q=np.zeros((2, 3)))
+
+    # All arrays must have the same number of states
+    with pytest.raises(ValueError):
+        func.evaluate_batch(q=np.zeros((1, 3)), input=np.zeros((1, 2)))
+
+    # Invalid keyword arguments raise TypeError
+    with pytest.raises(TypeError):
+        func.evaluate_batch(foo=np.zeros((1, 3)))
+
+
+
+def test_numeric_func_evaluate_into():
+    '''
+    This test checks that the numeric function can be evaluated storing the results in
+    an array provided by the user
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_input('b', 3)
+    m = Matrix([a, a ** 2 + 1, (a - b) / 4, a * b], shape=[2, 2])
+    func = sys.compile_numeric_function(m)
+
+    buffer = np.zeros(10)
+    assert func.evaluate_into(buffer[2:6]) is not None
+    assert list(map(pytest.approx, buffer)) == [ 0, 0, 2, 5, -0.25, 6, 0, 0, 0, 0 ]
+    out = np.zeros((2, 2))
+    func.evaluate_into(out)
+    assert list(map(pytest.approx, out.flat)) == [ 2, 5, -0.25, 6 ]
+
+    with pytest.raises(TypeError):
+        func.evaluate_into(np.zeros(4, dtype=np.int64))
+    with pytest.raises(ValueError):
+        func.evaluate_into(np.zeros(3))
+    with pytest.raises(ValueError):
+        func.evaluate_into(buffer[::2][:4])
+
+
+
+def test_numeric_func_new_symbols():
+    '''
+    This test checks that numeric functions keep reading the values of the symbols
+    when new symbols are added to the system after compiling them
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_input('b', 3)
+    m = Matrix([a, a * b], shape=[2, 1])
+    func = sys.compile_numeric_function(m)
+    for k in range(40):
+        sys.new_parameter(f'p{k}', k)
+    a.value = 5
+    assert list(map(pytest.approx, func.evaluate().flat)) == [ 5, 15 ]
+    assert sys.get_value('p39') == 39
+
+
+
+def test_numeric_func_fused():
+    '''
+    This test checks numeric functions with several outputs sharing the same atoms
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_input('b', 3)
+    x, dx, ddx = sys.new_coordinate('x', 1)
+    m1 = Matrix([a, a ** 2 + 1, (a - b) / 4, a * b * x], shape=[2, 2])
+    m2 = Matrix([a * b * x, x], shape=[2, 1])
+    func = sys.compile_numeric_function([m1, m2])
+    assert func.is_fused() and not sys.compile_numeric_function(m1).is_fused()
+
+    outputs = func.evaluate()
+    assert isinstance(outputs, tuple) and len(outputs) == 2
+    assert outputs[0].shape == m1.shape and outputs[1].shape == m2.shape
+    assert list(map(pytest.approx, outputs[0].flat)) == [ 2, 5, -0.25, 6 ]
+    assert list(map(pytest.approx, outputs[1].flat)) == [ 6, 1 ]
+
+    outputs = func.evaluate_batch(q=[[1, 2, 3]])
+    assert outputs[0].shape == (3,) + m1.shape and outputs[1].shape == (3,) + m2.shape
+    assert list(map(pytest.approx, outputs[1][:, 0, 0])) == [ 6, 12, 18 ]
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_numeric_func_common_subexpressions():
+    '''
+    This test checks numeric functions where the same subexpressions are repeated in many outputs
+    (they are only computed once)
+    '''
+    sys = System()
+    state = get_atomization_state()
+    set_atomization_state('off')
+    try:
+        l = sys.new_parameter('l', 2)
+        x, dx, ddx = sys.new_coordinate('x', 0.3)
+        y, dy, ddy = sys.new_coordinate('y', -1.2)
+        m = Matrix([l * cos(x + y) * sin(x), l * sin(x + y) * sin(x), cos(x) * cos(x + y), sin(x + y) ** 2], shape=[2, 2])
+        func = sys.compile_numeric_function(m)
+        assert any(map(lambda name: name.startswith('__cse'), dict(func._code_atoms)))
+
+        expected = np.array([
+            2 * np.cos(-0.9) * np.sin(0.3), 2 * np.sin(-0.9) * np.sin(0.3),
+            np.cos(0.3) * np.cos(-0.9), np.sin(-0.9) ** 2]).reshape(2, 2)
+        assert func.evaluate() == pytest.approx(expected)
+        assert func.evaluate_batch(q=[[0.3, 0.3], [-1.2, -1.2]])[1] == pytest.approx(expected)
+    finally:
+        set_atomization_state(state)
+
+
+
+def test_numeric_func_unary_operators(tmp_path):
+    '''
+    This test checks that the operands of unary operators keep their parentheses in the
+    code generated for all the backends (e.g. -(x+y)*z is not evaluated as (-x+y)*z)
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_parameter('b', 5)
+    x, dx, ddx = sys.new_coordinate('x', 0.3)
+    y, dy, ddy = sys.new_coordinate('y', -1.2)
+    z, dz, ddz = sys.new_coordinate('z', 0.7)
+    # Repeated subexpressions are replaced by temporal variables
+    atoms = {'atom1': '-(x+y)*z'}
+    outputs = [['-(x+y)*z', '-(a-b)', 'atom1*x', '-(atom1-a)*b', 'sin(-(x+y)*z)+(-(a-b))**2']]
+    expected = [
+        -(0.3 - 1.2) * 0.7, -(2 - 5), -(0.3 - 1.2) * 0.7 * 0.3, -(-(0.3 - 1.2) * 0.7 - 2) * 5,
+        np.sin(-(0.3 - 1.2) * 0.7) + 9]
+
+    prev_cache_dir = get_numeric_functions_cache_dir()
+    try:
+        set_numeric_functions_cache_dir(str(tmp_path))
+        for options in ({}, {'c_backend': True}, {'c_optimized': True}):
+            func = NumericFunction(atoms, outputs, sys, **options)
+            assert list(func.evaluate().flat) == pytest.approx(expected)
+            assert list(func.evaluate_batch(q=[[0.3], [-1.2], [0.7]])[0].flat) == pytest.approx(expected)
+    finally:
+        set_numeric_functions_cache_dir(prev_cache_dir)
+
+
+
+def test_numeric_func_cython_backend(tmp_path):
+    '''
+    This test checks numeric functions compiled as cython extensions (their results must
+    match the python version)
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_input('b', 3)
+    x, dx, ddx = sys.new_coordinate('x', 1)
+    y, dy, ddy = sys.new_coordinate('y', -0.4)
+    m = Matrix([sin(a * x) ** 2, a ** 2 + 1, (a - b) / 4, a * b * x + cos(x - y) / b, -(x + y) * b, sqrt(a) * tan(y)], shape=[3, 2])
+
+    prev_cache_dir = get_numeric_functions_cache_dir()
+    try:
+        set_numeric_functions_cache_dir(str(tmp_path))
+        func = sys.compile_numeric_function(m, c_optimized=True)
+        expected = sys.compile_numeric_function(m)
+        assert func.evaluate() == pytest.approx(expected.evaluate())
+        x.value = 0.5
+        assert func.evaluate() == pytest.approx(expected.evaluate())
+        out = np.zeros(6)
+        assert func.evaluate_into(out) == pytest.approx(expected.evaluate().reshape(-1))
+
+        q = np.array([[1, 2, 3], [0.5, -0.5, 0.1]], dtype=np.float64)
+        t = np.array([0, 0.1, 0.2])
+        assert func.evaluate_batch(q=q, t=t) == pytest.approx(expected.evaluate_batch(q=q, t=t))
+        # Non contiguous inputs
+        assert func.evaluate_batch(q=q[:, ::2]) == pytest.approx(expected.evaluate_batch(q=q[:, ::2]))
+
+        funcs = sys.compile_numeric_functions(m, [m, m * 2], c_optimized=True)
+        assert funcs[0].evaluate() == pytest.approx(expected.evaluate())
+        assert funcs[1].evaluate()[1] == pytest.approx(2 * expected.evaluate())
+    finally:
+        set_numeric_functions_cache_dir(prev_cache_dir)
+
+
+
+def test_numeric_func_in_process_build(tmp_path, monkeypatch):
+    '''
+    This test checks that numeric functions compiled one at a time in the foreground are built
+    within the current process (no python interpreter is spawned)
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_input('b', 3)
+    m = Matrix([a, a ** 2 + 1, (a - b) / 4, a * b], shape=[2, 2])
+
+    run = subprocess.run
+    def checked_run(args, *other_args, **kwargs):
+        assert args[0] != executable
+        return run(args, *other_args, **kwargs)
+    monkeypatch.setattr(subprocess, 'run', checked_run)
+
+    prev_cache_dir = get_numeric_functions_cache_dir()
+    try:
+        set_numeric_functions_cache_dir(str(tmp_path))
+        assert list(map(pytest.approx, sys.compile_numeric_function(m, c_optimized=True).evaluate().flat)) == [ 2, 5, -0.25, 6 ]
+        assert list(map(pytest.approx, sys.compile_numeric_function(m, c_backend=True).evaluate().flat)) == [ 2, 5, -0.25, 6 ]
+    finally:
+        set_numeric_functions_cache_dir(prev_cache_dir)
+
+
+def test_numeric_func_sparse():
+    '''
+    This test checks sparse jacobians and the numeric functions compiled from them
+    '''
+    sys = System()
+    a = sys.new_parameter('a', 2)
+    x, dx, ddx = sys.new_coordinate('x', 1)
+    y, dy, ddy = sys.new_coordinate('y', 3)
+    z, dz, ddz = sys.new_coordinate('z', -1)
+    m = Matrix([a * x ** 2 + y, sin(z) * y, z + a])
+    q = Matrix([x, y, z])
+
+    J = sys.sparse_jacobian(m, q)
+    assert isinstance(J, SparseMatrix)
+    assert J.shape == (3, 3) and J.nnz == 5
+    assert list(J.get_indptr()) == [ 0, 2, 4, 5 ]
+    assert list(J.get_indices()) == [ 0, 1, 1, 2, 2 ]
+    assert J.to_dense() == sys.jacobian(m, q)
+
+    func = sys.compile_numeric_function(J)
+    assert isinstance(func, SparseNumericFunction)
+    assert func.evaluate().shape == (5,)
+    assert func.evaluate_dense() == pytest.approx(sys.evaluate(sys.jacobian(m, q)))
+
+    with pytest.raises(ValueError):
+        sys.sparse_jacobian(m, Matrix([x, 2 * y]))
+
+
+
+def test_numeric_func_c_backend(tmp_path):
+    '''
+    This test checks numeric functions compiled as C shared libraries
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_input('b', 3)
+    x, dx, ddx = sys.new_coordinate('x', 1)
+    m = Matrix([sin(a * x) ** 2, a ** 2 + 1, (a - b) / 4, a * b * x + cos(x) / b], shape=[2, 2])
+
+    prev_cache_dir = get_numeric_functions_cache_dir()
+    try:
+        set_numeric_functions_cache_dir(str(tmp_path))
+        func = sys.compile_numeric_function(m, c_backend=True)
+        expected = sys.compile_numeric_function(m)
+        assert func.evaluate() == pytest.approx(expected.evaluate())
+        x.value = 0.5
+        assert func.evaluate() == pytest.approx(expected.evaluate())
+
+        q = np.array([[1, 2, 3]], dtype=np.float64)
+        assert func.evaluate_batch(q=q) == pytest.approx(expected.evaluate_batch(q=q))
+
+        funcs = sys.compile_numeric_functions(m, m * 2, c_backend=True)
+        assert funcs[1].evaluate() == pytest.approx(2 * expected.evaluate())
+
+        # Numeric functions built in parallel
+        set_numeric_functions_max_build_workers(2)
+        funcs = sys.compile_numeric_functions(m, m * 2, m * 3, c_backend=True)
+        assert funcs[2].evaluate() == pytest.approx(3 * expected.evaluate())
+    finally:
+        set_numeric_functions_cache_dir(prev_cache_dir)
+        set_numeric_functions_max_build_workers(None)
+
+    with pytest.raises(ValueError):
+        sys.compile_numeric_function(m, c_optimized=True, c_backend=True)
+
+
+
+def test_numeric_func_background_compilation(tmp_path):
+    '''
+    This test checks numeric functions compiled in the background (they are evaluated with
+    the python version until the build finishes)
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_input('b', 3)
+    m = Matrix([a, a ** 2 + 1, (a - b) / 4, a * b], shape=[2, 2])
+    assert sys.compile_numeric_function(m).get_compilation_future() is None
+
+    prev_cache_dir = get_numeric_functions_cache_dir()
+    try:
+        set_numeric_functions_cache_dir(str(tmp_path))
+        func = sys.compile_numeric_function(m, c_backend=True, background=True)
+        assert list(map(pytest.approx, func.evaluate().flat)) == [ 2, 5, -0.25, 6 ]
+        func.get_compilation_future().result()
+        assert list(map(pytest.approx, func.evaluate().flat)) == [ 2, 5, -0.25, 6 ]
+
+        funcs = sys.compile_numeric_functions(m, m * 2, c_backend=True, background=True)
+        assert funcs[0].get_compilation_future() is funcs[1].get_compilation_future()
+        assert funcs[0].get_compilation_future().result() == funcs
+        assert funcs[1].evaluate() == pytest.approx(2 * func.evaluate())
+
+        # A function compiled in the background and in the foreground at the same time is built once
+        num_files = len(list(tmp_path.iterdir()))
+        func = sys.compile_numeric_function(m * 3, c_backend=True, background=True)
+        assert sys.compile_numeric_function(m * 3, c_backend=True).evaluate() == pytest.approx(3 * funcs[0].evaluate())
+        func.get_compilation_future().result()
+        assert len(list(tmp_path.iterdir())) == num_files + 1
+    finally:
+        set_numeric_functions_cache_dir(prev_cache_dir)
+
+
+
+def test_numeric_funcs_cache_dir(tmp_path):
+    '''
+    This test checks the functions to configure the directory where the numeric functions
+    compiled as cython extensions are stored
+    '''
+    prev_cache_dir = get_numeric_functions_cache_dir()
+    try:
+        set_numeric_functions_cache_dir(str(tmp_path))
+        assert get_numeric_functions_cache_dir() == str(tmp_path)
+        clear_numeric_functions_cache()
+    finally:
+        set_numeric_functions_cache_dir(prev_cache_dir)
+
+    with pytest.raises(TypeError):
+        set_numeric_functions_cache_dir(1)
+    with pytest.raises(TypeError):
+        set_numeric_functions_cache_max_size(-1)
+    with pytest.raises(TypeError):
+        set_numeric_functions_max_build_workers(0)
@@ -0,0 +1,200 @@
+'''
+Author: Víctor Ruiz Gómez
+Description: This is a unitary test for the class Simulator
+'''
+
+
+######## Imports ########
+
+from lib3d_mec_ginac import *
+import pytest
+import numpy as np
+import shutil
+import subprocess
+
+
+######## Fixtures ########
+
+
+
+######## Tests ########
+
+@pytest.mark.filterwarnings("ignore")
+def test_simulator_run():
+    '''
+    This test checks that simulations can be run without the graphical environment
+    '''
+    sys = System()
+    g = sys.new_parameter('g', -9.8)
+    x, dx, ddx = sys.new_coordinate('x', 0)
+
+    simulator = Simulator(sys)
+    simulator.set_integration_method('rk4')
+    simulator.set_accelerations(Matrix([g], shape=[1, 1]))
+    results = simulator.run(1, 0.1, record={'x': 'q', 'v': 'dq', 'g': Matrix([g], shape=[1, 1])})
+
+    assert set(results.keys()) == {'t', 'x', 'v', 'g'}
+    assert results['t'].shape == (11,) and results['x'].shape == (11, 1)
+    assert results['g'].shape == (11, 1, 1)
+    assert results['t'][-1] == pytest.approx(1)
+    assert list(map(pytest.approx, results['x'][:, 0])) == list(-4.9 * results['t'] ** 2)
+    assert list(map(pytest.approx, results['v'][:, 0])) == list(-9.8 * results['t'])
+    assert sys.get_time().get_value() == pytest.approx(1)
+
+    # Invalid values to be recorded
+    with pytest.raises(ValueError):
+        simulator.run(2, 0.1, record=['foo'])
+
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize('on_disk', [False, True])
+def test_trajectory_recorder(tmp_path, on_disk):
+    '''
+    This test checks that the simulation steps are stored by the trajectory recorder
+    '''
+    sys = System()
+    x, dx, ddx = sys.new_coordinate('x', 0, 1)
+
+    directory = str(tmp_path) if on_disk else None
+    recorder = TrajectoryRecorder(sys, ['q', 'dq'], chunk_size=4, directory=directory)
+    simulator = Simulator(sys)
+    simulator.attach_recorder(recorder)
+    simulator.init()
+    for i in range(0, 10):
+        simulator.step(0.1)
+
+    assert len(recorder) == 11 and set(recorder.get_names()) == {'t', 'q', 'dq'}
+    assert recorder['q'].shape == (11, 1) and recorder['t'].shape == (11,)
+    assert list(map(pytest.approx, recorder['q'][:, 0])) == list(recorder['t'])
+
+    recorder.close()
+    with pytest.raises(RuntimeError):
+        recorder.record()
+    if on_disk:
+        values = TrajectoryRecorder.load(directory)
+        assert values['dq'].shape == (11, 1)
+        assert list(map(pytest.approx, values['t'])) == list(recorder['t'])
+
+
+
+def _build_free_fall_simulator():
+    sys = System()
+    g = sys.new_parameter('g', 0)
+    x, dx, ddx = sys.new_coordinate('x', 0)
+    simulator = Simulator(sys)
+    simulator.set_integration_method('rk4')
+    simulator.set_accelerations(Matrix([g], shape=[1, 1]))
+    return simulator
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_parameter_sweep():
+    '''
+    This test checks that simulations with different parameter values can be run in parallel
+    '''
+    g = np.linspace(-10, 10, 8)
+    sweep = ParameterSweep(_build_free_fall_simulator, {'g': g}, num_workers=2)
+    assert len(sweep) == 8 and sweep.get_parameter_names() == ('g',)
+
+    results = sweep.run(1, 0.1, record=['q'])
+    assert results['q'].shape == (8, 11, 1) and results['t'].shape == (8, 11)
+    assert list(map(pytest.approx, results['q'][:, -1, 0])) == list(g / 2)
+
+    # Invalid parameter names
+    with pytest.raises(IndexError):
+        ParameterSweep(_build_free_fall_simulator, {'foo': [1, 2]})
+
+
+
+def _build_pendulum_simulator():
+    sys = System()
+    g = sys.new_parameter('g', 9.8)
+    x, dx, ddx = sys.new_coordinate('x', 1)
+    simulator = Simulator(sys)
+    simulator.set_integration_method('rk45')
+    simulator.set_accelerations(Matrix([-g * sin(x)], shape=[1, 1]))
+    return simulator
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_parameter_sweep_initial_state():
+    '''
+    This test checks that each simulation of a parameter sweep starts from the same state
+    (the results do not depend on the simulations previously run by the same worker)
+    '''
+    sweep = ParameterSweep(_build_pendulum_simulator, {'g': [9.8, 100, 9.8]}, num_workers=1)
+    results = sweep.run(1, 0.1, record=['q', 'dq'])
+    assert np.array_equal(results['q'][0], results['q'][2])
+    assert np.array_equal(results['dq'][0], results['dq'][2])
+
+    expected = _build_pendulum_simulator().run(1, 0.1, record=['q'])
+    assert np.array_equal(results['q'][0], expected['q'])
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_export_simulation_C(tmp_path):
+    '''
+    This test checks that a simulation can be exported as standalone C code (and that it runs
+    if a C compiler is available)
+    '''
+    sys = System()
+    m, g, l = sys.new_parameter('m', 2), sys.new_parameter('g', 9.8), sys.new_parameter('l', 1)
+    x, dx, ddx = sys.new_coordinate('x', 0.8)
+    y, dy, ddy = sys.new_coordinate('y', -0.6)
+    Phi = Matrix([x ** 2 + y ** 2 - l ** 2], shape=[1, 1])
+    Phi_q = sys.jacobian(Phi, Matrix([x, y]))
+    beta = Matrix([0], shape=[1, 1])
+    gamma = Matrix([-2 * (dx ** 2 + dy ** 2)], shape=[1, 1])
+    M_qq = Matrix([m, 0, 0, m], shape=[2, 2])
+    delta_q = Matrix([0, -m * g], shape=[2, 1])
+
+    filenames = sys.export_simulation_C(str(tmp_path), Phi, Phi_q, beta, M_qq, delta_q, gamma, name='pendulum')
+    assert sorted(map(lambda filename: filename.name, tmp_path.iterdir())) == [ 'Makefile', 'main.c', 'pendulum.c', 'pendulum.h' ]
+    assert len(filenames) == 4
+
+    compiler = shutil.which('cc') or shutil.which('gcc')
+    if compiler is not None:
+        executable = str(tmp_path / 'pendulum')
+        subprocess.check_call([compiler, '-O2', '-o', executable, str(tmp_path / 'main.c'), str(tmp_path / 'pendulum.c'), '-lm'])
+        lines = subprocess.check_output([executable, '0.001', '1']).decode().split()
+        t, x_value, y_value = map(float, lines[-1].split(','))
+        assert t == pytest.approx(1)
+        assert x_value ** 2 + y_value ** 2 == pytest.approx(1, abs=1e-4)
+
+    with pytest.raises(ValueError):
+        sys.export_simulation_C(str(tmp_path), Phi, Phi_q, beta, M_qq, delta_q, gamma, integration_method='foo')
+    with pytest.raises(ValueError):
+        sys.export_simulation_C(str(tmp_path), Phi, Phi_q, beta, M_qq, Matrix([0], shape=[1, 1]), gamma)
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_export_simulation_C_time(tmp_path):
+    '''
+    This test checks that the exported C code evaluates the accelerations at the time of each
+    integration stage (with time dependent forces)
+    '''
+    compiler = shutil.which('cc') or shutil.which('gcc')
+    if compiler is None:
+        pytest.skip('C compiler not available')
+
+    sys = System()
+    t = sys.get_time()
+    x, dx, ddx = sys.new_coordinate('x', 0)
+    y, dy, ddy = sys.new_coordinate('y', 0)
+    Phi, Phi_q = Matrix([x - y], shape=[1, 1]), Matrix([1, -1], shape=[1, 2])
+    beta, gamma = Matrix([0], shape=[1, 1]), Matrix([0], shape=[1, 1])
+    M_qq, delta_q = Matrix([1, 0, 0, 1], shape=[2, 2]), Matrix([cos(t), cos(t)], shape=[2, 1])
+
+    for integration_method, tol in (('euler', 1e-2), ('rk4', 1e-6)):
+        directory = tmp_path / integration_method
+        sys.export_simulation_C(str(directory), Phi, Phi_q, beta, M_qq, delta_q, gamma,
+            name='model', integration_method=integration_method)
+        executable = str(directory / 'model')
+        subprocess.check_call([compiler, '-O2', '-o', executable, str(directory / 'main.c'), str(directory / 'model.c'), '-lm'])
+        lines = subprocess.check_output([executable, '0.01', '2']).decode().split()
+        t_value, x_value, y_value = map(float, lines[-1].split(','))
+        assert t_value == pytest.approx(2)
+        assert x_value == pytest.approx(1 - np.cos(2), abs=tol) and y_value == pytest.approx(x_value)
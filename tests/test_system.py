@@ -760,6 +760,58 @@ def test_jacobian(system):
 
     assert sys.jacobian(q, a).shape == (3, 1)
 
+    # Derivatives computed element by element are memoized by the contents of the expressions
+    sys.clear_derivatives_cache()
+    assert sys.get_derivatives_cache_size() == 0
+    sys.sparse_jacobian(q, p)
+    size = sys.get_derivatives_cache_size()
+    assert size > 0
+    sys.sparse_jacobian(Matrix([ a ** 2, b ** 2, a + b ]), p)
+    assert sys.get_derivatives_cache_size() == size
+    sys.sparse_jacobian(Matrix([ a ** 3, b ** 2, a + b ]), p)
+    assert sys.get_derivatives_cache_size() == size + 1
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_parallel_diff():
+    '''
+    Test to check the methods ``diff`` and ``jacobian`` in the class System when the derivatives
+    are computed in parallel by many worker processes
+    '''
+    sys = System()
+    a, b = sys.new_parameter('a', 2), sys.new_parameter('b', 0.5)
+    x, dx, ddx = sys.new_coordinate('x', 0.3)
+    y, dy, ddy = sys.new_coordinate('y', -1.2)
+    m = Matrix([ a * sin(x) * cos(y), b * x ** 2, dx * cos(x + y) / a, 1, x * y, sin(y) ** 2 ], shape=[3, 2])
+    q = Matrix([ x, y ]).transpose()
+
+    # Derivatives computed in parallel must be equal to the regular ones
+    assert sys.diff(m, x, num_workers=2).shape == (3, 2)
+    assert sys.evaluate(sys.diff(m, x, num_workers=2)) == pytest.approx(sys.evaluate(sys.diff(m, x)))
+    assert sys.evaluate(sys.diff(m, 'y', num_workers=2)) == pytest.approx(sys.evaluate(sys.diff(m, y)))
+
+    v = Matrix([ a * sin(x) * cos(y), b * x ** 2, dx * cos(x + y) / a ])
+    assert sys.jacobian(v, q, num_workers=2).shape == (3, 2)
+    assert sys.evaluate(sys.jacobian(v, q, num_workers=2)) == pytest.approx(sys.evaluate(sys.jacobian(v, q)))
+    assert sys.evaluate(sys.jacobian(v, x, num_workers=3)) == pytest.approx(sys.evaluate(sys.jacobian(v, x)))
+
+    # num_workers must be an integer greater than zero
+    with pytest.raises(TypeError):
+        sys.diff(m, x, num_workers=0)
+    with pytest.raises(TypeError):
+        sys.jacobian(v, q, num_workers=1.5)
+
+    # It cannot be used with the argument symmetric
+    with pytest.raises(TypeError):
+        sys.jacobian(v, q, 0, num_workers=2)
+
+    # Invalid arguments are checked as in the serial version
+    with pytest.raises(ValueError):
+        sys.jacobian(m, q, num_workers=2)
+    with pytest.raises(ValueError):
+        sys.jacobian(v, Matrix([ x ** 2, y ]), num_workers=2)
+
 
 
 
@@ -781,6 +833,73 @@ def test_compile_numeric_func():
 
 
 
+@pytest.mark.filterwarnings("ignore")
+def test_compile_numeric_funcs():
+    '''
+    Test for the method ``compile_numeric_funcs`` in the class System
+    '''
+    sys = System()
+    a = sys.new_input('a', 2)
+    m, n = Matrix([a, a ** 2]), Matrix([a + 1])
+    funcs = sys.compile_numeric_funcs(m, n)
+    assert isinstance(funcs, tuple) and len(funcs) == 2
+    assert all(map(lambda func: isinstance(func, NumericFunction), funcs))
+    assert list(map(pytest.approx, funcs[0].evaluate().flat)) == [ 2, 4 ]
+    assert list(map(pytest.approx, funcs[1].evaluate().flat)) == [ 3 ]
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_compiled_functions_cache():
+    '''
+    Test for the cache of numeric functions compiled by the method ``compile_numeric_func``
+    in the class System
+    '''
+    sys = System()
+    a, b = sys.new_input('a', 2), sys.new_input('b', 3)
+    func = sys.compile_numeric_func(Matrix([a, a ** 2]))
+    # Matrices with the same contents share the numeric function
+    assert sys.compile_numeric_func(Matrix([a, a ** 2])) is func
+    assert sys.compile_numeric_func(Matrix([a, b])) is not func
+    assert sys.compile_numeric_func(Matrix([a, a ** 2], shape=(1, 2))) is not func
+    info = sys.get_compiled_functions_cache_info()
+    assert info.hits == 1 and info.misses == 3 and info.size == 3
+
+    # Modifying a matrix after compiling it doesnt alter the cache
+    m = Matrix([a, b])
+    func = sys.compile_numeric_func(m)
+    m.set(0, 0, b)
+    assert sys.compile_numeric_func(m) is not func
+    assert list(map(pytest.approx, sys.evaluate(m).flat)) == [ 3, 3 ]
+
+    sys.set_compiled_functions_cache_max_size(1)
+    assert sys.get_compiled_functions_cache_info().size == 1
+    sys.clear_compiled_functions_cache()
+    assert sys.get_compiled_functions_cache_info() == (0, 0, 1, 0)
+    with pytest.raises(TypeError):
+        sys.set_compiled_functions_cache_max_size(-1)
+
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_evaluate_expression():
+    '''
+    Test for the method ``evaluate`` in the class System with expressions
+    '''
+    sys = System()
+    a, b = sys.new_input('a', 2), sys.new_input('b', 3)
+    x = a ** 2 + b
+    value = sys.evaluate(x)
+    assert isinstance(value, float) and value == pytest.approx(7)
+    # The numeric function is compiled only once
+    misses = sys.get_compiled_functions_cache_info().misses
+    a.value = 3
+    assert sys.evaluate(a ** 2 + b) == pytest.approx(12)
+    assert sys.get_compiled_functions_cache_info().misses == misses
+    assert sys.evaluate(a) == 3 and sys.evaluate(Expr(2)) == 2
+
+
+
 
 
 ######## Tests for cinematic methods ########
@@ -897,3 +1016,51 @@ def test_twist(system):
     solid = sys.get_solid('s')
     assert isinstance(sys.twist(solid), Wrench3D)
     assert isinstance(sys.twist('s'), Wrench3D)
+
+
+
+
+######## Tests for serialization methods ########
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_save_load(tmp_path):
+    '''
+    Test for the methods ``save`` and ``load`` in the class System
+    '''
+    # A new system is created so that the shared fixture is not modified
+    sys = System()
+    a, b, c, d = sys.new_parameter('a', 2), sys.new_parameter('b'), sys.new_input('c'), sys.new_joint_unknown('d')
+    x, dx, ddx = sys.new_coordinate('x', 3)
+    sys.new_aux_coordinate('y')
+    sys.new_base('bs')
+    sys.new_vector('v', base='bs')
+    sys.new_vector('r')
+    sys.new_point('p', 'O', 'v')
+    sys.new_tensor('q', base='bs')
+    sys.new_solid('s', 'p', 'bs', 'a', 'v', 'q')
+    sys.new_frame('f', 'p', 'bs')
+    sys.new_wrench('w', 'v', 'r', 'p', 's', 'Constraint')
+    m = sys.new_matrix('m', [a * x, sin(x) / a, a ** 2, 1], shape=[2, 2])
+
+    filename = str(tmp_path / 'model.sys')
+    sys.save(filename)
+    other = System.load(filename)
+    assert other is not sys
+
+    # Symbols, values & geometric objects must be restored
+    for kind in ('parameter', 'input', 'joint_unknown', 'coordinate', 'velocity', 'aux_coordinate'):
+        assert list(other.get_symbols(kind)) == list(sys.get_symbols(kind))
+    assert other.get_parameter('a').value == 2 and other.get_coordinate('x').value == 3
+    assert other.has_base('bs') and other.has_vector('v') and other.has_point('p')
+    assert other.has_tensor('q') and other.has_solid('s') and other.has_wrench('w') and other.has_frame('f')
+    assert other.get_matrix('m').shape == m.shape
+    assert other.evaluate(other.get_matrix('m')) == pytest.approx(sys.evaluate(m))
+
+    # Numeric functions can be loaded back with the restored system
+    sys.compile_numeric_function(m).save_to_file(str(tmp_path / 'm.json'))
+    func = NumericFunction.load_from_file(str(tmp_path / 'm.json'), other)
+    assert func.evaluate() == pytest.approx(sys.evaluate(m))
+
+    with pytest.raises(TypeError):
+        sys.save(1)